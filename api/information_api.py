@@ -1,58 +1,163 @@
-import pandas as pd
-import requests
-
+import config
 from datetime import datetime
-from decorators import permission_required, role_required, jwt_required_with_redis
+from binary import response_shape
+from cache import bump_dataset_versions
+from decorators import permission_required, role_required, jwt_required_with_redis, conditional_get, \
+    region_scope, precinct_scope
 from extensions import db
-from flask import request, json, send_from_directory
+from export_cache import cached_export_response
+from exports import EXPORT_WRITERS
+from flask import request, json
 from flask.views import MethodView
+from forecast import get_forecast, get_forecasts
+from jobs import submit_job
 from models.region import Region, Precinct, Device
 from models.information import Weather, Service, Soil
 from models.pagebean import PageBean
 from models.result import Result
 from models.role import Role
+from models.upload import Upload
+from rollups import can_use_rollups, aggregate_rollups
+from serializers import fetch_frame, frame_to_data, serialize_data, serialize_rows
 from settings import WEATHER_PREDICT_API_URL
-from sqlalchemy import extract
-from utils import get_current_user, upload_weather_data, upload_soil_data, upload_information_data
+from sqlalchemy import and_, func, or_, select, true
+from storage import save_upload
+from timeseries import INTERVALS, DATE_FORMAT, parse_aggs, parse_date, aggregate_frame, date_range, year_range
+from utils import get_current_user, parse_int
 
 
 class WeatherApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.USER, Role.MANAGER])
+    @conditional_get('weather', region_scope)
     def get(self):
         args = request.args
 
         region_name = args.get('region_name', '')
         date_start = args.get('date_start')  # TODO
         date_end = args.get('date_end')
+        interval = args.get('interval')  # 10min / hour / day / week / month
+        agg = args.get('agg')
+        limit = args.get('limit')  # 传入 limit 或 cursor 时使用游标分页
+        cursor = args.get('cursor')
 
         has_date_range = True if date_start and date_end else False
-        region = Region.query.filter_by(region_name=region_name).first()
+
+        try:
+            shape = response_shape(args)  # rows / columns, Accept 为二进制格式时为 arrays
+            if has_date_range:
+                date_start = parse_date(date_start, 'date_start')
+                date_end = parse_date(date_end, 'date_end')
+        except ValueError as e:
+            return Result.error(str(e))
+
+        region = Region.get_by_name(region_name)
 
         if not region:
             return Result.error('天气查询失败, 请传入具体城市')
 
         region_id = region.region_id
 
-        if has_date_range:
-            date_format = '%Y-%m-%d %H:%M:%S'
+        if interval:
+            if not has_date_range:
+                return Result.error('聚合查询需要传入 date_start 和 date_end')
+
+            return WeatherApi.get_aggregation(region, date_start, date_end, interval, agg, shape)
 
-            date_start = datetime.strptime(date_start, date_format)
-            date_end = datetime.strptime(date_end, date_format)
+        if limit or cursor:
+            return WeatherApi.get_page(region_id, date_start if has_date_range else None,
+                                       date_end if has_date_range else None, limit, cursor, shape)
 
-            weathers: [Weather] = Weather.query.filter_by(
-                region_id=region_id).filter(
-                Weather.weather_date >= date_start, Weather.weather_date <= date_end).order_by(
-                Weather.weather_date.desc()).all()[::-1]
+        if has_date_range:
+            frame = fetch_frame(Weather.serialize_query().where(
+                Weather.region_id == region_id,
+                *date_range(Weather.weather_date, date_start, date_end)).order_by(
+                Weather.weather_date))
         else:
-            weathers: [Weather] = Weather.query.filter_by(
-                region_id=region_id).order_by(
+            frame = fetch_frame(Weather.serialize_query().where(
+                Weather.region_id == region_id).order_by(
                 Weather.weather_date.desc()).limit(
-                10).all()[::-1]
+                10)).iloc[::-1]
 
-        data = [weather.serialize() for weather in weathers]
+        return Result.success(data=PageBean.data(data=serialize_data(Weather, frame, shape), count=len(frame)))
 
-        return Result.success(data=PageBean.data(data=data, count=len(data)))
+    @staticmethod
+    def get_page(region_id, date_start, date_end, limit, cursor, shape='rows'):
+        """
+        按主键 (region_id, weather_date) 的游标分页, 每页一次索引范围扫描
+        有时间范围时从 date_start 向后翻页, 否则从最新数据向前翻页; 每页内按时间升序
+        """
+        date_format = '%Y-%m-%d %H:%M:%S'
+
+        try:
+            limit = PageBean.parse_limit(limit)
+            cursor_region_id, cursor_date = PageBean.decode_cursor(cursor, 2) if cursor else (region_id, None)
+            if cursor_region_id != region_id:
+                raise ValueError('游标与查询的城市不一致')
+            cursor_date = parse_date(cursor_date, 'cursor') if cursor_date else None
+        except ValueError as e:
+            return Result.error(str(e))
+
+        query = Weather.serialize_query().where(Weather.region_id == region_id)
+
+        if date_start:
+            query = query.where(*date_range(Weather.weather_date, date_start, date_end))
+            if cursor_date:
+                query = query.where(Weather.weather_date > cursor_date)
+
+            frame = fetch_frame(query.order_by(Weather.weather_date).limit(limit + 1))
+            has_next = len(frame) > limit
+            frame = frame.iloc[:limit]
+            last = frame['weather_date'].iloc[-1] if len(frame) else None
+        else:
+            if cursor_date:
+                query = query.where(Weather.weather_date < cursor_date)
+
+            frame = fetch_frame(query.order_by(Weather.weather_date.desc()).limit(limit + 1))
+            has_next = len(frame) > limit
+            frame = frame.iloc[:limit].iloc[::-1]
+            last = frame['weather_date'].iloc[0] if len(frame) else None
+
+        next_cursor = None
+        if has_next:
+            # 与 serialize 后的 weather_date 使用相同的格式
+            next_cursor = PageBean.encode_cursor([region_id, last.strftime(date_format)])
+
+        return Result.success(data=PageBean.cursor(data=serialize_data(Weather, frame, shape), next_cursor=next_cursor,
+                                                   count=len(frame)))
+
+    @staticmethod
+    def get_aggregation(region, date_start, date_end, interval, agg, shape='rows'):
+        """
+        按时间桶聚合, 返回的数据量与桶数相关, 与原始行数无关
+        """
+        try:
+            aggs = parse_aggs(agg, Weather.METRICS, Weather.DEFAULT_AGGS)
+        except ValueError as e:
+            return Result.error(str(e))
+
+        if interval not in INTERVALS:
+            return Result.error(f'不支持的时间间隔: {interval}')
+
+        if can_use_rollups(interval, aggs):
+            # 预聚合表: 读取的行数只与桶数有关
+            frame = aggregate_rollups('weather', [region.region_id], interval, date_start, date_end, aggs)
+            frame = frame.drop(columns='region_id')
+        else:
+            metrics = [getattr(Weather, metric) for metric in Weather.METRICS]
+            frame = fetch_frame(select(Weather.weather_date, *metrics).where(
+                Weather.region_id == region.region_id, *date_range(Weather.weather_date, date_start, date_end)))
+
+            if not frame.empty:
+                frame = aggregate_frame(frame, 'weather_date', interval, aggs)
+
+        if not frame.empty:
+            frame.insert(0, 'region_name', region.region_name)
+            frame.insert(0, 'region_id', region.region_id)
+
+        data = frame_to_data(frame, shape, {'weather_date': DATE_FORMAT})
+
+        return Result.success(data=PageBean.data(data=data, count=len(frame)))
 
     @jwt_required_with_redis
     @role_required([Role.MANAGER])
@@ -63,28 +168,31 @@ class WeatherApi(MethodView):
         if not file:
             return Result.error('请选择文件')
 
-        region = Region.query.filter_by(region_name=region_name).first()
+        region = Region.get_by_name(region_name)
         if not region:
             return Result.error('请选择正确的农场')
 
         region_id = region.region_id
 
-        filename = file.filename
-        path = './uploads/weather/' + filename
-
         try:
-            file.save(path)
+            upload_hash, path = save_upload(file, 'weather')
         except Exception as e:
             print(e)
             return Result.error('文件上传失败')
 
+        upload_target = str(region_id)
+        if Upload.is_ingested(upload_hash, 'weather', upload_target):
+            return Result.success(message='该文件已导入, 无需重复导入', data={'job_id': None, 'upload_hash': upload_hash})
+
+        upload = {'upload_hash': upload_hash, 'upload_target': upload_target, 'upload_filename': file.filename}
+
         try:
-            upload_weather_data(path, region_id)
+            job_id = submit_job('weather', path, region_id, user_id=get_current_user().user_id, upload=upload)
         except Exception as e:
             print(e)
             return Result.error('数据导入失败')
 
-        return Result.success()
+        return Result.success(data={'job_id': job_id, 'upload_hash': upload_hash})
 
 
 class WeatherPredictApi(MethodView):
@@ -93,7 +201,11 @@ class WeatherPredictApi(MethodView):
     def get(self):
         args = request.args
         region_name = args.get('region_name')
-        predict_days = int(args.get('predict_days', 7))
+
+        try:
+            predict_days = WeatherPredictApi.parse_predict_days(args)
+        except ValueError as e:
+            return Result.error(str(e))
 
         if not region_name:
             return Result.error("天气预测失败, 请传入具体城市")
@@ -105,33 +217,30 @@ class WeatherPredictApi(MethodView):
         return Result.success(data=PageBean.data(data=data, count=len(data)))
 
     @staticmethod
-    def get_prediction(region_name, predict_days):
-        url = WEATHER_PREDICT_API_URL
+    def parse_predict_days(args) -> int:
+        return parse_int(args.get('predict_days'), 'predict_days', default=7, minimum=1,
+                         maximum=config.FORECAST_MAX_DAYS)
 
-        # TODO
-        region_dict = {
-            'YY': '101050401',
-            '597': '101050101'
-        }
-
-        pred_id = region_dict.get(region_name)
-        if not pred_id:
+    @staticmethod
+    def get_prediction(region_name, predict_days):
+        region = Region.get_by_name(region_name)
+        if not region or not region.region_city_code:
             return False, None
 
-        url = url + pred_id
-        response = requests.get(url)
+        try:
+            text = get_forecast(region.region_city_code, WEATHER_PREDICT_API_URL)
+        except Exception as e:
+            print(e)
+            return False, None
 
-        return True, WeatherPredictApi.process_prediction(region_name, predict_days, response.text)
+        return True, WeatherPredictApi.process_prediction(region, predict_days, text)
 
     @staticmethod
-    def process_prediction(region_name, predict_days, text):
+    def process_prediction(region, predict_days, text):
         text = json.loads(text)
-        region = Region.query.filter_by(region_name=region_name).first()
-
-        if not region:
-            raise Exception('该区域不存在于数据库中')
 
         region_id = region.region_id
+        region_name = region.region_name
         max_len = len(text['data']['forecast'])  # = 15
         predict_days = min(max(predict_days, 1), max_len)
 
@@ -157,54 +266,290 @@ class WeatherPredictApi(MethodView):
         return weathers
 
 
+class WeatherPredictBatchApi(MethodView):
+    @jwt_required_with_redis
+    @role_required([Role.USER, Role.MANAGER])
+    def get(self):
+        """
+        多个农场的天气预报: region_names=YY,597, 并发请求数据源, 单个农场失败时返回其错误信息
+        """
+        args = request.args
+        region_names = [name for name in args.get('region_names', '').split(',') if name]
+
+        try:
+            predict_days = WeatherPredictApi.parse_predict_days(args)
+        except ValueError as e:
+            return Result.error(str(e))
+
+        if not region_names:
+            return Result.error("天气预测失败, 请传入具体城市")
+
+        regions = {region_name: Region.get_by_name(region_name) for region_name in region_names}
+        city_codes = [region.region_city_code for region in regions.values() if region and region.region_city_code]
+        forecasts = get_forecasts(city_codes, WEATHER_PREDICT_API_URL)
+
+        data = []
+        for (region_name, region) in regions.items():
+            item = {'region_name': region_name, 'success': False, 'data': None, 'error': None}
+
+            if not region or not region.region_city_code:
+                item['error'] = "查询不到 '" + region_name + "' 的未来天气数据"
+            else:
+                text, error = forecasts[region.region_city_code]
+
+                try:
+                    if error:
+                        raise Exception(error)
+
+                    item['data'] = WeatherPredictApi.process_prediction(region, predict_days, text)
+                    item['success'] = True
+                except Exception as e:
+                    print(e)
+                    item['error'] = "查询不到 '" + region_name + "' 的未来天气数据"
+
+            data.append(item)
+
+        return Result.success(data=PageBean.data(data=data, count=len(data)))
+
+
 class SoilApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.USER, Role.MANAGER])
+    @conditional_get('soil', region_scope)
     def get(self):
         args = request.args
 
         region_name = args.get('region_name')
-        soil_count = int(args.get('soil_count', 1))
 
-        region = Region.query.filter_by(region_name=region_name).first()
+        try:
+            soil_count = parse_int(args.get('soil_count'), 'soil_count', default=1, minimum=1)
+            shape = response_shape(args)  # rows / columns, Accept 为二进制格式时为 arrays
+        except ValueError as e:
+            return Result.error(str(e))
+
+        region = Region.get_by_name(region_name)
         if not region:
             return Result.error('请传入具体城市')
 
-        region_id = region.region_id
-        devices = Device.query.filter_by(region_id=region_id).all()
+        # 按时间桶聚合: 由预聚合表计算
+        if args.get('interval'):
+            return SoilApi.get_aggregation(region, args, shape)
 
-        data = []
-        for device in devices:
-            device_id = device.device_id
-            soils = Soil.query.filter_by(device_id=device_id).order_by(Soil.soil_date).limit(soil_count).all()
-            data.append(device.serialize() | {'device_soils': [soil.serialize() for soil in soils]})
+        # 历史数据查询: 游标分页
+        if any(args.get(key) for key in ('date_start', 'date_end', 'limit', 'cursor')):
+            return SoilApi.get_history(region, args, shape)
+
+        order = args.get('order', 'earliest')  # earliest: 最早的 soil_count 条, latest: 最新的 soil_count 条
+        if order not in ('earliest', 'latest'):
+            return Result.error('order 只能为 earliest 或 latest')
+
+        if shape != 'rows':
+            # 列式 / 二进制格式: 不嵌套, 每个设备的每条数据一行 (没有数据的设备一行, 土壤字段为空)
+            frame = fetch_frame(SoilApi.devices_with_soils_query(region.region_id, soil_count, order))
+            data = frame_to_data(frame, shape, {'soil_date': DATE_FORMAT})
+
+            return Result.success(data=PageBean.data(data=data, count=len(frame)))
+
+        data = SoilApi.get_devices_with_soils(region.region_id, soil_count, order)
 
         return Result.success(data=PageBean.data(data=data, count=len(data)))
 
+    @staticmethod
+    def supports_lateral(dialect) -> bool:
+        """
+        MySQL 8.0.14 起支持 LATERAL 派生表 (MariaDB 不支持)
+        """
+        return dialect.name == 'mysql' and not getattr(dialect, 'is_mariadb', False) \
+            and (dialect.server_version_info or ()) >= (8, 0, 14)
+
+    @staticmethod
+    def devices_with_soils_query(region_id, soil_count, order, dialect=None):
+        """
+        一次查询取每个设备的前 soil_count 条数据, 设备和农场信息只 join 一次
+        MySQL 8.0.14+: LATERAL 子查询, 每个设备按 (device_id, soil_date) 索引只读 soil_count 行
+        其他数据库 (SQLite): 窗口函数, 需要扫描这些设备的全部数据
+        """
+        soil_date_order = Soil.soil_date.desc() if order == 'latest' else Soil.soil_date
+        soil_columns = (Soil.soil_date, Soil.soil_temperature, Soil.soil_water, Soil.soil_conductivity, Soil.soil_PH,
+                        Soil.soil_salt)
+
+        if dialect is None:
+            dialect = db.session.connection().dialect
+
+        if SoilApi.supports_lateral(dialect):
+            soils = (select(*soil_columns).where(Soil.device_id == Device.device_id)
+                     .order_by(soil_date_order).limit(soil_count).lateral('soils'))
+            on_clause = true()
+        else:
+            soil_rank = func.row_number().over(partition_by=Soil.device_id, order_by=soil_date_order).label('soil_rank')
+            device_ids = select(Device.device_id).where(Device.region_id == region_id)
+            soils = select(Soil.device_id, *soil_columns, soil_rank).where(Soil.device_id.in_(device_ids)).subquery()
+            on_clause = and_(soils.c.device_id == Device.device_id, soils.c.soil_rank <= soil_count)
+
+        return (select(Device.region_id, Region.region_name, Device.device_id, Device.device_instance,
+                       Device.device_type, Device.device_lon, Device.device_lat, Device.device_abnormality_rate,
+                       soils.c.soil_date, soils.c.soil_temperature, soils.c.soil_water, soils.c.soil_conductivity,
+                       soils.c.soil_PH, soils.c.soil_salt)
+                .join(Region, Region.region_id == Device.region_id)
+                .outerjoin(soils, on_clause)
+                .where(Device.region_id == region_id)
+                .order_by(Device.device_id, soils.c.soil_date))
+
+    @staticmethod
+    def get_devices_with_soils(region_id, soil_count, order):
+        """
+        按设备嵌套: 每个设备附带其前 soil_count 条数据
+        """
+        rows = db.session.execute(SoilApi.devices_with_soils_query(region_id, soil_count, order)).all()
+
+        devices = {}
+        for row in rows:
+            device = devices.get(row.device_id)
+
+            if device is None:
+                device = devices[row.device_id] = {
+                    'region_id': row.region_id,
+                    'region_name': row.region_name,
+                    'device_id': row.device_id,
+                    'device_instance': row.device_instance,
+                    'device_type': row.device_type,
+                    'device_lonlat': [row.device_lon, row.device_lat],
+                    'device_abnormality_rate': row.device_abnormality_rate,
+                    'device_soils': []
+                }
+
+            if row.soil_date is not None:  # 没有数据的设备 (外连接)
+                device['device_soils'].append({
+                    'device_id': row.device_id,
+                    'device_instance': row.device_instance,
+                    'region_id': row.region_id,
+                    'region_name': row.region_name,
+                    'soil_date': row.soil_date.strftime('%Y-%m-%d %H:%M:%S'),
+                    'soil_temperature': row.soil_temperature,
+                    'soil_water': row.soil_water,
+                    'soil_conductivity': row.soil_conductivity,
+                    'soil_PH': row.soil_PH,
+                    'soil_salt': row.soil_salt,
+                })
+
+        return list(devices.values())
+
+    @staticmethod
+    def get_aggregation(region, args, shape='rows'):
+        """
+        各设备按时间桶聚合, 只支持 hour / day / week / month 和 mean / min / max / sum / std
+        """
+        interval = args.get('interval')
+
+        if not args.get('date_start') or not args.get('date_end'):
+            return Result.error('聚合查询需要传入 date_start 和 date_end')
+
+        try:
+            date_start = parse_date(args['date_start'], 'date_start')
+            date_end = parse_date(args['date_end'], 'date_end')
+            aggs = parse_aggs(args.get('agg'), Soil.METRICS, Soil.DEFAULT_AGGS)
+            device_id = parse_int(args.get('device_id'), 'device_id', default=0)
+        except ValueError as e:
+            return Result.error(str(e))
+
+        if not can_use_rollups(interval, aggs):
+            return Result.error(f'土壤数据聚合不支持: interval={interval}, agg={args.get("agg")}')
+
+        devices = fetch_frame(select(Device.device_id, Device.device_instance).where(
+            Device.region_id == region.region_id))
+        if device_id:
+            devices = devices[devices['device_id'] == device_id]
+
+        frame = aggregate_rollups('soil', devices['device_id'].tolist(), interval, date_start, date_end, aggs)
+
+        if not frame.empty:
+            frame = frame.merge(devices, on='device_id', how='left')
+            frame['region_id'] = region.region_id
+            frame['region_name'] = region.region_name
+            frame = frame[['device_id', 'device_instance', 'region_id', 'region_name', 'soil_date'] +
+                          list(aggs) + ['count']]
+
+        data = frame_to_data(frame, shape, {'soil_date': DATE_FORMAT})
+
+        return Result.success(data=PageBean.data(data=data, count=len(frame)))
+
+    @staticmethod
+    def get_history(region, args, shape='rows'):
+        """
+        按主键 (device_id, soil_date) 的游标分页, 可选 device_id / date_start / date_end 过滤
+        """
+        date_format = '%Y-%m-%d %H:%M:%S'
+
+        try:
+            limit = PageBean.parse_limit(args.get('limit'))
+            cursor = PageBean.decode_cursor(args['cursor'], 2) if args.get('cursor') else None
+            if cursor:
+                cursor = (parse_int(cursor[0], 'cursor'), parse_date(cursor[1], 'cursor'))
+            date_start = parse_date(args['date_start'], 'date_start') if args.get('date_start') else None
+            date_end = parse_date(args['date_end'], 'date_end') if args.get('date_end') else None
+            device_id = parse_int(args.get('device_id'), 'device_id', default=0)
+        except ValueError as e:
+            return Result.error(str(e))
+
+        device_ids = db.session.scalars(select(Device.device_id).where(Device.region_id == region.region_id)).all()
+        if device_id:
+            device_ids = [value for value in device_ids if value == device_id]
+
+        query = Soil.serialize_query().where(Soil.device_id.in_(device_ids))
+
+        query = query.where(*date_range(Soil.soil_date, date_start, date_end))
+        if cursor:
+            cursor_device_id, cursor_date = cursor
+            # (device_id, soil_date) > cursor, 展开写法便于使用主键索引
+            query = query.where(or_(Soil.device_id > cursor_device_id,
+                                    and_(Soil.device_id == cursor_device_id, Soil.soil_date > cursor_date)))
+
+        frame = fetch_frame(query.order_by(Soil.device_id, Soil.soil_date).limit(limit + 1))
+
+        next_cursor = None
+        if len(frame) > limit:
+            frame = frame.iloc[:limit]
+            last = frame.iloc[-1]
+            next_cursor = PageBean.encode_cursor([int(last['device_id']), last['soil_date'].strftime(date_format)])
+
+        return Result.success(data=PageBean.cursor(data=serialize_data(Soil, frame, shape), next_cursor=next_cursor,
+                                                   count=len(frame)))
+
     @jwt_required_with_redis
     @role_required([Role.MANAGER])
-    def post(self):  # TODO: device_id 如何确定
+    def post(self):
+        region_name = request.form.get('region_name')
         file = request.files.get("soil_file")
 
         if not file:
             return Result.error('请选择文件')
 
-        filename = file.filename
-        path = './uploads/soil/' + filename
+        # device_id 由该农场设备的列后缀映射确定, 不同农场的列后缀可能重复, 必须指定农场
+        region = Region.get_by_name(region_name) if region_name else None
+        if not region:
+            return Result.error('请选择正确的农场')
+
+        region_id = region.region_id
 
         try:
-            file.save(path)
+            upload_hash, path = save_upload(file, 'soil')
         except Exception as e:
             print(e)
             return Result.error('文件上传失败')
 
+        upload_target = str(region_id)
+        if Upload.is_ingested(upload_hash, 'soil', upload_target):
+            return Result.success(message='该文件已导入, 无需重复导入', data={'job_id': None, 'upload_hash': upload_hash})
+
+        upload = {'upload_hash': upload_hash, 'upload_target': upload_target, 'upload_filename': file.filename}
+
         try:
-            upload_soil_data(path)
+            job_id = submit_job('soil', path, region_id, user_id=get_current_user().user_id, upload=upload)
         except Exception as e:
             print(e)
             return Result.error('数据导入失败')
 
-        return Result.success()
+        return Result.success(data={'job_id': job_id, 'upload_hash': upload_hash})
 
 
 class InformationApi(MethodView):
@@ -217,27 +562,34 @@ class InformationApi(MethodView):
         if not file:
             return Result.error('请选择文件')
 
-        filename = file.filename
-        path = './uploads/information/' + filename
+        if not url:
+            return Result.error('请传入服务地址')
 
         try:
-            file.save(path)
+            upload_hash, path = save_upload(file, 'information')
         except Exception as e:
             print(e)
             return Result.error('文件上传失败')
 
+        upload_target = url
+        if Upload.is_ingested(upload_hash, 'information', upload_target):
+            return Result.success(message='该文件已导入, 无需重复导入', data={'job_id': None, 'upload_hash': upload_hash})
+
+        upload = {'upload_hash': upload_hash, 'upload_target': upload_target, 'upload_filename': file.filename}
+
         try:
-            upload_information_data(path, url)
+            job_id = submit_job('information', path, url, user_id=get_current_user().user_id, upload=upload)
         except Exception as e:
             print(e)
             return Result.error('数据导入失败')
 
-        return Result.success()
+        return Result.success(data={'job_id': job_id, 'upload_hash': upload_hash})
 
 
 class ServiceApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.MANAGER])
+    @conditional_get('service', precinct_scope)
     def get(self):
         args = request.args
 
@@ -257,11 +609,9 @@ class ServiceApi(MethodView):
         if not limit:
             limit = count
 
-        services: [Service] = Service.query.filter_by(region_id=region_id).order_by(
+        data = serialize_rows(Service, Service.serialize_query().where(Service.region_id == region_id).order_by(
             Service.service_date.desc()).offset(
-            (page - 1) * limit).limit(limit).all()
-
-        data = [service.serialize() for service in services]
+            (page - 1) * limit).limit(limit))
 
         return Result.success(data=PageBean.data(data=data, count=count))
 
@@ -290,6 +640,7 @@ class ServiceApi(MethodView):
         try:
             db.session.add(service)
             db.session.commit()
+            bump_dataset_versions('service', [region_id])
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -309,9 +660,12 @@ class ServiceApi(MethodView):
         if not service:
             return Result.error('请传入正确的服务id')
 
+        region_id = service.region_id
+
         try:
             db.session.delete(service)
             db.session.commit()
+            bump_dataset_versions('service', [region_id])
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -342,9 +696,11 @@ class ServiceApi(MethodView):
         service.day_feature_url = day_feature_url
         service.day_growth_url = day_growth_url
         service.set_service_id()
+        region_id = service.region_id
 
         try:
             db.session.commit()
+            bump_dataset_versions('service', [region_id])
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -357,65 +713,91 @@ class ExportWeatherApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.MANAGER])
     def get(self):
+        """
+        format=xlsx|csv|parquet|arrow, 单年 weather_year 或多年 year_start / year_end
+        """
         args = request.args
 
         region_name = args.get('region_name')
-        weather_year = int(args.get('weather_year', datetime.today().year))
-
-        region = Region.query.filter_by(region_name=region_name).first()
+        region = Region.get_by_name(region_name)
 
         if not region:
             return Result.error('请选择地区')
 
-        weathers = Weather.query.filter(Weather.region_id == region.region_id,
-                                        extract('year', Weather.weather_date) == weather_year).order_by(
-            Weather.weather_date).all()
+        export_format = args.get('format', 'xlsx')
+        if export_format not in EXPORT_WRITERS:
+            return Result.error(f'不支持的导出格式: {export_format}')
+
+        try:
+            years = ExportWeatherApi.parse_years(args, 'weather_year')
+        except ValueError as e:
+            return Result.error(str(e))
 
-        if len(weathers) == 0:
+        query = Weather.serialize_query().where(
+            Weather.region_id == region.region_id,
+            *year_range(Weather.weather_date, years))
+
+        if db.session.execute(query.limit(1)).first() is None:
             return Result.error('没有数据')
 
-        df = pd.DataFrame([weather.serialize() for weather in weathers])
-        fileroot = './exports'
-        filename = f'{region_name}_{weather_year}_weather_export.xlsx'
-        filepath = fileroot + '/' + filename
-        df.to_excel(filepath, index=False)
+        filename = f'{region_name}_{ExportWeatherApi.years_label(years)}_weather_export.{export_format}'
+
+        return cached_export_response('weather', region.region_id, years, Weather,
+                                      query.order_by(Weather.weather_date), filename, export_format)
+
+    @staticmethod
+    def parse_years(args, year_arg) -> range:
+        """
+        year_start / year_end 优先, 否则为单年 (year_arg, 默认今年)
+        """
+        year = int(args.get(year_arg, datetime.today().year))
+        year_start = int(args.get('year_start', year))
+        year_end = int(args.get('year_end', year_start if args.get('year_start') else year))
+
+        if year_start > year_end:
+            raise ValueError('year_start 不能大于 year_end')
+        if year_end - year_start >= config.EXPORT_MAX_YEARS:
+            raise ValueError(f'一次最多导出 {config.EXPORT_MAX_YEARS} 年的数据')
 
-        # download_url = settings.BACKEND_DOMAIN + filepath[1:]
+        return range(year_start, year_end + 1)
 
-        return send_from_directory(fileroot, filename, as_attachment=True)
+    @staticmethod
+    def years_label(years: range) -> str:
+        return str(years[0]) if len(years) == 1 else f'{years[0]}-{years[-1]}'
 
 
 class ExportSoilApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.MANAGER])
     def get(self):
+        """
+        format=xlsx|csv|parquet|arrow, 单年 soil_year 或多年 year_start / year_end
+        """
         args = request.args
 
         region_name = args.get('region_name')
-        soil_year = int(args.get('soil_year', datetime.today().year))
-
-        region = Region.query.filter_by(region_name=region_name).first()
+        region = Region.get_by_name(region_name)
 
         if not region:
             return Result.error('请选择地区')
 
-        device_ids = [device.device_id for device in region.region_devices]  # 提取所有设备ID (在每个农场的设备不多的前提下)
+        export_format = args.get('format', 'xlsx')
+        if export_format not in EXPORT_WRITERS:
+            return Result.error(f'不支持的导出格式: {export_format}')
 
-        soils = Soil.query.filter(
-            Soil.device_id.in_(device_ids),
-            extract('year', Soil.soil_date) == soil_year
-        ).order_by(Soil.device_id,
-                   Soil.soil_date).all()
+        try:
+            years = ExportWeatherApi.parse_years(args, 'soil_year')
+        except ValueError as e:
+            return Result.error(str(e))
 
-        if len(soils) == 0:
-            return Result.error('没有数据')
+        query = Soil.serialize_query().where(
+            Device.region_id == region.region_id,
+            *year_range(Soil.soil_date, years))
 
-        df = pd.DataFrame([soil.serialize() for soil in soils])
-        fileroot = './exports'
-        filename = f'{region_name}_{soil_year}_soil_export.xlsx'
-        filepath = fileroot + '/' + filename
-        df.to_excel(filepath, index=False)
+        if db.session.execute(query.limit(1)).first() is None:
+            return Result.error('没有数据')
 
-        # download_url = settings.BACKEND_DOMAIN + filepath[1:]
+        filename = f'{region_name}_{ExportWeatherApi.years_label(years)}_soil_export.{export_format}'
 
-        return send_from_directory(fileroot, filename, as_attachment=True)
+        return cached_export_response('soil', region.region_id, years, Soil,
+                                      query.order_by(Soil.device_id, Soil.soil_date), filename, export_format)
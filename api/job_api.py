@@ -0,0 +1,19 @@
+from flask.views import MethodView
+from decorators import role_required, jwt_required_with_redis
+from jobs import get_job
+from models.result import Result
+from models.role import Role
+from utils import get_current_user
+
+
+class JobApi(MethodView):
+    @jwt_required_with_redis
+    @role_required([Role.MANAGER])
+    def get(self, job_id):
+        job = get_job(job_id)
+
+        # 其他用户的任务同样按不存在处理, 不暴露任务是否存在
+        if not job or job['user_id'] != get_current_user().user_id:
+            return Result.error('任务不存在或已过期')
+
+        return Result.success(data=job)
@@ -1,9 +1,11 @@
+from cache import REGION, CROP, PRECINCT, DEVICE, cached
 from flask.views import MethodView
 from decorators import role_required, jwt_required_with_redis
 from models.region import Region, Crop, Precinct, Device
 from models.pagebean import PageBean
 from models.result import Result
 from models.role import Role
+from serializers import serialize_rows
 from utils import get_current_user
 
 
@@ -11,9 +13,8 @@ class RegionApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.USER, Role.MANAGER])
     def get(self):
-        regions: [Region] = Region.query.order_by(Region.region_id).all()
-
-        data = [region.serialize() for region in regions]
+        data = cached(REGION, 'list', lambda: serialize_rows(
+            Region, Region.serialize_query().order_by(Region.region_id)))
 
         return Result.success(data=data)
 
@@ -22,9 +23,7 @@ class CropApi(MethodView):
     @jwt_required_with_redis
     @role_required([Role.USER, Role.MANAGER])
     def get(self):
-        crops: [Crop] = Crop.query.order_by(Crop.crop_id).all()
-
-        data = [crop.serialize() for crop in crops]
+        data = cached(CROP, 'list', lambda: [crop.serialize() for crop in Crop.query.order_by(Crop.crop_id).all()])
 
         return Result.success(data=data)
 
@@ -45,9 +44,8 @@ class PrecinctApi(MethodView):
             return Result.error('当前用户并没有管理区域')
 
         region_id = precinct.region_id
-        precincts = Precinct.query.filter_by(region_id=region_id).all()
-
-        data = [precinct.serialize() for precinct in precincts]
+        data = cached(PRECINCT, f'region:{region_id}', lambda: serialize_rows(
+            Precinct, Precinct.serialize_query().where(Precinct.region_id == region_id)))
 
         return Result.success(data=data)
 
@@ -63,8 +61,7 @@ class DeviceApi(MethodView):
             return Result.error('当前用户并没有管理区域')
 
         region_id = precinct.region_id
-        devices = Device.query.filter_by(region_id=region_id).all()
-
-        data = [device.serialize() for device in devices]
+        data = cached(DEVICE, f'region:{region_id}', lambda: serialize_rows(
+            Device, Device.serialize_query().where(Device.region_id == region_id)))
 
         return Result.success(data=PageBean.data(data=data, count=len(data)))
@@ -2,6 +2,7 @@ from flask import request
 from flask.views import MethodView
 from flask_jwt_extended import create_access_token
 
+from cache import PRECINCT, invalidate
 from decorators import permission_required, role_required, jwt_required_with_redis
 from extensions import db, redis_client
 from models.region import Precinct
@@ -109,6 +110,7 @@ class UserInfoApi(MethodView):
 
         try:
             db.session.commit()
+            invalidate(PRECINCT)  # 管理区列表包含负责人姓名
         except Exception as e:
             db.session.rollback()
             print(e)
@@ -277,6 +279,7 @@ class UserPrecinctApi(MethodView):
 
         try:
             db.session.commit()
+            invalidate(PRECINCT)
         except Exception as e:
             db.session.rollback()
             print(e)
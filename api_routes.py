@@ -1,8 +1,9 @@
 # api_routes.py
 from flask import Flask
 from api.region_api import RegionApi, CropApi, PrecinctApi, DeviceApi
-from api.information_api import WeatherApi, WeatherPredictApi, ServiceApi, SoilApi, ExportWeatherApi, ExportSoilApi, \
-    InformationApi
+from api.job_api import JobApi
+from api.information_api import WeatherApi, WeatherPredictApi, WeatherPredictBatchApi, ServiceApi, SoilApi, \
+    ExportWeatherApi, ExportSoilApi, InformationApi
 from api.user_api import SigninApi, SignupApi, UserApi, UserRoleApi, UserInfoApi, UserPrecinctApi
 
 
@@ -45,6 +46,9 @@ def register_routes(app: Flask):
     weather_prediction_view = WeatherPredictApi.as_view('weather_prediction_api')
     app.add_url_rule('/api/weather_prediction', view_func=weather_prediction_view, methods=['GET'])
 
+    weather_prediction_batch_view = WeatherPredictBatchApi.as_view('weather_prediction_batch_api')
+    app.add_url_rule('/api/weather_predictions', view_func=weather_prediction_batch_view, methods=['GET'])
+
     soil_view = SoilApi.as_view('soil_api')
     app.add_url_rule('/api/soil', view_func=soil_view, methods=['GET', 'POST'])
 
@@ -58,4 +62,7 @@ def register_routes(app: Flask):
     app.add_url_rule('/api/export_weather', view_func=export_weather_view, methods=['GET'])
 
     export_soil_view = ExportSoilApi.as_view('export_soil_api')
-    app.add_url_rule('/api/export_soil', view_func=export_soil_view, methods=['GET'])
\ No newline at end of file
+    app.add_url_rule('/api/export_soil', view_func=export_soil_view, methods=['GET'])
+
+    job_view = JobApi.as_view('job_api')
+    app.add_url_rule('/api/jobs/<job_id>', view_func=job_view, methods=['GET'])
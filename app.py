@@ -2,12 +2,15 @@ import config
 from api_routes import register_routes
 from blueprints.main_bp import main_bp
 from commands import init_command
+from compression import init_compression
 from extensions import db, cors, jwt_manager, redis_client
 from flask import Flask
 from flask_migrate import Migrate
+from json_provider import FastJSONProvider
 from models.result import Result
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config.from_object(config)
 db.init_app(app)
 cors.init_app(app)
@@ -18,6 +21,7 @@ migrate = Migrate(app, db)
 app.register_blueprint(main_bp, url_prefix='')
 register_routes(app)
 init_command(app)
+init_compression(app)
 
 
 @app.errorhandler(Exception)
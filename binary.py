@@ -0,0 +1,125 @@
+import json
+
+import numpy as np
+from flask import Response, make_response, request
+from serializers import parse_shape
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BINARY_MIMETYPES = {
+    'msgpack': 'application/x-msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# MessagePack 扩展类型: 数值列整列写为一个小端缓冲区, 客户端用 np.frombuffer / Float64Array 直接读取
+EXT_FLOAT64 = 1
+EXT_INT64 = 2
+
+
+def negotiate_format():
+    """
+    按 Accept 选择 msgpack / arrow, JSON 优先 (*/* 或未指定时返回 None, 即 JSON)
+    """
+    if msgpack is None:
+        candidates = ['application/json', BINARY_MIMETYPES['arrow']]
+    else:
+        candidates = ['application/json'] + list(BINARY_MIMETYPES.values())
+
+    best = request.accept_mimetypes.best_match(candidates, default='application/json')
+
+    for (binary_format, mimetype) in BINARY_MIMETYPES.items():
+        if best == mimetype:
+            return binary_format
+
+    return None
+
+
+def response_shape(args) -> str:
+    """
+    二进制响应总是列式 (arrays: 字段 -> numpy 数组), 否则由 shape 参数决定; shape 不合法时抛出 ValueError
+    """
+    shape = parse_shape(args.get('shape'))
+
+    return 'arrays' if negotiate_format() else shape
+
+
+def _pack_default(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f':
+            return msgpack.ExtType(EXT_FLOAT64, value.astype('<f8', copy=False).tobytes())
+        if value.dtype.kind in 'iu':
+            return msgpack.ExtType(EXT_INT64, value.astype('<i8', copy=False).tobytes())
+
+        return value.tolist()  # 字符串等 object 列
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    raise TypeError(f'无法编码为 MessagePack: {type(value)}')
+
+
+def pack_msgpack(result: dict) -> bytes:
+    """
+    与 JSON 相同的 Result / PageBean 结构, 数值数组为扩展类型
+    """
+    return msgpack.packb(result, default=_pack_default, use_bin_type=True)
+
+
+def pack_arrow(result: dict) -> bytes:
+    """
+    Arrow IPC 流: PageBean 的 data (字段 -> 数组) 为一个 record batch, 数值列直接引用 numpy 缓冲区
+    Result / PageBean 的其余字段 (message, code, count, next_cursor) 以 JSON 写入 schema 元数据的 result 键
+    不是列式数据时 (例如错误信息) 只有元数据, 没有列
+    """
+    import pyarrow as pa
+
+    page = result.get('data')
+    columns = page.get('data') if isinstance(page, dict) else None
+
+    if not isinstance(columns, dict):
+        columns = {}
+
+    envelope = dict(result)
+    if isinstance(page, dict):
+        envelope['data'] = {key: value for (key, value) in page.items() if key != 'data'}
+
+    batch = pa.RecordBatch.from_pydict({name: pa.array(values) for (name, values) in columns.items()},
+                                       metadata={'result': json.dumps(envelope, ensure_ascii=False, default=str)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        if columns:
+            writer.write_batch(batch)
+
+    return sink.getvalue().to_pybytes()
+
+
+BINARY_WRITERS = {
+    'msgpack': pack_msgpack,
+    'arrow': pack_arrow,
+}
+
+
+def binary_response(result: dict, binary_format: str) -> Response:
+    response = Response(BINARY_WRITERS[binary_format](result), mimetype=BINARY_MIMETYPES[binary_format])
+    response.vary.add('Accept')
+
+    return response
+
+
+def render_result(result):
+    """
+    视图返回的 Result -> 按 Accept 编码的响应 (JSON / MessagePack / Arrow)
+    """
+    binary_format = negotiate_format()
+
+    if binary_format and isinstance(result, dict):
+        return binary_response(result, binary_format)
+
+    response = make_response(result)
+    response.vary.add('Accept')
+
+    return response
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+
+import config
+from extensions import redis_client
+
+CACHE_KEY_PREFIX = 'cache:'
+DATASET_KEY_PREFIX = 'dataset:version:'
+
+# 参考数据的缓存命名空间, 对应表写入后需要 invalidate
+REGION = 'region'
+CROP = 'crop'
+PRECINCT = 'precinct'
+DEVICE = 'device'
+
+CACHE_NAMES = (REGION, CROP, PRECINCT, DEVICE)
+
+_lock = threading.Lock()
+_entries: dict[str, dict[str, tuple[int, object]]] = {}  # 进程内缓存: 命名空间 -> key -> (版本号, 值)
+_versions: dict[str, tuple[int, float]] = {}  # 命名空间 -> (版本号, 上次从 Redis 读取的时间)
+
+
+def _version_key(name: str) -> str:
+    return f'{CACHE_KEY_PREFIX}{name}:version'
+
+
+def _data_key(name: str, version: int, key: str) -> str:
+    return f'{CACHE_KEY_PREFIX}{name}:{version}:{key}'
+
+
+def get_version(name: str):
+    """
+    命名空间的当前版本号, 每 CACHE_VERSION_CHECK_INTERVAL 秒最多访问一次 Redis; Redis 不可用时返回 None
+    """
+    now = time.monotonic()
+    version, checked = _versions.get(name, (None, 0.))
+
+    if version is not None and now - checked < config.CACHE_VERSION_CHECK_INTERVAL:
+        return version
+
+    try:
+        version = int(redis_client.get(_version_key(name)) or 0)
+    except Exception as e:
+        print(f'WARNING!!!: 读取缓存版本失败, 直接查询数据库: {e}')
+        return None
+
+    _versions[name] = (version, now)
+
+    return version
+
+
+def cached(name: str, key: str, loader):
+    """
+    读穿缓存: 进程内 -> Redis -> loader() 查库, 返回值需可 JSON 序列化
+    """
+    version = get_version(name)
+    if version is None:
+        return loader()
+
+    entry = _entries.get(name, {}).get(key)
+    if entry and entry[0] == version:
+        return entry[1]
+
+    data_key = _data_key(name, version, key)
+
+    try:
+        data = redis_client.get(data_key)
+    except Exception as e:
+        print(f'WARNING!!!: 读取缓存失败: {e}')
+        data = None
+
+    if data is not None:
+        value = json.loads(data)
+    else:
+        value = loader()
+
+        try:
+            redis_client.set(data_key, json.dumps(value, ensure_ascii=False), ex=config.CACHE_TTL)
+        except Exception as e:
+            print(f'WARNING!!!: 写入缓存失败: {e}')
+
+    with _lock:
+        _entries.setdefault(name, {})[key] = (version, value)
+
+    return value
+
+
+def invalidate(*names: str):
+    """
+    表写入 (提交) 后调用: 递增版本号, 其他进程在下次版本检查时丢弃旧值, 旧版本的 Redis 数据等待过期
+    """
+    for name in names or CACHE_NAMES:
+        try:
+            redis_client.incr(_version_key(name))
+        except Exception as e:
+            print(f'WARNING!!!: 缓存失效失败: {name}, {e}')
+
+        # 本进程立即生效
+        with _lock:
+            _versions.pop(name, None)
+            _entries.pop(name, None)
+
+
+def _dataset_key(dataset: str, scope) -> str:
+    return f'{DATASET_KEY_PREFIX}{dataset}:{scope}'
+
+
+def get_dataset_version(dataset: str, scope):
+    """
+    数据集 (weather / soil / service) 在某个范围 (region_id) 内的版本号, 用于条件请求的 ETag
+    不经过进程内缓存, 写入后立即可见; Redis 不可用时返回 None
+    """
+    try:
+        return int(redis_client.get(_dataset_key(dataset, scope)) or 0)
+    except Exception as e:
+        print(f'WARNING!!!: 读取数据集版本失败: {e}')
+        return None
+
+
+def bump_dataset_versions(dataset: str, scopes):
+    """
+    数据写入 (提交) 后调用
+    """
+    try:
+        for scope in set(scopes):
+            redis_client.incr(_dataset_key(dataset, scope))
+    except Exception as e:
+        print(f'WARNING!!!: 更新数据集版本失败: {dataset}, {e}')
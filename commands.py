@@ -1,10 +1,59 @@
 # commands.py
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+import config
+from cache import invalidate
 from extensions import db
 from flask.cli import AppGroup
 from models.region import Region, Crop, Precinct, Device
 from models.role import Role
 from models.user import User
 from models.information import Service, Weather, Soil
+from models.upload import Upload  # noqa: F401, 注册 upload 表供 create_all 创建
+from partitions import PARTITION_TABLES, get_partitions, partition_table
+from rollups import ROLLUP_TABLES, rebuild_rollups
+from schema import SCHEMA_COLUMNS, upgrade_schema
+
+# 静态数据文件命名: <农场名>_<weather|soil>_<年份>.<xls|xlsx|csv|parquet>, 例如 YY_weather_2023.xls
+STATIC_DATA_PATTERN = re.compile(
+    r'^(?P<region_name>.+)_(?P<kind>weather|soil)_(?P<year>\d{4})\.(xls|xlsx|csv|parquet)$')
+
+
+def find_static_datasets(data_dir: str) -> list[dict]:
+    """
+    扫描目录, 返回 [{'kind', 'path', 'region_name', 'year'}]
+    """
+    datasets = []
+
+    for filename in sorted(os.listdir(data_dir)):
+        match = STATIC_DATA_PATTERN.match(filename)
+        if match:
+            datasets.append({
+                'kind': match.group('kind'),
+                'path': os.path.join(data_dir, filename),
+                'region_name': match.group('region_name'),
+                'year': int(match.group('year')),
+            })
+
+    return datasets
+
+
+def load_static_dataset(kind: str, path: str, region_id: int):
+    # 子进程中运行: 需要 app 上下文
+    from app import app
+
+    with app.app_context():
+        if kind == 'weather':
+            stats = Weather.init_static_data(path, region_id)
+        else:
+            stats = Soil.init_static_data(path, region_id)
+
+    return stats.serialize() if stats else None
 
 
 def init_command(app):
@@ -17,14 +66,19 @@ def init_command(app):
         清空并删除所有表
         """
         db.drop_all()
+        invalidate()
 
         print('SUCCESS!!!: flask init reset')
 
     @cli.command('static')
-    def init_static_data():
+    @click.option('--data-dir', default='./static', help='静态数据目录, 文件名格式: <农场名>_<weather|soil>_<年份>.xls')
+    @click.option('--workers', default=config.INGEST_WORKERS, type=int, help='并行导入的进程数')
+    def init_static_data(data_dir, workers):
         """
         重建所有表, 初始化静态数据
         """
+        started = time.perf_counter()
+
         db.drop_all()
         db.create_all()
 
@@ -36,10 +90,156 @@ def init_command(app):
         Precinct.init_static_data()
         Device.init_static_data()
 
-        Weather.init_static_data('./static/YY_weather_2023.xls', 1)
-        Soil.init_static_data('./static/YY_soil_2023.xls')
         Service.init_static_data()
 
-        print('SUCCESS!!!: flask init static')
+        invalidate()
+
+        region_ids = {region.region_name: region.region_id for region in Region.query.all()}
+        datasets = []
+
+        for dataset in find_static_datasets(data_dir):
+            region_id = region_ids.get(dataset['region_name'])
+            if region_id is None:
+                print(f"WARNING!!!: 农场 '{dataset['region_name']}' 不存在, 跳过 {dataset['path']}")
+                continue
+
+            datasets.append(dataset | {'region_id': region_id})
+
+        # 各数据集相互独立, 多进程并行导入
+        executor = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context('spawn'))
+
+        with executor:
+            futures = {executor.submit(load_static_dataset, dataset['kind'], dataset['path'], dataset['region_id']):
+                           dataset for dataset in datasets}
+
+            for (i, future) in enumerate(as_completed(futures), 1):
+                dataset = futures[future]
+
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    stats = None
+                    print(e)
+
+                if stats:
+                    print(f"[{i}/{len(datasets)}] {dataset['path']}: {stats['rows']} 条, "
+                          f"用时 {stats['seconds']}s, {stats['rows_per_second']} 条/秒")
+                else:
+                    print(f"[{i}/{len(datasets)}] ERROR!!!: {dataset['path']} 导入失败")
+
+        print(f'SUCCESS!!!: flask init static ({len(datasets)} 个数据集, 用时 {time.perf_counter() - started:.2f}s)')
 
     app.cli.add_command(cli)
+
+    rollup_cli = AppGroup('rollup')
+
+    @rollup_cli.command('rebuild')
+    @click.option('--table', 'tables', multiple=True, type=click.Choice(list(ROLLUP_TABLES)),
+                  help='默认重建 weather 和 soil')
+    @click.option('--region-name', default=None, help='只重建该农场 (及其设备) 的数据')
+    def rollup_rebuild(tables, region_name):
+        """
+        按原始数据重建预聚合表, 用于历史数据补录
+        """
+        started = time.perf_counter()
+
+        scopes = {'weather': None, 'soil': None}
+        if region_name:
+            region = Region.query.filter_by(region_name=region_name).first()
+            if not region:
+                print(f"ERROR!!!: 农场 '{region_name}' 不存在")
+                return
+
+            scopes = {
+                'weather': [region.region_id],
+                'soil': [device.device_id for device in Device.query.filter_by(region_id=region.region_id).all()],
+            }
+
+        for table in tables or list(ROLLUP_TABLES):
+            if scopes[table] == []:
+                continue
+
+            written = rebuild_rollups(table, scopes[table])
+            print(f'{ROLLUP_TABLES[table]}: {written} 条')
+
+        print(f'SUCCESS!!!: flask rollup rebuild (用时 {time.perf_counter() - started:.2f}s)')
+
+    app.cli.add_command(rollup_cli)
+
+    partition_cli = AppGroup('partition')
+
+    @partition_cli.command('enable')
+    @click.option('--table', 'tables', multiple=True, type=click.Choice(list(PARTITION_TABLES)),
+                  help='默认 weather 和 soil')
+    @click.option('--year-start', type=int, required=True, help='第一个年份分区, 更早的数据也会进入该分区')
+    @click.option('--year-end', type=int, required=True, help='最后一个年份分区, 之后的数据进入 pmax')
+    def partition_enable(tables, year_start, year_end):
+        """
+        weather / soil 按年 RANGE 分区 (仅 MySQL); 已分区的表只从 pmax 中拆出缺少的年份
+        """
+        for table in tables or list(PARTITION_TABLES):
+            try:
+                partitions = partition_table(table, range(year_start, year_end + 1))
+            except Exception as e:
+                print(f'ERROR!!!: flask partition enable -> {table}')
+                print(e)
+                continue
+
+            print(f"{table}: {', '.join(partition['name'] for partition in partitions)}")
+
+        print('SUCCESS!!!: flask partition enable')
+
+    @partition_cli.command('status')
+    def partition_status():
+        """
+        查看各分区的行数 (information_schema 中的估算值)
+        """
+        with db.engine.connect() as connection:
+            for table in PARTITION_TABLES:
+                partitions = get_partitions(connection, table) if connection.dialect.name == 'mysql' else []
+
+                if not partitions:
+                    print(f'{table}: 未分区')
+                for partition in partitions:
+                    print(f"{table}.{partition['name']}: < {partition['less_than']}, {partition['rows']} 条")
+
+    app.cli.add_command(partition_cli)
+
+    schema_cli = AppGroup('schema')
+
+    @schema_cli.command('upgrade')
+    @click.option('--dry-run', is_flag=True, help='只打印 DDL, 不执行')
+    def schema_upgrade(dry_run):
+        """
+        已有数据库补充新增的表和字段, 不删除数据 (flask init static 会重建所有表)
+        """
+        try:
+            changes = upgrade_schema(dry_run)
+        except Exception as e:
+            print('ERROR!!!: flask schema upgrade')
+            print(e)
+            return
+
+        if not changes:
+            print('数据库已是最新, 无需升级')
+
+        for change in changes:
+            print(f"{change['ddl']};")
+
+        if dry_run:
+            return
+
+        for change in changes:
+            if change['column']:
+                print(f"WARNING!!!: {change['table']}.{change['column']}: "
+                      f"{SCHEMA_COLUMNS[change['table']][change['column']]}")
+
+        # 新建的预聚合表为空, 聚合查询会优先使用预聚合表, 需要按已有的原始数据重建
+        created = {change['table'] for change in changes if change['column'] is None}
+        for (table, rollup_table) in ROLLUP_TABLES.items():
+            if rollup_table in created:
+                print(f'{rollup_table}: {rebuild_rollups(table)} 条')
+
+        print('SUCCESS!!!: flask schema upgrade')
+
+    app.cli.add_command(schema_cli)
@@ -0,0 +1,58 @@
+import gzip
+
+import config
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html', 'text/csv')
+
+# 压缩后的响应使用带编码后缀的 ETag (强 ETag 要求字节一致)
+ENCODINGS = ('br', 'gzip')
+
+
+def negotiate_encoding():
+    """
+    按 Accept-Encoding 的 q 值选择 br / gzip, 相同时优先 br
+    """
+    accepted = request.accept_encodings
+    candidates = [encoding for encoding in ENCODINGS if accepted[encoding] and (encoding != 'br' or brotli)]
+
+    return max(candidates, key=lambda encoding: accepted[encoding], default=None)
+
+
+def compress_response(response):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed \
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if (response.content_length or 0) < config.COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        data = brotli.compress(data, quality=config.COMPRESS_BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=config.COMPRESS_GZIP_LEVEL, mtime=0)
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
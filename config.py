@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 
 # mysql
@@ -8,7 +9,22 @@ USERNAME = 'root' # webgis_nefu root
 PASSWORD = '2618'
 CHARSET = 'utf8mb4'
 DB_URI = f'mysql+pymysql://{USERNAME}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}?charset={CHARSET}'
-SQLALCHEMY_DATABASE_URI = DB_URI
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI', DB_URI)  # 本地测试可用 sqlite:///webgis.db
+
+# 连接池 (API 与数据导入共用)
+DB_POOL_SIZE = 10
+DB_MAX_OVERFLOW = 10
+DB_POOL_RECYCLE = 3600  # 秒, 需小于 MySQL wait_timeout
+DB_POOL_TIMEOUT = 30  # 等待空闲连接的秒数
+
+SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS |= {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_timeout': DB_POOL_TIMEOUT,
+    }
 
 # flask_login
 # SESSION_SECRET_KEY = 'xiaoruiruiecho'
@@ -20,3 +36,49 @@ JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=30)
 # redis
 REDIS_PASSWORD = ''
 REDIS_URL = f'redis://localhost:6379/0' # 'redis://:{REDIS_PASSWORD}@localhost:6379/0'
+
+# 参考数据缓存 (cache.py)
+CACHE_TTL = 24 * 3600  # Redis 中缓存数据的过期时间 (秒)
+CACHE_VERSION_CHECK_INTERVAL = 1  # 进程内缓存向 Redis 检查版本号的间隔 (秒)
+
+# 天气预报缓存 (forecast.py)
+FORECAST_UPDATE_INTERVAL = 3600  # 数据源更新周期 (秒), 缓存在下一个周期开始时过期
+FORECAST_UPDATE_DELAY = 300  # 数据源在周期开始后多久发布新数据 (秒)
+FORECAST_STALE_TTL = 24 * 3600  # 过期数据在 Redis 中保留的时间, 刷新期间及数据源故障时返回旧数据 (秒)
+FORECAST_TIMEOUT = 10  # 请求数据源的超时时间 (秒)
+FORECAST_WAIT_INTERVAL = 0.05  # 没有缓存时等待其他请求写入缓存的轮询间隔 (秒)
+FORECAST_ERROR_BACKOFF = 30  # 数据源请求失败后多久内不再请求 (秒)
+FORECAST_CONCURRENCY = 8  # 批量查询时并发请求数据源的线程数
+FORECAST_MAX_DAYS = 15  # 数据源提供的预报天数, predict_days 的上限
+
+# ingest
+UPLOAD_ROOT = './uploads'  # 上传文件按内容哈希存储在 <UPLOAD_ROOT>/<kind>/ 下
+INGEST_CHUNK_SIZE = 5000  # 每个事务批量写入的行数
+INGEST_WORKERS = 2  # 后台导入进程数
+INGEST_JOB_TTL = 7 * 24 * 3600  # 导入任务状态在 Redis 中的保留时间 (秒)
+
+# feature sync (ArcGIS applyEdits)
+FEATURE_SYNC_BATCH_SIZE = 500  # 每批最多要素数
+FEATURE_SYNC_MAX_BYTES = 1024 * 1024  # 每批 updates 最大字节数
+FEATURE_SYNC_CONCURRENCY = 4  # 并发提交的批次数
+FEATURE_SYNC_RETRIES = 3  # 每批失败重试次数
+FEATURE_SYNC_BACKOFF = 0.5  # 重试退避基数 (秒)
+FEATURE_SYNC_TIMEOUT = 60  # 单次请求超时 (秒)
+
+# 导出
+EXPORT_CHUNK_SIZE = 10000  # 导出时每次从服务端游标读取的行数
+EXPORT_MAX_YEARS = 5  # 一次导出的最大年份跨度
+EXPORT_CACHE_ROOT = './exports'  # 导出文件缓存目录, 文件名包含数据版本号
+EXPORT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存目录大小上限, 超出时按最近访问时间淘汰
+
+# 响应压缩 (compression.py)
+COMPRESS_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4  # 动态内容用较低的压缩等级, 兼顾 CPU
+
+# 响应格式
+DATA_TIMEZONE = 'Asia/Shanghai'  # 数据库时间字段 (不带时区) 的时区, shape=columns 转换 epoch 毫秒时使用
+
+# 游标分页
+PAGE_LIMIT_DEFAULT = 500
+PAGE_LIMIT_MAX = 5000
@@ -1,9 +1,14 @@
+import hashlib
 from functools import wraps
 
-from flask import jsonify, request
+from flask import jsonify, make_response, request
 from flask_jwt_extended import verify_jwt_in_request
 
+from binary import negotiate_format, render_result
+from cache import get_dataset_version
+from compression import ENCODINGS
 from extensions import redis_client
+from models.region import Region, Precinct
 from utils import get_current_user
 
 
@@ -81,3 +86,66 @@ def role_required(desired_roles: [str]):
         return inner
 
     return wrapper
+
+
+def region_scope():
+    """
+    conditional_get 的范围: 请求参数 region_name 对应的 region_id
+    """
+    region = Region.get_by_name(request.args.get('region_name'))
+    return region.region_id if region else None
+
+
+def precinct_scope():
+    """
+    conditional_get 的范围: 当前管理员所管理区域的 region_id
+    """
+    precinct = Precinct.query.filter_by(user_id=get_current_user().user_id).first()
+    return precinct.region_id if precinct else None
+
+
+def conditional_get(dataset: str, get_scope):
+    """
+    条件请求: ETag 由数据集版本号和查询参数得出, 不需要对响应体求哈希
+    If-None-Match 命中时直接返回 304, 不执行查询; 需要放在登录和角色校验之后
+    同时按 Accept 输出 JSON / MessagePack / Arrow (binary.render_result), 二进制格式的 ETag 带格式后缀
+    """
+
+    def wrapper(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            scope = get_scope()
+            version = get_dataset_version(dataset, scope) if scope is not None else None
+
+            if version is None:
+                return render_result(func(*args, **kwargs))
+
+            etag = f'{dataset}-{scope}-v{version}-{hashlib.sha1(request.query_string).hexdigest()[:16]}'
+
+            binary_format = negotiate_format()
+            if binary_format:
+                etag = f'{etag}-{binary_format}'
+
+            # 压缩后的响应带有编码后缀, 见 compression.compress_response
+            for tag in [etag] + [f'{etag}-{encoding}' for encoding in ENCODINGS]:
+                if request.if_none_match.contains(tag):
+                    response = make_response('', 304)
+                    response.set_etag(tag)
+                    response.vary.update(('Accept', 'Accept-Encoding'))
+                    return response
+
+            result = func(*args, **kwargs)
+
+            # 只缓存成功的结果
+            if not isinstance(result, dict) or result.get('code') != 0:
+                return render_result(result)
+
+            response = render_result(result)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'  # 每次使用前都要向服务端验证
+
+            return response
+
+        return inner
+
+    return wrapper
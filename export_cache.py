@@ -0,0 +1,161 @@
+import os
+import time
+import uuid
+
+import config
+from cache import bump_dataset_versions
+from exports import EXPORT_MIMETYPES, content_disposition, export_chunks, export_response
+from extensions import db, redis_client
+from flask import Response, request, send_file
+from sqlalchemy import select
+
+EXPORT_VERSION_PREFIX = 'export:version:'
+
+
+def _version_key(kind: str, region_id: int, year: int) -> str:
+    return f'{EXPORT_VERSION_PREFIX}{kind}:{region_id}:{year}'
+
+
+def get_data_version(kind: str, region_id: int, years: range):
+    """
+    (数据类型, 农场, 年份范围) 的数据版本, 由各年份的版本号拼接, 导入写入任一年份时改变; Redis 不可用时返回 None
+    """
+    try:
+        versions = redis_client.mget([_version_key(kind, region_id, year) for year in years])
+    except Exception as e:
+        print(f'WARNING!!!: 读取导出数据版本失败, 不使用导出缓存: {e}')
+        return None
+
+    return '.'.join(str(int(version or 0)) for version in versions)
+
+
+def bump_data_versions(connection, table: str, touched: set):
+    """
+    导入后调用: touched 为实际写入的 (范围字段值, 月份) 集合 (ingest.bulk_write), 土壤数据按设备所属农场换算
+    同时递增列表接口的数据集版本 (条件请求的 ETag)
+    """
+    if not touched:
+        return
+
+    values = {value for (value, _) in touched}
+    region_ids = {value: value for value in values}
+    if table == 'soil':
+        device = db.metadata.tables['device']
+        region_ids = dict(connection.execute(select(device.c.device_id, device.c.region_id).where(
+            device.c.device_id.in_([int(value) for value in values]))).all())
+
+    keys = {_version_key(table, int(region_ids[value]), month.year)
+            for (value, month) in touched if region_ids.get(value) is not None}
+
+    try:
+        for key in keys:
+            redis_client.incr(key)
+    except Exception as e:
+        print(f'WARNING!!!: 更新导出数据版本失败: {e}')
+
+    bump_dataset_versions(table, [int(region_ids[value]) for value in values if region_ids.get(value) is not None])
+
+
+def _cache_prefix(kind: str, region_id: int, years: range) -> str:
+    return f'{kind}_{region_id}_{years[0]}-{years[-1]}_v'
+
+
+def evict(keep: str = None):
+    """
+    按最近访问时间 (atime) 淘汰, 使缓存目录总大小不超过 EXPORT_CACHE_MAX_BYTES
+    """
+    root = config.EXPORT_CACHE_ROOT
+    files = []
+
+    for entry in os.scandir(root):
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            files.append((stat.st_atime, stat.st_size, entry.path))
+
+    total = sum(size for (_, size, _) in files)
+
+    for (_, size, path) in sorted(files):
+        if total <= config.EXPORT_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def tee_to_cache(chunks, path: str, prefix: str):
+    """
+    边发送边写入缓存文件, 完整写完后才改名为正式文件 (客户端中途断开时丢弃)
+    """
+    temp = f'{path}.{uuid.uuid4().hex}.tmp'
+    completed = False
+
+    try:
+        with open(temp, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                yield chunk
+
+        os.replace(temp, path)
+        completed = True
+
+        # 同一范围同一格式的旧版本已不会再被访问
+        root, extension = os.path.dirname(path), os.path.splitext(path)[1]
+        for name in os.listdir(root):
+            stale = os.path.join(root, name)
+            if name.startswith(os.path.basename(prefix)) and name.endswith(extension) and stale != path:
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+        evict(keep=path)
+    finally:
+        if not completed and os.path.exists(temp):
+            os.remove(temp)
+
+
+def cached_export_response(kind: str, region_id: int, years: range, model, statement, filename: str,
+                           export_format: str) -> Response:
+    """
+    导出文件缓存: 以 (类型, 农场, 年份范围, 格式, 数据版本) 为键
+    命中时作为静态文件发送 (支持 If-None-Match / If-Modified-Since), 未命中时边生成边发送并写入缓存
+    """
+    version = get_data_version(kind, region_id, years)
+
+    if version is None:
+        return export_response(model, statement, filename, export_format)
+
+    # 同一版本的内容一致, 但 xlsx 中的压缩时间戳不同, 使用弱 ETag
+    etag = f'{kind}-{region_id}-{years[0]}-{years[-1]}-v{version}-{export_format}'
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    root = config.EXPORT_CACHE_ROOT
+    os.makedirs(root, exist_ok=True)
+
+    prefix = os.path.join(root, _cache_prefix(kind, region_id, years))
+    path = f'{prefix}{version}.{export_format}'
+
+    if os.path.exists(path):
+        # 只更新访问时间, 用于 LRU 淘汰; 修改时间作为 Last-Modified
+        stat = os.stat(path)
+        os.utime(path, (time.time(), stat.st_mtime))
+
+        response = send_file(os.path.abspath(path), mimetype=EXPORT_MIMETYPES[export_format], as_attachment=True,
+                             download_name=filename, conditional=True, etag=False, last_modified=stat.st_mtime)
+    else:
+        chunks = export_chunks(db.engine, model, statement, export_format)
+        response = Response(tee_to_cache(chunks, path, prefix), mimetype=EXPORT_MIMETYPES[export_format],
+                            headers={'Content-Disposition': content_disposition(filename)})
+
+    response.set_etag(etag, weak=True)
+
+    return response
@@ -0,0 +1,255 @@
+import io
+import zipfile
+from datetime import datetime
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+import config
+import pandas as pd
+from extensions import db
+from flask import Response
+from serializers import format_frame
+
+XLSX_MAX_ROWS = 1048576  # 单个 sheet 最大行数 (含表头), 超出后续写到下一个 sheet
+
+EXPORT_MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+# 列式格式保留原始类型 (时间为 timestamp), 不做 serialize() 的字符串格式化
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_DOC_RELS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+
+def stream_frames(engine, statement, chunk_size: int = None, dates: dict = None, pairs: dict = None):
+    """
+    服务端游标 (stream_results) 分块读取, 每块格式化为一个 DataFrame, 内存只保留一块
+    使用独立连接, 生成器在请求上下文结束后仍可继续执行
+    """
+    chunk_size = chunk_size or config.EXPORT_CHUNK_SIZE
+
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(statement)
+        columns = list(result.keys())
+
+        for rows in result.partitions(chunk_size):
+            yield format_frame(pd.DataFrame(rows, columns=columns), dates, pairs)
+
+
+def model_frames(engine, model, statement, chunk_size: int = None):
+    """
+    model.serialize_query() 派生的查询 -> 与 model.serialize() 字段一致的分块 DataFrame
+    """
+    return stream_frames(engine, statement, chunk_size, getattr(model, 'SERIALIZE_DATES', None),
+                         getattr(model, 'SERIALIZE_PAIRS', None))
+
+
+def iter_csv(frames):
+    # 带 BOM, Excel 直接打开时中文不乱码
+    yield '\ufeff'.encode()
+
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, lineterminator='\r\n').encode()
+        header = False
+
+
+class _Pipe(io.RawIOBase):
+    """
+    不可 seek 的输出流: zipfile 写入的数据暂存在这里, 由生成器取走
+    """
+
+    def __init__(self):
+        super(_Pipe, self).__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _cell(value) -> str:
+    if value is None:
+        return '<c/>'
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value!r}</v></c>'
+
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _row(values) -> str:
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+def _workbook_parts(sheets: int) -> dict[str, str]:
+    names = range(1, sheets + 1)
+
+    return {
+        '[Content_Types].xml': _XML_HEADER + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + ''.join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                      f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for i in names)
+            + '</Types>'),
+        '_rels/.rels': _XML_HEADER + (
+            f'<Relationships xmlns="{_RELS_NS}">'
+            f'<Relationship Id="rId1" Type="{_DOC_RELS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'),
+        'xl/workbook.xml': _XML_HEADER + (
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_DOC_RELS}"><sheets>'
+            + ''.join(f'<sheet name="Sheet{i}" sheetId="{i}" r:id="rId{i}"/>' for i in names)
+            + '</sheets></workbook>'),
+        'xl/_rels/workbook.xml.rels': _XML_HEADER + (
+            f'<Relationships xmlns="{_RELS_NS}">'
+            + ''.join(f'<Relationship Id="rId{i}" Type="{_DOC_RELS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                      for i in names)
+            + '</Relationships>'),
+    }
+
+
+def iter_xlsx(frames):
+    """
+    流式 xlsx: 工作表 XML 按块写入 zip 输出流 (inlineStr, 不需要共享字符串表), 不落盘, 内存只保留一块
+    """
+    pipe = _Pipe()
+    sheets, sheet, rows = 0, None, 0
+    header = None
+
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for frame in frames:
+            header = header or _row(frame.columns)
+            records = list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+
+            while records:
+                if sheet is None or rows >= XLSX_MAX_ROWS:
+                    if sheet is not None:
+                        sheet.write(b'</sheetData></worksheet>')
+                        sheet.close()
+
+                    sheets += 1
+                    sheet = archive.open(f'xl/worksheets/sheet{sheets}.xml', 'w', force_zip64=True)
+                    sheet.write((_XML_HEADER + f'<worksheet xmlns="{_MAIN_NS}"><sheetData>' + header).encode())
+                    rows = 1
+
+                size = min(len(records), XLSX_MAX_ROWS - rows)
+                sheet.write(''.join(_row(record) for record in records[:size]).encode())
+                records = records[size:]
+                rows += size
+
+            yield pipe.drain()
+
+        if sheet is None:
+            sheets += 1
+            sheet = archive.open(f'xl/worksheets/sheet{sheets}.xml', 'w')
+            sheet.write((_XML_HEADER + f'<worksheet xmlns="{_MAIN_NS}"><sheetData>' + (header or '')).encode())
+
+        sheet.write(b'</sheetData></worksheet>')
+        sheet.close()
+
+        for (name, content) in _workbook_parts(sheets).items():
+            archive.writestr(name, content)
+
+    yield pipe.drain()
+
+
+def arrow_schema(statement):
+    """
+    由查询的列类型确定 Arrow schema, 保证各分块类型一致 (某块全为 NULL 时也不会推断为 null 类型)
+    """
+    import pyarrow as pa
+
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp('us')}
+
+    return pa.schema([(column.name, types[column.type.python_type]) for column in statement.selected_columns])
+
+
+def _record_batches(frames, schema):
+    import pyarrow as pa
+
+    for frame in frames:
+        yield pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def iter_parquet(frames, schema):
+    """
+    每块写为一个 row group, footer 在最后写出, 不需要 seek
+    """
+    import pyarrow.parquet as pq
+
+    pipe = _Pipe()
+
+    with pq.ParquetWriter(pipe, schema, compression='zstd') as writer:
+        for batch in _record_batches(frames, schema):
+            writer.write_batch(batch)
+            yield pipe.drain()
+
+    yield pipe.drain()
+
+
+def iter_arrow(frames, schema):
+    """
+    Arrow IPC 文件格式 (Feather V2), pandas.read_feather / pyarrow.ipc.open_file 可直接读取
+    """
+    import pyarrow as pa
+
+    pipe = _Pipe()
+
+    with pa.ipc.new_file(pipe, schema) as writer:
+        for batch in _record_batches(frames, schema):
+            writer.write_batch(batch)
+            yield pipe.drain()
+
+    yield pipe.drain()
+
+
+EXPORT_WRITERS = {
+    'xlsx': iter_xlsx,
+    'csv': iter_csv,
+    'parquet': iter_parquet,
+    'arrow': iter_arrow,
+}
+
+
+def export_chunks(engine, model, statement, export_format: str):
+    """
+    查询 -> 导出文件的字节流 (分块)
+    """
+    if export_format in COLUMNAR_FORMATS:
+        return EXPORT_WRITERS[export_format](stream_frames(engine, statement), arrow_schema(statement))
+
+    return EXPORT_WRITERS[export_format](model_frames(engine, model, statement))
+
+
+def content_disposition(filename: str) -> str:
+    return f"attachment; filename=\"{quote(filename)}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def export_response(model, statement, filename: str, export_format: str) -> Response:
+    """
+    边查询边写出的下载响应, 不生成临时文件
+    """
+    # 生成器在视图返回后才执行, 提前取出 engine
+    chunks = export_chunks(db.engine, model, statement, export_format)
+
+    return Response(chunks, mimetype=EXPORT_MIMETYPES[export_format],
+                    headers={'Content-Disposition': content_disposition(filename)})
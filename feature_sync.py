@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+import requests
+from ingest import IngestStats
+from readers import open_reader
+from requests.adapters import HTTPAdapter
+
+_local = threading.local()
+
+# 4xx 中只有请求过多 (429) 可重试; 其余 (字段错误, 结构不匹配, token 失效 498 / 缺少 token 499 等) 原样重试也不会成功
+TRANSIENT_ERROR_CODES = (429,)
+
+
+class TransientError(Exception):
+    """
+    可重试的错误: 超时, 5xx, TRANSIENT_ERROR_CODES
+    """
+    pass
+
+
+def _is_transient(code) -> bool:
+    return isinstance(code, int) and (code in TRANSIENT_ERROR_CODES or code >= 500)
+
+
+class FeatureSyncStats(IngestStats):
+    """
+    applyEdits 推送统计: rows 为服务端返回成功的要素数
+    """
+
+    def __init__(self, name: str):
+        super(FeatureSyncStats, self).__init__(name)
+        self.batches = 0
+        self.failed = 0  # 服务端返回 success=false 的要素数
+        self.failed_batches: list[dict] = []  # 重试后仍失败的批次
+
+    def serialize(self):
+        return super(FeatureSyncStats, self).serialize() | {
+            'batches': self.batches,
+            'failed': self.failed,
+            'failed_batches': self.failed_batches,
+        }
+
+
+def _get_session() -> requests.Session:
+    # 每个线程一个 keep-alive 会话
+    session = getattr(_local, 'session', None)
+
+    if session is None:
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        _local.session = session
+
+    return session
+
+
+def build_batches(frames, batch_size: int, max_bytes: int):
+    """
+    按要素数和请求体大小切分批次, 返回 (要素数, updates JSON 字符串)
+    """
+    features, size = [], 0
+
+    for frame in frames:
+        column0 = frame.columns[0]
+        if column0.lower() != 'objectid':
+            raise Exception('表格第一列必须为 OBJECTID')
+
+        # to_json 一次性完成整块编码 (NaN -> null, 日期 -> epoch 毫秒), 每行一个要素
+        # 字符串中的换行已转义为 \n, 按 '\n' 切分即可, 不逐行解析再编码
+        for attributes in frame.to_json(orient='records', lines=True, force_ascii=False).split('\n'):
+            if not attributes:
+                continue
+
+            feature = '{"attributes":' + attributes + '}'
+            feature_size = len(feature.encode()) + 1
+
+            if features and (len(features) >= batch_size or size + feature_size > max_bytes):
+                yield len(features), '[' + ','.join(features) + ']'
+                features, size = [], 0
+
+            features.append(feature)
+            size += feature_size
+
+    if features:
+        yield len(features), '[' + ','.join(features) + ']'
+
+
+def _check_response(response) -> dict:
+    if response.status_code != 200:
+        error = f'HTTP {response.status_code}: {response.text[:200]}'
+        raise TransientError(error) if _is_transient(response.status_code) else Exception(error)
+
+    result = response.json()
+
+    if 'error' in result:
+        error = json.dumps(result['error'], ensure_ascii=False)
+        raise TransientError(error) if _is_transient(result['error'].get('code')) else Exception(error)
+
+    return result
+
+
+def post_batch(url: str, updates: str, retries: int, timeout: float) -> dict:
+    """
+    提交一个批次, 网络错误 / 超时 / 5xx / 429 时指数退避重试, 其他错误直接失败
+    """
+    # requests.post中的data参数
+    # 默认会将传入的Python字典
+    # 转为x-www-form-urlencoded格式。
+    #
+    # 然而，x-www-form-urlencoded的值要求是一个简单的字符串或标量，
+    # 复杂的嵌套数据（如JSON对象或数组）需要先转成字符串。
+    # 因此 updates 在切分批次时已经序列化为JSON字符串。
+    params = {
+        'f': 'json'
+    }
+
+    data = {
+        "updates": updates
+    }
+
+    for attempt in range(retries + 1):
+        try:
+            return _check_response(_get_session().post(url=url, params=params, data=data, timeout=timeout))
+        except (TransientError, requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+
+            time.sleep(config.FEATURE_SYNC_BACKOFF * 2 ** attempt)
+
+
+def upload_information_data(path: str, url: str, progress=None, batch_size: int = None,
+                            concurrency: int = None) -> FeatureSyncStats:
+    """
+    表格数据分批并发推送到 ArcGIS FeatureServer 的 /applyEdits
+    """
+    batch_size = batch_size or config.FEATURE_SYNC_BATCH_SIZE
+    concurrency = concurrency or config.FEATURE_SYNC_CONCURRENCY
+    stats = FeatureSyncStats('Information')
+
+    reader = open_reader(path)
+    total = reader.count()
+    url += '/applyEdits'
+
+    with stats.phase('write'), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+
+        for (index, (size, updates)) in enumerate(build_batches(reader.frames(), batch_size,
+                                                                config.FEATURE_SYNC_MAX_BYTES)):
+            # 控制排队中的批次数, 避免整表编码后全部堆积在内存中
+            while len(futures) >= concurrency * 2:
+                _collect(next(as_completed(futures)), futures, stats, total, progress)
+
+            future = executor.submit(post_batch, url, updates, config.FEATURE_SYNC_RETRIES,
+                                     config.FEATURE_SYNC_TIMEOUT)
+            futures[future] = (index, size)
+            stats.batches += 1
+
+        while futures:
+            _collect(next(as_completed(futures)), futures, stats, total, progress)
+
+    stats.report()
+
+    if stats.failed_batches:
+        raise Exception(f'{len(stats.failed_batches)}/{stats.batches} 个批次提交失败: '
+                        f'{json.dumps(stats.failed_batches, ensure_ascii=False)}')
+
+    return stats
+
+
+def _collect(future, futures: dict, stats: FeatureSyncStats, total: int, progress):
+    index, size = futures.pop(future)
+
+    try:
+        result = future.result()
+    except Exception as e:
+        stats.failed_batches.append({'batch': index, 'features': size, 'error': str(e)})
+        return
+
+    update_results = result.get('updateResults', [])
+    succeeded = sum(1 for update_result in update_results if update_result.get('success'))
+
+    stats.rows += succeeded
+    stats.failed += len(update_results) - succeeded
+
+    if progress:
+        progress(stats.rows + stats.failed, total)
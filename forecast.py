@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import config
+import requests
+import settings
+from extensions import redis_client
+from redis.exceptions import RedisError
+
+FORECAST_KEY_PREFIX = 'forecast:'
+FORECAST_LOCK_PREFIX = 'forecast:lock:'
+FORECAST_ERROR_PREFIX = 'forecast:error:'
+
+# 只删除自己持有的锁: 锁过期后可能已被其他进程重新获取
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+_executor = None
+
+
+def _forecast_key(city_code: str) -> str:
+    return FORECAST_KEY_PREFIX + city_code
+
+
+def _lock_key(city_code: str) -> str:
+    return FORECAST_LOCK_PREFIX + city_code
+
+
+def _error_key(city_code: str) -> str:
+    return FORECAST_ERROR_PREFIX + city_code
+
+
+def fresh_until(now: float) -> float:
+    """
+    对齐数据源的更新周期: 下一个整点周期 + 发布延迟
+    """
+    interval = config.FORECAST_UPDATE_INTERVAL
+    return (now - config.FORECAST_UPDATE_DELAY) // interval * interval + interval + config.FORECAST_UPDATE_DELAY
+
+
+def fetch_forecast(city_code: str, url: str = None) -> str:
+    """
+    请求天气预报 API, 返回原始 JSON 文本
+    """
+    response = requests.get((url or settings.WEATHER_PREDICT_API_URL) + city_code, timeout=config.FORECAST_TIMEOUT)
+
+    if response.status_code != 200:
+        raise Exception(f'HTTP {response.status_code}: {response.text[:200]}')
+
+    text = response.text
+    if 'forecast' not in (json.loads(text).get('data') or {}):
+        raise Exception(f'天气预报数据格式错误: {text[:200]}')
+
+    return text
+
+
+def _read(city_code: str):
+    data = redis_client.get(_forecast_key(city_code))
+    return json.loads(data) if data else None
+
+
+def _backoff_error(city_code: str):
+    """
+    数据源最近一次请求失败的错误信息, 在 FORECAST_ERROR_BACKOFF 秒内不再请求数据源
+    """
+    error = redis_client.get(_error_key(city_code))
+    return error.decode() if error is not None else None
+
+
+def _refresh(city_code: str, token: str, url: str = None) -> str:
+    """
+    持有锁时调用: 请求数据源并写入缓存, 失败时记录错误 (退避), 无论成功与否都释放锁
+    """
+    try:
+        try:
+            text = fetch_forecast(city_code, url)
+        except Exception as e:
+            redis_client.set(_error_key(city_code), str(e)[:200], ex=config.FORECAST_ERROR_BACKOFF)
+            raise
+
+        entry = {'fresh_until': fresh_until(time.time()), 'text': text}
+        redis_client.set(_forecast_key(city_code), json.dumps(entry, ensure_ascii=False), ex=config.FORECAST_STALE_TTL)
+
+        return text
+    finally:
+        redis_client.eval(_RELEASE_SCRIPT, 1, _lock_key(city_code), token)
+
+
+def _acquire(city_code: str):
+    """
+    获取刷新锁, 成功时返回持有者标识 (释放时校验), 否则返回 None
+    """
+    token = uuid.uuid4().hex
+
+    if redis_client.set(_lock_key(city_code), token, nx=True, ex=config.FORECAST_TIMEOUT * 2):
+        return token
+
+    return None
+
+
+def _refresh_in_background(city_code: str, token: str, url: str = None):
+    try:
+        _refresh(city_code, token, url)
+    except Exception as e:
+        print(f'ERROR!!!: 后台刷新天气预报失败: {city_code}, {e}')
+
+
+def _get_cached(city_code: str, url: str = None) -> str:
+    entry = _read(city_code)
+
+    if entry:
+        if entry['fresh_until'] <= time.time() and not _backoff_error(city_code):
+            token = _acquire(city_code)
+            if token:
+                threading.Thread(target=_refresh_in_background, args=(city_code, token, url), daemon=True).start()
+
+        return entry['text']
+
+    deadline = time.monotonic() + config.FORECAST_TIMEOUT * 2
+
+    while time.monotonic() < deadline:
+        error = _backoff_error(city_code)
+        if error:
+            raise Exception(f'天气预报数据源暂不可用: {error}')
+
+        token = _acquire(city_code)
+        if token:
+            return _refresh(city_code, token, url)
+
+        time.sleep(config.FORECAST_WAIT_INTERVAL)
+
+        entry = _read(city_code)
+        if entry:
+            return entry['text']
+
+    raise Exception(f'等待天气预报超时: {city_code}')
+
+
+def get_forecast(city_code: str, url: str = None) -> str:
+    """
+    按城市代码读取天气预报 (原始 JSON 文本)
+    - 未过期: 直接返回缓存
+    - 已过期: 返回旧数据, 同时只有拿到锁的一个请求在后台刷新
+    - 没有缓存: 拿到锁的请求访问数据源, 其余请求等待其写入缓存 (跨进程合并为一次请求)
+    - 数据源失败后 FORECAST_ERROR_BACKOFF 秒内不再请求: 有旧数据时返回旧数据, 否则直接报错
+    - Redis 不可用时直接请求数据源
+    """
+    try:
+        return _get_cached(city_code, url)
+    except RedisError as e:
+        print(f'WARNING!!!: 读取天气预报缓存失败, 直接请求数据源: {e}')
+        return fetch_forecast(city_code, url)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.FORECAST_CONCURRENCY, thread_name_prefix='forecast')
+
+    return _executor
+
+
+def get_forecasts(city_codes: list[str], url: str = None) -> dict[str, tuple]:
+    """
+    并发读取多个城市的天气预报, 返回 城市代码 -> (JSON 文本, 错误信息), 单个城市失败不影响其他城市
+    """
+    futures = {code: _get_executor().submit(get_forecast, code, url) for code in dict.fromkeys(city_codes)}
+    wait(futures.values(), timeout=config.FORECAST_TIMEOUT * 2)
+
+    results = {}
+    for (code, future) in futures.items():
+        if not future.done():
+            results[code] = (None, '请求天气预报超时')
+        elif future.exception():
+            results[code] = (None, str(future.exception()))
+        else:
+            results[code] = (future.result(), None)
+
+    return results
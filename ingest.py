@@ -0,0 +1,373 @@
+import time
+from contextlib import contextmanager
+
+import config
+import numpy as np
+import pandas as pd
+from export_cache import bump_data_versions
+from extensions import db
+from models.region import Device
+from readers import open_reader
+from rollups import refresh_rollups
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import sqlite
+
+# 表格列名 -> weather 表字段
+WEATHER_COLUMNS = {
+    '空气温度': 'weather_temperature',
+    '空气湿度': 'weather_humidity',
+    '光照': 'weather_illumination',
+    '风速': 'weather_wind_speed',
+    '风向': 'weather_wind_direction',
+    '气压': 'weather_atmospheric_pressure',
+    '降雨量': 'weather_precipitation',
+    '二氧化碳': 'weather_CO2',
+    '氮': 'weather_N',
+    '磷': 'weather_P',
+    '钾': 'weather_K',
+}
+
+# 表格列名前缀 -> soil 表字段, 完整列名为 前缀 + 设备列后缀, 例如 '土壤温度1'
+SOIL_COLUMNS = {
+    '土壤温度': 'soil_temperature',
+    '土壤含水量': 'soil_water',
+    '电导率': 'soil_conductivity',
+    '土壤PH': 'soil_PH',
+    '土壤盐分': 'soil_salt',
+}
+
+# 表 -> 主键 (范围字段, 时间字段)
+TABLE_KEYS = {
+    'weather': ('region_id', 'weather_date'),
+    'soil': ('device_id', 'soil_date'),
+}
+
+INSERT = 'insert'
+UPSERT = 'upsert'
+
+DATE_COLUMN = '采集时间'
+DATE_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+
+class IngestStats:
+    """
+    导入统计: 行数, 各阶段耗时 (parse / convert / write), 速率
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.skipped = 0  # upsert 模式下与库中一致而跳过的行数
+        self.phases: dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.) + time.perf_counter() - start
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        seconds = self.seconds
+        return self.rows / seconds if seconds > 0 else 0.
+
+    def serialize(self):
+        return {
+            'name': self.name,
+            'rows': self.rows,
+            'skipped': self.skipped,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rate, 1),
+            'phases': {name: round(seconds, 3) for (name, seconds) in self.phases.items()}
+        }
+
+    def report(self):
+        print(f"{self.name} 数据导入完成: {self.rows} 条, 跳过 {self.skipped} 条, 用时 {self.seconds:.2f}s, {self.rate:.0f} 条/秒 "
+              f"({', '.join(f'{name} {seconds:.2f}s' for (name, seconds) in self.phases.items())})")
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """
+    向量化解析 '采集时间' 列
+    """
+    return pd.to_datetime(series, format=DATE_FORMAT)
+
+
+def to_records(frame: pd.DataFrame) -> list[dict]:
+    """
+    DataFrame -> executemany 所需的参数列表 (NaN -> NULL, numpy 类型 -> Python 原生类型)
+    """
+    columns = []
+    for name in frame.columns:
+        column = frame[name]
+
+        if pd.api.types.is_datetime64_any_dtype(column):
+            # 微秒精度的 datetime64 转为 object 时即为 datetime.datetime (dt.to_pydatetime 每次调用都有 FutureWarning)
+            values = column.to_numpy(dtype='datetime64[us]').astype(object)
+        else:
+            values = column.astype(object).to_numpy()
+
+        values[pd.isna(column).to_numpy()] = None
+        columns.append(values)
+
+    names = list(frame.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def build_write_statement(connection, table: str, mode: str = INSERT):
+    """
+    批量写入语句, upsert 模式按主键合并 (MySQL: ON DUPLICATE KEY UPDATE, SQLite: ON CONFLICT DO UPDATE)
+    MySQL 上 executemany 由 pymysql 改写为一条多行 VALUES 语句 (cursors.RE_INSERT_VALUES), 语句需保持它能匹配的形式
+    """
+    table = db.metadata.tables[table]
+
+    if mode == INSERT:
+        return insert(table)
+
+    keys = TABLE_KEYS[table.name]
+    dialect = connection.dialect.name
+
+    if dialect == 'mysql':
+        # mysql.insert().on_duplicate_key_update() 在 MySQL 8.0.20+ 上生成 "VALUES (...) AS new ON DUPLICATE KEY UPDATE",
+        # pymysql 不会改写这种语句, executemany 退化为逐行执行; 这里使用 VALUES(col) 写法
+        quote = connection.dialect.identifier_preparer.quote
+        names = [column.name for column in table.columns]
+
+        return text(f"INSERT INTO {quote(table.name)} ({', '.join(quote(name) for name in names)}) "
+                    f"VALUES ({', '.join(':' + name for name in names)}) ON DUPLICATE KEY UPDATE "
+                    + ', '.join(f'{quote(name)} = VALUES({quote(name)})' for name in names if name not in keys))
+
+    if dialect == 'sqlite':
+        statement = sqlite.insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column.name: statement.excluded[column.name] for column in table.columns if column.name not in keys})
+
+    raise Exception(f'upsert 不支持的数据库: {dialect}')
+
+
+def fetch_existing(connection, table: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    读取库中与当前分块 (相同范围字段, 相同时间区间) 重叠的数据
+    """
+    table = db.metadata.tables[table]
+    scope, date = TABLE_KEYS[table.name]
+
+    statement = select(*[table.c[column] for column in frame.columns]).where(
+        table.c[scope].in_([int(value) for value in frame[scope].unique()]),
+        table.c[date] >= frame[date].min().to_pydatetime(),
+        table.c[date] <= frame[date].max().to_pydatetime())
+
+    existing = pd.DataFrame(connection.execute(statement).all(), columns=list(frame.columns))
+    existing[date] = pd.to_datetime(existing[date])
+
+    return existing
+
+
+def skip_unchanged(connection, table: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    upsert 预处理: 只保留库中不存在或数值有变化的行
+    """
+    keys = list(TABLE_KEYS[table])
+    frame = frame.drop_duplicates(keys, keep='last')
+
+    existing = fetch_existing(connection, table, frame)
+    if existing.empty:
+        return frame
+
+    merged = frame.merge(existing, on=keys, how='left', suffixes=('', '_existing'), indicator=True)
+    changed = (merged['_merge'] == 'left_only').to_numpy()
+
+    for column in frame.columns:
+        if column in keys:
+            continue
+
+        # 库中为单精度 FLOAT, 按相对误差比较
+        incoming = merged[column].astype('float64').to_numpy()
+        stored = merged[column + '_existing'].astype('float64').to_numpy()
+        changed |= ~np.isclose(incoming, stored, rtol=1e-6, atol=1e-9, equal_nan=True)
+
+    return frame[changed]
+
+
+def bulk_write(connection, table: str, frames, stats: IngestStats, total: int = None, progress=None,
+               mode: str = INSERT) -> set:
+    """
+    分块事务批量写入: 每个分块一个事务, 一次 executemany
+    返回实际写入的 (范围字段值, 所在月份) 集合, 用于重算预聚合和更新导出数据版本
+    """
+    statement = build_write_statement(connection, table, mode)
+    scope, date = TABLE_KEYS[table]
+    touched = set()
+
+    for frame in frames:
+        with connection.begin():
+            if mode == UPSERT:
+                with stats.phase('diff'):
+                    size = len(frame)
+                    frame = skip_unchanged(connection, table, frame)
+                    stats.skipped += size - len(frame)
+
+            with stats.phase('convert'):
+                records = to_records(frame)
+
+            if records:
+                with stats.phase('write'):
+                    connection.execute(statement, records)
+
+                stats.rows += len(records)
+
+                months = pd.DataFrame({scope: frame[scope], date: frame[date].dt.to_period('M').dt.to_timestamp()})
+                touched.update((int(value), month) for (value, month) in
+                               months.drop_duplicates().itertuples(index=False, name=None))
+
+        print(f"正在写入 {table} 数据: 写入 {stats.rows} 条, 跳过 {stats.skipped} 条, 共 {total or '?'} 条, "
+              f"{stats.rate:.0f} 条/秒......")
+
+        if progress:
+            progress(stats.rows + stats.skipped, total)
+
+    return touched
+
+
+def convert_chunks(chunks, convert, stats: IngestStats):
+    """
+    逐块读取 (计入 parse) 并转换 (计入 convert)
+    """
+    chunks = iter(chunks)
+
+    while True:
+        with stats.phase('parse'):
+            chunk = next(chunks, None)
+
+        if chunk is None:
+            return
+
+        with stats.phase('convert'):
+            frame = convert(chunk)
+
+        yield frame
+
+
+def convert_weather_frame(df: pd.DataFrame, region_id: int) -> pd.DataFrame:
+    frame = df[list(WEATHER_COLUMNS)].astype('float64').rename(columns=WEATHER_COLUMNS)
+    frame.insert(0, 'weather_date', parse_dates(df[DATE_COLUMN]))
+    frame.insert(0, 'region_id', region_id)
+
+    return frame
+
+
+def upload_weather_data(path: str, region_id: int, chunk_size: int = None, progress=None,
+                        mode: str = UPSERT) -> IngestStats:
+    """
+    批量导入天气数据, upsert 模式下重复上传重叠的时间段只会写入新增或变化的行
+    """
+    chunk_size = chunk_size or config.INGEST_CHUNK_SIZE
+    stats = IngestStats('Weather')
+
+    reader = open_reader(path)
+    chunks = reader.frames([DATE_COLUMN] + list(WEATHER_COLUMNS), chunk_size)
+    frames = convert_chunks(chunks, lambda chunk: convert_weather_frame(chunk, region_id), stats)
+
+    # 与 API 共用连接池
+    with db.engine.connect() as connection:
+        touched = bulk_write(connection, 'weather', frames, stats, reader.count(), progress, mode)
+
+        with stats.phase('rollup'):
+            refresh_rollups(connection, 'weather', touched)
+
+        bump_data_versions(connection, 'weather', touched)
+
+    stats.report()
+
+    return stats
+
+
+def resolve_soil_devices(region_id: int = None, suffixes: set[str] = None) -> dict[str, int]:
+    """
+    从数据库解析 列后缀 -> device_id 映射, suffixes 为表格中出现的列后缀
+    不指定农场时 (只用于初始化数据), 同一列后缀对应多个设备则报错, 避免写入其他农场的设备
+    """
+    query = Device.query.filter(Device.device_column_suffix.isnot(None))
+    if region_id is not None:
+        query = query.filter_by(region_id=region_id)
+    if suffixes is not None:
+        query = query.filter(Device.device_column_suffix.in_(list(suffixes)))
+
+    devices = {}
+    for device in query.all():
+        suffix = device.device_column_suffix
+        if suffix in devices and devices[suffix] != device.device_id:
+            raise Exception(f'列后缀 {suffix} 对应多个设备 ({devices[suffix]}, {device.device_id}), 请指定农场')
+
+        devices[suffix] = device.device_id
+
+    return devices
+
+
+def melt_soil_frame(df: pd.DataFrame, devices: dict[str, int]) -> pd.DataFrame:
+    """
+    宽表 (每个设备一组列) -> 长表 (device_id, soil_date, 各项指标)
+    """
+    soil_date = parse_dates(df[DATE_COLUMN])
+
+    blocks = []
+    for (suffix, device_id) in devices.items():
+        block = df[[prefix + suffix for prefix in SOIL_COLUMNS]].astype('float64')
+        block.columns = list(SOIL_COLUMNS.values())
+        block.insert(0, 'soil_date', soil_date)
+        block.insert(0, 'device_id', device_id)
+        blocks.append(block)
+
+    return pd.concat(blocks, ignore_index=True)
+
+
+def upload_soil_data(path: str, region_id: int = None, chunk_size: int = None, progress=None,
+                     mode: str = UPSERT) -> IngestStats:
+    """
+    批量导入土壤数据, 按分块 melt 并写入, 长表不会一次性全部展开
+    """
+    chunk_size = chunk_size or config.INGEST_CHUNK_SIZE
+    stats = IngestStats('Soil')
+
+    reader = open_reader(path)
+
+    with stats.phase('parse'):
+        columns = reader.columns()
+        suffixes = {column[len(prefix):] for column in columns for prefix in SOIL_COLUMNS if column.startswith(prefix)}
+
+        devices = resolve_soil_devices(region_id, suffixes)
+
+        unknown = suffixes - set(devices)
+        if unknown:
+            print(f"WARNING!!!: 以下列后缀没有对应的设备, 已跳过: {sorted(unknown)}")
+
+        devices = {suffix: device_id for (suffix, device_id) in devices.items() if suffix in suffixes}
+        if not devices:
+            raise Exception('表格中没有可以匹配到设备的土壤数据列')
+
+        count = reader.count()
+
+    usecols = [DATE_COLUMN] + [prefix + suffix for suffix in devices for prefix in SOIL_COLUMNS]
+    chunks = reader.frames(usecols, max(1, chunk_size // len(devices)))
+    frames = convert_chunks(chunks, lambda chunk: melt_soil_frame(chunk, devices), stats)
+
+    with db.engine.connect() as connection:
+        touched = bulk_write(connection, 'soil', frames, stats, count * len(devices) if count is not None else None,
+                             progress, mode)
+
+        with stats.phase('rollup'):
+            refresh_rollups(connection, 'soil', touched)
+
+        bump_data_versions(connection, 'soil', touched)
+
+    stats.report()
+
+    return stats
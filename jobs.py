@@ -0,0 +1,165 @@
+import json
+import multiprocessing
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import config
+from extensions import redis_client
+from feature_sync import upload_information_data
+from ingest import upload_weather_data, upload_soil_data
+from models.upload import Upload
+
+JOB_KEY_PREFIX = 'ingest:job:'
+
+# 任务类型 -> 导入函数, 导入函数需支持 progress(rows, total) 回调
+JOB_HANDLERS = {
+    'weather': upload_weather_data,
+    'soil': upload_soil_data,
+    'information': upload_information_data,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # spawn: 子进程重新加载 app, 不继承父进程的数据库连接和线程
+            _executor = ProcessPoolExecutor(max_workers=config.INGEST_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor):
+    """
+    子进程异常退出 (崩溃, OOM 被杀) 后进程池不可再用, 下次提交时重新创建
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_key(job_id: str) -> str:
+    return JOB_KEY_PREFIX + job_id
+
+
+def _update_job(job_id: str, /, **fields):
+    key = _job_key(job_id)
+    redis_client.hset(key, mapping={field: '' if value is None else value for (field, value) in fields.items()})
+    redis_client.expire(key, config.INGEST_JOB_TTL)
+
+
+def get_job(job_id: str):
+    job = redis_client.hgetall(_job_key(job_id))
+    if not job:
+        return None
+
+    job = {field.decode(): value.decode() for (field, value) in job.items()}
+
+    for field in ('user_id', 'rows', 'total'):
+        job[field] = int(job[field]) if job.get(field) else None
+    for field in ('rate', 'created', 'started', 'finished'):
+        job[field] = float(job[field]) if job.get(field) else None
+
+    job['error'] = job.get('error') or None
+    job['result'] = json.loads(job['result']) if job.get('result') else None
+
+    return job
+
+
+def submit_job(kind: str, *args, user_id: int = None, upload: dict = None) -> str:
+    """
+    提交导入任务, 立即返回任务ID, 进度记录在 Redis 中
+    user_id: 提交任务的用户, 只有该用户可以查询任务进度
+    upload: {'upload_hash', 'upload_target', 'upload_filename'}, 导入成功后写入上传清单
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'未知的任务类型: {kind}')
+
+    job_id = uuid.uuid4().hex
+    _update_job(job_id, job_id=job_id, kind=kind, user_id=user_id, status='queued', rows=0, total=None, rate=0,
+                error=None, result=None, created=time.time(), started=None, finished=None)
+
+    try:
+        executor = _get_executor()
+
+        try:
+            future = executor.submit(_run_job, job_id, kind, args, upload)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            executor = _get_executor()
+            future = executor.submit(_run_job, job_id, kind, args, upload)
+    except Exception as e:
+        _update_job(job_id, status='failure', error=str(e), finished=time.time())
+        raise
+
+    future.add_done_callback(lambda done: _on_job_done(job_id, executor, done))
+
+    return job_id
+
+
+def _on_job_done(job_id: str, executor: ProcessPoolExecutor, future):
+    """
+    父进程中回调: _run_job 自身会记录导入失败, 这里只处理子进程没能记录的情况 (进程崩溃, 任务被取消)
+    """
+    try:
+        error = future.exception()
+    except CancelledError:
+        error = Exception('任务已取消')
+
+    if error is None:
+        return
+
+    print(f'ERROR!!!: 导入任务异常结束: {job_id}, {error!r}')
+
+    try:
+        _update_job(job_id, status='failure', error=str(error) or repr(error), finished=time.time())
+    except Exception as e:
+        print(f'ERROR!!!: 更新任务状态失败: {job_id}, {e}')
+
+    if isinstance(error, BrokenProcessPool):
+        _discard_executor(executor)
+
+
+def _run_job(job_id: str, kind: str, args: tuple, upload: dict = None):
+    # 子进程中运行: 需要 app 上下文 (数据库, Redis)
+    from app import app
+
+    with app.app_context():
+        started = time.time()
+        _update_job(job_id, status='running', started=started)
+
+        def progress(rows, total=None):
+            elapsed = time.time() - started
+            _update_job(job_id, rows=rows, total=total, rate=round(rows / elapsed, 1) if elapsed > 0 else 0)
+
+        try:
+            stats = JOB_HANDLERS[kind](*args, progress=progress)
+        except Exception as e:
+            traceback.print_exc()
+            _update_job(job_id, status='failure', error=str(e), finished=time.time())
+            return
+
+        result = stats.serialize() if stats else None
+
+        if upload:
+            try:
+                Upload.record(upload_kind=kind, upload_rows=result['rows'] if result else None, **upload)
+            except Exception as e:
+                print("ERROR!!!: jobs.py -> _run_job() -> Upload.record()")
+                print(e)
+
+        _update_job(job_id, status='success', finished=time.time(),
+                    result=json.dumps(result) if result else None)
@@ -0,0 +1,45 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    使用 orjson 编码响应 (比标准库 json 快数倍), 未安装 orjson 时与默认实现一致
+    - 不排序字段: 字段顺序与查询一致, 省去每行一次的排序
+    - 直接输出 UTF-8, 不转义中文
+    - datetime 等类型仍交给 DefaultJSONProvider.default, 输出格式不变
+    """
+
+    sort_keys = False
+
+    def _encode(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY |
+                            orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def dumps(self, obj, **kwargs) -> str:
+        # 带 indent / cls 等参数时交给标准库
+        if orjson is None or kwargs:
+            return super(FastJSONProvider, self).dumps(obj, **kwargs)
+
+        try:
+            return self._encode(obj).decode()
+        except TypeError:  # orjson 不支持的值, 例如超过 64 位的整数
+            return super(FastJSONProvider, self).dumps(obj)
+
+    def response(self, *args, **kwargs):
+        # debug 模式下保留默认的缩进输出
+        if orjson is None or self._app.debug:
+            return super(FastJSONProvider, self).response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+
+        try:
+            data = self._encode(obj)
+        except TypeError:
+            return super(FastJSONProvider, self).response(obj)
+
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
@@ -1,6 +1,8 @@
 from datetime import datetime
 from extensions import db
-from utils import upload_weather_data, upload_soil_data
+from models.region import Region, Device
+from sqlalchemy import select
+from ingest import upload_weather_data, upload_soil_data, INSERT
 
 
 class Weather(db.Model):
@@ -26,6 +28,15 @@ class Weather(db.Model):
 
     # other attributes...
 
+    METRICS = ['weather_temperature', 'weather_humidity', 'weather_illumination', 'weather_wind_speed',
+               'weather_wind_direction', 'weather_atmospheric_pressure', 'weather_precipitation', 'weather_CO2',
+               'weather_N', 'weather_P', 'weather_K']
+
+    # 聚合查询的默认方式: 降水量求和, 其余取平均
+    DEFAULT_AGGS = {metric: 'sum' if metric == 'weather_precipitation' else 'mean' for metric in METRICS}
+
+    SERIALIZE_DATES = {'weather_date': '%Y-%m-%d %H:%M:%S'}
+
     def serialize(self):
         return {
             'region_id': self.region_id,
@@ -44,15 +55,26 @@ class Weather(db.Model):
             'weather_K': self.weather_K,
         }
 
+    @staticmethod
+    def serialize_query():
+        """
+        与 serialize() 字段一致的列查询, 配合 serializers.serialize_rows 使用
+        """
+        return select(Weather.region_id, Region.region_name, Weather.weather_date,
+                      *[getattr(Weather, metric) for metric in Weather.METRICS]).join(
+            Region, Region.region_id == Weather.region_id)
+
     @staticmethod
     def init_static_data(path: str, region_id: int):
         try:
-            upload_weather_data(path, region_id)
+            stats = upload_weather_data(path, region_id, mode=INSERT)  # 新建的空表, 不需要 upsert
         except Exception as e:
             print("ERROR!!!: models.py -> class Weather -> init_static_data()")
             print(e)
+            return None
 
         print("SUCCESS!!!: models.py -> class Weather -> init_static_data()")
+        return stats
 
 
 class Soil(db.Model):
@@ -71,6 +93,12 @@ class Soil(db.Model):
     soil_PH = db.Column(db.Float)
     soil_salt = db.Column(db.Float)
 
+    METRICS = ['soil_temperature', 'soil_water', 'soil_conductivity', 'soil_PH', 'soil_salt']
+
+    DEFAULT_AGGS = {metric: 'mean' for metric in METRICS}
+
+    SERIALIZE_DATES = {'soil_date': '%Y-%m-%d %H:%M:%S'}
+
     def serialize(self):
         return {
             'device_id': self.device_id,
@@ -86,14 +114,24 @@ class Soil(db.Model):
         }
 
     @staticmethod
-    def init_static_data(path: str):
+    def serialize_query():
+        return select(Soil.device_id, Device.device_instance, Device.region_id, Region.region_name, Soil.soil_date,
+                      Soil.soil_temperature, Soil.soil_water, Soil.soil_conductivity, Soil.soil_PH,
+                      Soil.soil_salt).join(
+            Device, Device.device_id == Soil.device_id).join(
+            Region, Region.region_id == Device.region_id)
+
+    @staticmethod
+    def init_static_data(path: str, region_id: int = None):
         try:
-            upload_soil_data(path)
+            stats = upload_soil_data(path, region_id, mode=INSERT)
         except Exception as e:
             print("ERROR!!!: models.py -> class Soil -> init_static_data()")
             print(e)
+            return None
 
         print("SUCCESS!!!: models.py -> class Soil -> init_static_data()")
+        return stats
 
 
 class Service(db.Model):
@@ -114,6 +152,8 @@ class Service(db.Model):
     day_feature_url = db.Column(db.String(256))  # feature layer
     day_growth_url = db.Column(db.String(256))  # tile layer
 
+    SERIALIZE_DATES = {'service_date': '%Y-%m-%d'}
+
     def __init__(self, **kwargs):
         super(Service, self).__init__(**kwargs)
         self.set_service_id()
@@ -135,6 +175,13 @@ class Service(db.Model):
             'day_growth_url': self.day_growth_url
         }
 
+    @staticmethod
+    def serialize_query():
+        return select(Service.region_id, Region.region_name, Service.service_id, Service.service_date,
+                      Service.year_terrain_url, Service.year_hydrology_url, Service.day_feature_url,
+                      Service.day_growth_url).join(
+            Region, Region.region_id == Service.region_id)
+
     @staticmethod
     def init_static_data():
         # TODO
@@ -1,10 +1,58 @@
+import base64
+import json
+
+import config
+
+
 class PageBean:
-    def __init__(self, data, count):
+    def __init__(self, data, count, next_cursor=None):
         self.response: dict[str, any] = {
             "data": data,
             "count": count
         }
 
+        if next_cursor is not None:
+            self.response["next_cursor"] = next_cursor
+
     @staticmethod
     def data(data, count):
         return PageBean(data, count).response
+
+    @staticmethod
+    def cursor(data, next_cursor: str = None, count: int = None):
+        """
+        游标分页: count 为本页条数, 没有下一页时 next_cursor 为空字符串
+        shape=columns 时 data 为 字段 -> 数组, 需要传入 count
+        """
+        return PageBean(data, len(data) if count is None else count, next_cursor or '').response
+
+    @staticmethod
+    def parse_limit(limit) -> int:
+        try:
+            limit = int(limit) if limit else config.PAGE_LIMIT_DEFAULT
+        except (TypeError, ValueError):
+            raise ValueError('参数错误: limit 必须为整数') from None
+
+        return min(max(limit, 1), config.PAGE_LIMIT_MAX)
+
+    @staticmethod
+    def encode_cursor(values: list) -> str:
+        """
+        游标对客户端不透明: 主键值 JSON 后 base64
+        """
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str, size: int = None) -> list:
+        """
+        size: 游标中主键值的个数, 不一致时视为无效
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except Exception as e:
+            raise ValueError('无效的游标') from e
+
+        if not isinstance(values, list) or (size is not None and len(values) != size):
+            raise ValueError('无效的游标')
+
+        return values
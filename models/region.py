@@ -1,4 +1,12 @@
+from collections import namedtuple
+
+from cache import REGION, cached
 from extensions import db
+from models.user import User
+from sqlalchemy import select
+
+# Region.get_by_name 的返回值, 只包含请求处理需要的字段
+RegionRef = namedtuple('RegionRef', ['region_id', 'region_name', 'region_city_code'])
 
 
 class Region(db.Model):
@@ -8,6 +16,7 @@ class Region(db.Model):
     region_name = db.Column(db.String(64), unique=True, nullable=False)
     region_lon = db.Column(db.Float, nullable=False)
     region_lat = db.Column(db.Float, nullable=False)
+    region_city_code = db.Column(db.String(16))  # 天气预报 API 的城市代码
 
     # 关系引用 (一对多)
     region_fields = db.relationship('Field', backref='region', lazy=True)
@@ -16,6 +25,8 @@ class Region(db.Model):
     region_weathers = db.relationship('Weather', backref='region', lazy=True)
     region_services = db.relationship('Service', backref='region', lazy=True)
 
+    SERIALIZE_PAIRS = {'region_lonlat': ('region_lon', 'region_lat')}
+
     def serialize(self):
         return {
             'region_id': self.region_id,
@@ -23,15 +34,36 @@ class Region(db.Model):
             'region_lonlat': [self.region_lon, self.region_lat]
         }
 
+    @staticmethod
+    def serialize_query():
+        return select(Region.region_id, Region.region_name, Region.region_lon, Region.region_lat)
+
+    @staticmethod
+    def get_by_name(region_name: str):
+        """
+        农场名 -> RegionRef, 经过缓存, 不存在时返回 None
+        """
+        if not region_name:
+            return None
+
+        regions = cached(REGION, 'regions', lambda: {
+            row.region_name: [row.region_id, row.region_city_code]
+            for row in db.session.execute(select(Region.region_id, Region.region_name, Region.region_city_code))
+        })
+        region = regions.get(region_name)
+
+        return RegionRef(region[0], region_name, region[1]) if region is not None else None
+
     @staticmethod
     def init_static_data():
         datas = [
-            (1, 'YY', 132.00, 46.83),
-            (2, '597', 132.01, 46.82),
+            (1, 'YY', 132.00, 46.83, '101050401'),
+            (2, '597', 132.01, 46.82, '101050101'),
         ]
 
         for data in datas:
-            region = Region(region_id=data[0], region_name=data[1], region_lon=data[2], region_lat=data[3])
+            region = Region(region_id=data[0], region_name=data[1], region_lon=data[2], region_lat=data[3],
+                            region_city_code=data[4])
             db.session.add(region)
 
         try:
@@ -127,6 +159,14 @@ class Precinct(db.Model):
             'precinct_area': self.precinct_area
         }
 
+    @staticmethod
+    def serialize_query():
+        # 负责人可以为空, 外连接 user
+        return select(Precinct.region_id, Region.region_name, Precinct.user_id, User.user_name, User.user_email,
+                      Precinct.precinct_id, Precinct.precinct_name, Precinct.precinct_area).join(
+            Region, Region.region_id == Precinct.region_id).outerjoin(
+            User, User.user_id == Precinct.user_id)
+
     @staticmethod
     def init_static_data():
         datas = [
@@ -169,10 +209,15 @@ class Device(db.Model):
 
     device_abnormality_rate = db.Column(db.Float)  # 异常率
 
+    # 土壤数据表格中该设备对应的列后缀, 例如 '土壤温度1' 中的 '1'
+    device_column_suffix = db.Column(db.String(16))
+
     device_soils = db.relationship('Soil', backref='device', lazy=True)
 
     # other attributes...
 
+    SERIALIZE_PAIRS = {'device_lonlat': ('device_lon', 'device_lat')}
+
     def serialize(self):
         return {
             'region_id': self.region_id,
@@ -184,18 +229,24 @@ class Device(db.Model):
             'device_abnormality_rate': self.device_abnormality_rate
         }
 
+    @staticmethod
+    def serialize_query():
+        return select(Device.region_id, Region.region_name, Device.device_id, Device.device_instance,
+                      Device.device_type, Device.device_lon, Device.device_lat, Device.device_abnormality_rate).join(
+            Region, Region.region_id == Device.region_id)
+
     @staticmethod
     def init_static_data():
         datas = [
-            (1, 1, 'YY土壤设备1', '土壤监测设备', 132.01, 46.84),
-            (2, 1, 'YY土壤设备2', '土壤监测设备', 132.02, 46.85),
-            (3, 1, 'YY气象设备1', '气象监测设备', 132.03, 46.86),
-            (4, 1, 'YY气象设备2', '气象监测设备', 132.04, 46.87),
+            (1, 1, 'YY土壤设备1', '土壤监测设备', 132.01, 46.84, '1'),
+            (2, 1, 'YY土壤设备2', '土壤监测设备', 132.02, 46.85, '2'),
+            (3, 1, 'YY气象设备1', '气象监测设备', 132.03, 46.86, '3'),
+            (4, 1, 'YY气象设备2', '气象监测设备', 132.04, 46.87, '4'),
         ]
 
         for data in datas:
             device = Device(device_id=data[0], region_id=data[1], device_instance=data[2], device_type=data[3],
-                            device_lon=data[4], device_lat=data[5])
+                            device_lon=data[4], device_lat=data[5], device_column_suffix=data[6])
             db.session.add(device)
 
         try:
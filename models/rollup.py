@@ -0,0 +1,37 @@
+from extensions import db
+
+
+class WeatherRollup(db.Model):
+    """
+    天气数据按 小时 / 天 / 月 预聚合, 每个指标一行
+    """
+    __tablename__ = 'weather_rollup'
+
+    region_id = db.Column(db.Integer, db.ForeignKey('region.region_id'), primary_key=True)
+    rollup_interval = db.Column(db.String(8), primary_key=True)  # hour / day / month
+    rollup_date = db.Column(db.DateTime, primary_key=True)  # 桶起始时间
+    rollup_metric = db.Column(db.String(64), primary_key=True)  # weather 表字段名
+
+    rollup_count = db.Column(db.Integer)  # 非空值个数
+    rollup_sum = db.Column(db.Double)
+    rollup_min = db.Column(db.Double)
+    rollup_max = db.Column(db.Double)
+    rollup_sumsq = db.Column(db.Double)  # 平方和, 用于计算标准差
+
+
+class SoilRollup(db.Model):
+    """
+    土壤数据按 小时 / 天 / 月 预聚合, 每个指标一行
+    """
+    __tablename__ = 'soil_rollup'
+
+    device_id = db.Column(db.Integer, db.ForeignKey('device.device_id'), primary_key=True)
+    rollup_interval = db.Column(db.String(8), primary_key=True)
+    rollup_date = db.Column(db.DateTime, primary_key=True)
+    rollup_metric = db.Column(db.String(64), primary_key=True)  # soil 表字段名
+
+    rollup_count = db.Column(db.Integer)
+    rollup_sum = db.Column(db.Double)
+    rollup_min = db.Column(db.Double)
+    rollup_max = db.Column(db.Double)
+    rollup_sumsq = db.Column(db.Double)
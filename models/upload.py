@@ -0,0 +1,45 @@
+from datetime import datetime
+from extensions import db
+
+
+class Upload(db.Model):
+    """
+    已导入文件清单 (按内容哈希去重)
+    """
+    __tablename__ = 'upload'
+
+    upload_hash = db.Column(db.String(64), primary_key=True)  # sha256
+    upload_kind = db.Column(db.String(32), primary_key=True)  # weather / soil / information
+    upload_target = db.Column(db.String(256), primary_key=True)  # region_id 或 服务地址
+
+    upload_filename = db.Column(db.String(256))
+    upload_rows = db.Column(db.Integer)
+    upload_date = db.Column(db.DateTime, default=datetime.now)
+
+    def serialize(self):
+        return {
+            'upload_hash': self.upload_hash,
+            'upload_kind': self.upload_kind,
+            'upload_target': self.upload_target,
+            'upload_filename': self.upload_filename,
+            'upload_rows': self.upload_rows,
+            'upload_date': self.upload_date.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    @classmethod
+    def is_ingested(cls, upload_hash: str, upload_kind: str, upload_target: str) -> bool:
+        # 主键查询
+        return cls.query.get((upload_hash, upload_kind, upload_target)) is not None
+
+    @staticmethod
+    def record(upload_hash: str, upload_kind: str, upload_target: str, upload_filename: str = None,
+               upload_rows: int = None):
+        upload = Upload(upload_hash=upload_hash, upload_kind=upload_kind, upload_target=upload_target,
+                        upload_filename=upload_filename, upload_rows=upload_rows)
+
+        try:
+            db.session.merge(upload)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
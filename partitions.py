@@ -0,0 +1,83 @@
+from extensions import db
+from sqlalchemy import text
+
+# 可按年分区的表 -> 分区字段
+PARTITION_TABLES = {
+    'weather': 'weather_date',
+    'soil': 'soil_date',
+}
+
+MAX_PARTITION = 'pmax'
+
+
+def _check_dialect(connection):
+    if connection.dialect.name != 'mysql':
+        raise Exception(f'按年分区只支持 MySQL, 当前数据库: {connection.dialect.name}')
+
+
+def _year_partitions(years: range) -> str:
+    return ', '.join(f'PARTITION p{year} VALUES LESS THAN ({year + 1})' for year in years)
+
+
+def partition_ddl(table: str, years: range) -> str:
+    """
+    RANGE (YEAR(时间字段)) 分区, 每年一个分区, 之后的数据进入 pmax
+    主键 (范围字段, 时间字段) 包含分区字段; 按时间字段本身的范围查询 (timeseries.date_range) 可以裁剪分区
+    """
+    column = PARTITION_TABLES[table]
+
+    return (f'ALTER TABLE {table} PARTITION BY RANGE (YEAR({column})) '
+            f'({_year_partitions(years)}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)')
+
+
+def extend_ddl(table: str, years: range) -> str:
+    """
+    从 pmax 中拆出新的年份分区
+    """
+    return (f'ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO '
+            f'({_year_partitions(years)}, PARTITION {MAX_PARTITION} VALUES LESS THAN MAXVALUE)')
+
+
+def get_partitions(connection, table: str) -> list[dict]:
+    rows = connection.execute(text(
+        'SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS FROM information_schema.PARTITIONS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL '
+        'ORDER BY PARTITION_ORDINAL_POSITION'), {'table': table}).all()
+
+    return [{'name': row[0], 'less_than': row[1], 'rows': row[2]} for row in rows]
+
+
+def _drop_foreign_keys(connection, table: str):
+    # InnoDB 分区表不支持外键, 外键约束改由应用保证 (模型中的 ForeignKey 仍用于 create_all 和关系映射)
+    names = connection.execute(text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND CONSTRAINT_TYPE = 'FOREIGN KEY'"),
+        {'table': table}).scalars().all()
+
+    for name in names:
+        connection.execute(text(f'ALTER TABLE {table} DROP FOREIGN KEY `{name}`'))
+
+
+def partition_table(table: str, years: range) -> list[dict]:
+    """
+    对已有表启用按年分区 (会重建整张表, 大表请在维护窗口执行); 已分区时只补充缺少的年份
+    """
+    with db.engine.connect() as connection:
+        _check_dialect(connection)
+
+        partitions = get_partitions(connection, table)
+
+        if not partitions:
+            _drop_foreign_keys(connection, table)
+            connection.execute(text(partition_ddl(table, years)))
+        else:
+            existing = {partition['name'] for partition in partitions}
+            last = max((int(name[1:]) for name in existing if name != MAX_PARTITION), default=years[0] - 1)
+            missing = range(max(last + 1, years[0]), years[-1] + 1)
+
+            if missing:
+                connection.execute(text(extend_ddl(table, missing)))
+
+        connection.commit()
+
+        return get_partitions(connection, table)
@@ -0,0 +1,203 @@
+from contextlib import contextmanager
+
+import pandas as pd
+
+# 按文件内容 (magic bytes) 识别格式, 不依赖扩展名
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # OLE2
+XLSX_MAGIC = b'PK\x03\x04'  # zip
+PARQUET_MAGIC = b'PAR1'
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def detect_format(path: str) -> str:
+    with open(path, 'rb') as file:
+        head = file.read(8)
+
+    if head.startswith(XLS_MAGIC):
+        return 'xls'
+    if head.startswith(XLSX_MAGIC):
+        return 'xlsx'
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+
+    return 'csv'
+
+
+class Reader:
+    """
+    表格读取器: 只解析需要的列, 按行分块返回 DataFrame
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def columns(self) -> list[str]:
+        raise NotImplementedError
+
+    def count(self) -> int | None:
+        """
+        数据行数 (不含表头), 无法廉价获取时返回 None
+        """
+        return None
+
+    def frames(self, columns: list[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        raise NotImplementedError
+
+    def read(self, columns: list[str] = None) -> pd.DataFrame:
+        frames = list(self.frames(columns))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns or self.columns())
+
+    def _project(self, header: list, columns: list[str] = None) -> tuple[list[int], list[str]]:
+        header = [str(name) if name is not None else '' for name in header]
+        if columns is None:
+            return list(range(len(header))), header
+
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise Exception(f'表格缺少列: {missing}')
+
+        return [header.index(column) for column in columns], list(columns)
+
+
+class XlsxReader(Reader):
+    """
+    openpyxl 只读模式, 逐行流式解析 sheet XML
+    """
+
+    @contextmanager
+    def _open(self):
+        from openpyxl import load_workbook
+
+        # 传入文件对象: 按路径打开时 openpyxl 会检查扩展名, 扩展名与内容不一致的文件 (例如 .xls 命名的 xlsx) 无法读取
+        with open(self.path, 'rb') as file:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+            try:
+                yield workbook.worksheets[0]
+            finally:
+                workbook.close()
+
+    def columns(self) -> list[str]:
+        with self._open() as sheet:
+            header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+            return self._project(list(header))[1]
+
+    def count(self) -> int | None:
+        with self._open() as sheet:
+            return max(sheet.max_row - 1, 0) if sheet.max_row else None
+
+    def frames(self, columns: list[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        with self._open() as sheet:
+            rows = sheet.iter_rows(values_only=True)
+            indexes, names = self._project(list(next(rows, ())), columns)
+
+            chunk = []
+            for row in rows:
+                chunk.append([row[index] if index < len(row) else None for index in indexes])
+
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=names)
+                    chunk = []
+
+            if chunk:
+                yield pd.DataFrame(chunk, columns=names)
+
+
+class XlsReader(Reader):
+    """
+    xlrd 按需加载 sheet, 按列切片读取 (BIFF 格式本身不支持流式解析)
+    """
+
+    def _open(self):
+        import xlrd
+
+        workbook = xlrd.open_workbook(self.path, on_demand=True)
+        return workbook, workbook.sheet_by_index(0)
+
+    def columns(self) -> list[str]:
+        workbook, sheet = self._open()
+        try:
+            return self._project(sheet.row_values(0) if sheet.nrows else [])[1]
+        finally:
+            workbook.release_resources()
+
+    def count(self) -> int | None:
+        workbook, sheet = self._open()
+        try:
+            return max(sheet.nrows - 1, 0)
+        finally:
+            workbook.release_resources()
+
+    def frames(self, columns: list[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        import xlrd
+
+        workbook, sheet = self._open()
+
+        try:
+            if not sheet.nrows:
+                return
+
+            indexes, names = self._project(sheet.row_values(0), columns)
+
+            for start in range(1, sheet.nrows, chunk_size):
+                end = min(start + chunk_size, sheet.nrows)
+                data = {}
+
+                for (index, name) in zip(indexes, names):
+                    values = sheet.col_values(index, start, end)
+                    types = sheet.col_types(index, start, end)
+
+                    # 日期单元格在 xls 中存储为浮点数
+                    data[name] = [xlrd.xldate_as_datetime(value, workbook.datemode)
+                                  if cell_type == xlrd.XL_CELL_DATE else value
+                                  for (value, cell_type) in zip(values, types)]
+
+                yield pd.DataFrame(data, columns=names)
+        finally:
+            workbook.release_resources()
+
+
+class CsvReader(Reader):
+    def columns(self) -> list[str]:
+        return list(pd.read_csv(self.path, nrows=0, encoding='utf-8-sig').columns)
+
+    def frames(self, columns: list[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if columns is not None:
+            self._project(self.columns(), columns)
+
+        for chunk in pd.read_csv(self.path, usecols=columns, chunksize=chunk_size, encoding='utf-8-sig'):
+            yield chunk[columns] if columns is not None else chunk
+
+
+class ParquetReader(Reader):
+    def _open(self):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(self.path)
+
+    def columns(self) -> list[str]:
+        return list(self._open().schema_arrow.names)
+
+    def count(self) -> int | None:
+        return self._open().metadata.num_rows
+
+    def frames(self, columns: list[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        file = self._open()
+
+        if columns is not None:
+            self._project(file.schema_arrow.names, columns)
+
+        for batch in file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+
+
+READERS = {
+    'xls': XlsReader,
+    'xlsx': XlsxReader,
+    'csv': CsvReader,
+    'parquet': ParquetReader,
+}
+
+
+def open_reader(path: str) -> Reader:
+    return READERS[detect_format(path)](path)
@@ -0,0 +1,261 @@
+import numpy as np
+import pandas as pd
+from extensions import db
+from models.rollup import WeatherRollup, SoilRollup  # noqa: F401, 注册 rollup 表
+from serializers import fetch_frame
+from timeseries import aggregate_frame, date_range
+from sqlalchemy import delete, func, insert, select
+
+# 源表 -> 预聚合表
+ROLLUP_TABLES = {
+    'weather': 'weather_rollup',
+    'soil': 'soil_rollup',
+}
+
+# 预聚合粒度 -> 桶起始时间
+ROLLUP_BUCKETS = {
+    'hour': lambda dates: dates.dt.floor('h'),
+    'day': lambda dates: dates.dt.floor('D'),
+    'month': lambda dates: dates.dt.to_period('M').dt.to_timestamp(),
+}
+
+# 查询的 interval -> 读取的预聚合粒度 (week 由 day 合并, 与 timeseries.INTERVALS 的周一为起点一致)
+ROLLUP_SOURCES = {
+    'hour': 'hour',
+    'day': 'day',
+    'week': 'day',
+    'month': 'month',
+}
+
+# 能由 count / sum / min / max / sumsq 得出的聚合方式
+ROLLUP_AGGS = ('mean', 'min', 'max', 'sum', 'std')
+
+ROLLUP_VALUES = ['rollup_count', 'rollup_sum', 'rollup_min', 'rollup_max', 'rollup_sumsq']
+
+
+def _source(table: str):
+    # 源表主键为 (范围字段, 时间字段), 其余字段均为指标
+    source = db.metadata.tables[table]
+    scope, date = [column.name for column in source.primary_key.columns]
+    metrics = [column.name for column in source.columns if column.name not in (scope, date)]
+
+    return source, scope, date, metrics
+
+
+def bucket_start(date, interval: str) -> pd.Timestamp:
+    date = pd.Timestamp(date)
+
+    if interval == 'week':
+        return date.floor('D') - pd.Timedelta(days=date.dayofweek)
+
+    return ROLLUP_BUCKETS[interval](pd.Series([date])).iloc[0]
+
+
+def bucket_end(date, interval: str) -> pd.Timestamp:
+    """
+    date 所在桶的结束时间 (下一个桶的起始时间)
+    """
+    start = bucket_start(date, interval)
+
+    if interval == 'month':
+        return start + pd.offsets.MonthBegin(1)
+
+    return start + {'hour': pd.Timedelta(hours=1), 'day': pd.Timedelta(days=1), 'week': pd.Timedelta(days=7)}[interval]
+
+
+def compute_rollups(frame: pd.DataFrame, scope: str, date: str, metrics: list[str]) -> pd.DataFrame:
+    """
+    原始数据 -> 各粒度各指标的 count / sum / min / max / sumsq
+    """
+    values = frame.melt(id_vars=[scope, date], value_vars=metrics, var_name='rollup_metric', value_name='value')
+    values = values.dropna(subset=['value'])
+    values['square'] = values['value'] ** 2
+    dates = pd.to_datetime(values[date])
+
+    rollups = []
+    for (interval, bucket) in ROLLUP_BUCKETS.items():
+        rollup = values.groupby([scope, bucket(dates).rename('rollup_date'), 'rollup_metric']).agg(
+            rollup_count=('value', 'count'), rollup_sum=('value', 'sum'), rollup_min=('value', 'min'),
+            rollup_max=('value', 'max'), rollup_sumsq=('square', 'sum')).reset_index()
+        rollup.insert(1, 'rollup_interval', interval)
+        rollups.append(rollup)
+
+    return pd.concat(rollups, ignore_index=True)
+
+
+def touched_months(value, first, last) -> set:
+    """
+    一个范围字段值在 [first, last] 内的 (范围字段值, 月份) 集合, 格式与 ingest.bulk_write 的返回值一致
+    """
+    return {(int(value), month) for month in pd.date_range(bucket_start(first, 'month'), last, freq='MS')}
+
+
+def refresh_rollups(connection, table: str, touched: set) -> int:
+    """
+    只重算受影响的桶: touched 为实际写入的 (范围字段值, 月份) 集合
+    每个月份一个事务: 读取这些范围字段值在该月的原始数据, 替换它们在该月的 小时 / 天 / 月 桶
+    """
+    if not touched:
+        return 0
+
+    source, scope, date, metrics = _source(table)
+    rollup = db.metadata.tables[ROLLUP_TABLES[table]]
+
+    months = {}
+    for (value, month) in touched:
+        months.setdefault(pd.Timestamp(month), set()).add(int(value))
+
+    written = 0
+    for (month, scopes) in sorted(months.items()):
+        scopes = sorted(scopes)
+        month_start, month_end = month.to_pydatetime(), (month + pd.offsets.MonthBegin(1)).to_pydatetime()
+
+        with connection.begin():
+            result = connection.execute(select(source.c[scope], source.c[date],
+                                               *[source.c[metric] for metric in metrics]).where(
+                source.c[scope].in_(scopes), *date_range(source.c[date], month_start, month_end, end_exclusive=True)))
+            frame = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+            connection.execute(delete(rollup).where(rollup.c[scope].in_(scopes), *date_range(
+                rollup.c.rollup_date, month_start, month_end, end_exclusive=True)))
+
+            if frame.empty:
+                continue
+
+            rollups = compute_rollups(frame, scope, date, metrics)
+            records = rollups.astype(object).where(rollups.notna(), None).to_dict('records')
+
+            connection.execute(insert(rollup), records)
+            written += len(records)
+
+    return written
+
+
+def rebuild_rollups(table: str, scopes: list[int] = None) -> int:
+    """
+    按原始数据全量重建 (历史数据补录, 或预聚合表建立之前已有的数据)
+    """
+    source, scope, date, _ = _source(table)
+    rollup = db.metadata.tables[ROLLUP_TABLES[table]]
+
+    statement = select(source.c[scope], func.min(source.c[date]), func.max(source.c[date])).group_by(source.c[scope])
+    cleanup = delete(rollup)
+    if scopes:
+        statement = statement.where(source.c[scope].in_(scopes))
+        cleanup = cleanup.where(rollup.c[scope].in_(scopes))
+
+    with db.engine.connect() as connection:
+        with connection.begin():
+            ranges = connection.execute(statement).all()
+            connection.execute(cleanup)
+
+        # 各范围字段的时间跨度可能相差很大, 分别重算
+        return sum(refresh_rollups(connection, table, touched_months(value, first, last))
+                   for (value, first, last) in ranges)
+
+
+def can_use_rollups(interval: str, aggs: dict[str, str]) -> bool:
+    return interval in ROLLUP_SOURCES and all(agg in ROLLUP_AGGS for agg in aggs.values())
+
+
+def _aggregate_raw(table: str, scopes: list[int], interval: str, date_start, date_end, aggs: dict[str, str],
+                   end_exclusive: bool) -> pd.DataFrame:
+    """
+    首尾不完整的桶由原始数据聚合, 结果与不使用预聚合表时一致
+    """
+    source, scope, date, _ = _source(table)
+
+    frame = fetch_frame(select(source.c[scope], source.c[date], *[source.c[metric] for metric in aggs]).where(
+        source.c[scope].in_(scopes), *date_range(source.c[date], date_start, date_end, end_exclusive)))
+
+    results = []
+    for (value, group) in frame.groupby(scope):
+        result = aggregate_frame(group, date, interval, aggs)
+        result.insert(0, scope, value)
+        results.append(result)
+
+    return pd.concat(results, ignore_index=True) if results else None
+
+
+def _aggregate_buckets(table: str, scopes: list[int], interval: str, full_start, full_end,
+                       aggs: dict[str, str]) -> pd.DataFrame:
+    """
+    由预聚合表计算 [full_start, full_end) 内的整桶, 两端均为桶的边界
+    """
+    _, scope, date, _ = _source(table)
+    rollup = db.metadata.tables[ROLLUP_TABLES[table]]
+
+    frame = fetch_frame(select(rollup.c[scope], rollup.c.rollup_date, rollup.c.rollup_metric,
+                               *[rollup.c[column] for column in ROLLUP_VALUES]).where(
+        rollup.c[scope].in_(scopes), rollup.c.rollup_interval == ROLLUP_SOURCES[interval],
+        *date_range(rollup.c.rollup_date, full_start.to_pydatetime(), full_end.to_pydatetime(), end_exclusive=True),
+        rollup.c.rollup_metric.in_(list(aggs))))
+
+    if frame.empty:
+        return pd.DataFrame(columns=[scope, date] + list(aggs) + ['count'])
+
+    frame['rollup_date'] = pd.to_datetime(frame['rollup_date'])
+
+    if interval == 'week':
+        frame['rollup_date'] = frame['rollup_date'] - pd.to_timedelta(frame['rollup_date'].dt.dayofweek, unit='D')
+        frame = frame.groupby([scope, 'rollup_date', 'rollup_metric'], as_index=False).agg(
+            rollup_count=('rollup_count', 'sum'), rollup_sum=('rollup_sum', 'sum'),
+            rollup_min=('rollup_min', 'min'), rollup_max=('rollup_max', 'max'),
+            rollup_sumsq=('rollup_sumsq', 'sum'))
+
+    count = frame['rollup_count'].astype('float64')
+    total = frame['rollup_sum']
+    candidates = {
+        'sum': total,
+        'min': frame['rollup_min'],
+        'max': frame['rollup_max'],
+        'mean': total / count,
+        # 样本标准差, 与 pandas std (ddof=1) 一致
+        'std': np.sqrt(((frame['rollup_sumsq'] - total ** 2 / count) / (count - 1)).clip(lower=0)).where(count > 1),
+    }
+
+    agg = frame['rollup_metric'].map(aggs)
+    frame['value'] = np.nan
+    for (name, candidate) in candidates.items():
+        frame.loc[agg == name, 'value'] = candidate[agg == name]
+
+    result = frame.pivot(index=[scope, 'rollup_date'], columns='rollup_metric', values='value')
+    result = result.reindex(columns=list(aggs))
+    result['count'] = frame.groupby([scope, 'rollup_date'])['rollup_count'].max()
+
+    result.columns.name = None
+    return result.reset_index().rename(columns={'rollup_date': date})
+
+
+def aggregate_rollups(table: str, scopes: list[int], interval: str, date_start, date_end,
+                      aggs: dict[str, str]) -> pd.DataFrame:
+    """
+    与 timeseries.aggregate_frame 相同列的结果 (范围字段, 时间字段, 各指标, count), 只统计 [date_start, date_end] 内的数据
+    - 完全落在范围内的桶读取预聚合表, count 为桶内各指标非空值个数的最大值
+    - date_start 所在桶 (date_start 不在桶边界时) 和 date_end 所在桶只覆盖了一部分, 由原始数据聚合
+    """
+    _, scope, date, _ = _source(table)
+    date_start, date_end = pd.Timestamp(date_start), pd.Timestamp(date_end)
+
+    full_start = bucket_start(date_start, interval)
+    if full_start < date_start:
+        full_start = bucket_end(date_start, interval)
+    full_end = bucket_start(date_end, interval)
+
+    if full_start >= full_end:
+        # 范围内没有完整的桶
+        frames = [_aggregate_raw(table, scopes, interval, date_start, date_end, aggs, end_exclusive=False)]
+    else:
+        frames = [_aggregate_raw(table, scopes, interval, date_start, full_start, aggs, end_exclusive=True)
+                  if date_start < full_start else None,
+                  _aggregate_buckets(table, scopes, interval, full_start, full_end, aggs),
+                  _aggregate_raw(table, scopes, interval, full_end, date_end, aggs, end_exclusive=False)]
+
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=[scope, date] + list(aggs) + ['count'])
+
+    frame = pd.concat(frames, ignore_index=True)
+    frame[date] = pd.to_datetime(frame[date])
+
+    return frame.sort_values([scope, date], ignore_index=True)
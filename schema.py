@@ -0,0 +1,51 @@
+from extensions import db
+from models.region import Region, Device  # noqa: F401, 注册 region / device 表
+from models.rollup import WeatherRollup, SoilRollup  # noqa: F401, 注册 rollup 表
+from models.upload import Upload  # noqa: F401, 注册 upload 表
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+# 已有数据库需要补充的字段: 表 -> {字段: 升级后需要处理的事项}, 新建的数据库由 create_all 直接创建
+SCHEMA_COLUMNS = {
+    'region': {'region_city_code': '请为农场填写天气预报城市代码, 为空的农场无法查询天气预报'},
+    'device': {'device_column_suffix': '请为土壤监测设备填写列后缀, 为空的设备在导入土壤数据时会被跳过'},
+}
+
+# 已有数据库需要补充的表, 新建的预聚合表由 flask schema upgrade 按原始数据重建
+SCHEMA_TABLES = ['upload', 'weather_rollup', 'soil_rollup']
+
+
+def add_column_ddl(connection, table: str, column: str) -> str:
+    # 新增字段都允许为空, 不需要默认值, 已有数据不受影响
+    quote = connection.dialect.identifier_preparer.quote
+    column_type = db.metadata.tables[table].c[column].type.compile(dialect=connection.dialect)
+
+    return f'ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} {column_type}'
+
+
+def upgrade_schema(dry_run: bool = False) -> list[dict]:
+    """
+    对比模型和已有数据库, 补充缺少的表和字段 (只新增, 不修改或删除已有的表和数据)
+    返回 [{'table', 'column', 'ddl'}], 新建的表 column 为 None; dry_run 时只生成 DDL, 不执行
+    """
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+
+        changes = [{'table': table, 'column': None,
+                    'ddl': str(CreateTable(db.metadata.tables[table]).compile(dialect=connection.dialect)).strip()}
+                   for table in SCHEMA_TABLES if table not in tables]
+
+        for (table, columns) in SCHEMA_COLUMNS.items():
+            if table not in tables:  # 表本身不存在, 需要 flask init static 建表
+                continue
+
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            changes += [{'table': table, 'column': column, 'ddl': add_column_ddl(connection, table, column)}
+                        for column in columns if column not in existing]
+
+        if not dry_run:
+            for change in changes:
+                connection.execute(text(change['ddl']))
+
+    return changes
@@ -0,0 +1,143 @@
+import config
+import numpy as np
+import pandas as pd
+from extensions import db
+
+# 响应数据的形状: rows 为逐行字典 (默认), columns 为 字段 -> 数组, 时间序列的体积和编码时间小数倍
+# 另有内部使用的 arrays (字段 -> numpy 数组), 由二进制响应 (binary.py) 直接写出, 不能通过 shape 参数指定
+SHAPES = ('rows', 'columns')
+
+_EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+def fetch_frame(statement) -> pd.DataFrame:
+    """
+    直接执行 Core 查询得到 DataFrame, 不构造 ORM 对象
+    """
+    result = db.session.execute(statement)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def format_frame(frame: pd.DataFrame, dates: dict[str, str] = None,
+                 pairs: dict[str, tuple[str, str]] = None) -> pd.DataFrame:
+    """
+    向量化格式化:
+    dates: 列名 -> 日期格式
+    pairs: 合并后的列名 -> (列1, 列2), 例如 'device_lonlat' -> ('device_lon', 'device_lat'), 合并为 [值1, 值2]
+    """
+    frame = frame.copy()
+
+    for (column, date_format) in (dates or {}).items():
+        if column in frame:
+            frame[column] = pd.to_datetime(frame[column]).dt.strftime(date_format)
+
+    for (column, (first, second)) in (pairs or {}).items():
+        position = frame.columns.get_loc(first)
+        values = frame[[first, second]].astype(object).where(frame[[first, second]].notna(), None).values.tolist()
+        frame = frame.drop(columns=[first, second])
+        frame.insert(position, column, values)
+
+    return frame
+
+
+def frame_to_rows(frame: pd.DataFrame, dates: dict[str, str] = None,
+                  pairs: dict[str, tuple[str, str]] = None) -> list[dict]:
+    """
+    DataFrame -> 响应数据 (NaN -> None)
+    """
+    frame = format_frame(frame, dates, pairs)
+    frame = frame.astype(object).where(frame.notna(), None)
+
+    return frame.to_dict('records')
+
+
+def serialize_frame(model, statement) -> pd.DataFrame:
+    """
+    model.serialize_query() 派生的查询 -> 与 model.serialize() 字段一致的 DataFrame
+    """
+    return format_frame(fetch_frame(statement), getattr(model, 'SERIALIZE_DATES', None),
+                        getattr(model, 'SERIALIZE_PAIRS', None))
+
+
+def serialize_rows(model, statement) -> list[dict]:
+    """
+    model.serialize_query() 派生的查询 -> 与 [obj.serialize() for obj in ...] 相同的输出, 不构造 ORM 对象, 没有懒加载
+    """
+    return frame_to_rows(fetch_frame(statement), getattr(model, 'SERIALIZE_DATES', None),
+                         getattr(model, 'SERIALIZE_PAIRS', None))
+
+
+def parse_shape(shape: str) -> str:
+    shape = shape or 'rows'
+    if shape not in SHAPES:
+        raise ValueError(f'不支持的 shape: {shape}')
+
+    return shape
+
+
+def _epoch_millis(series: pd.Series) -> pd.Series:
+    series = pd.to_datetime(series).dt.tz_localize(config.DATA_TIMEZONE)
+    return (series - _EPOCH) // pd.Timedelta(milliseconds=1)
+
+
+def frame_to_columns(frame: pd.DataFrame, dates: dict[str, str] = None) -> dict[str, list]:
+    """
+    DataFrame -> 列式响应数据: 字段 -> 等长数组 (NaN -> None)
+    dates 中的列转为 epoch 毫秒 (数据库时间按 DATA_TIMEZONE 解释); 不合并 pairs, 经纬度等保持为独立的列
+    """
+    columns = {}
+
+    for column in frame.columns:
+        series = frame[column]
+
+        if column in (dates or {}):
+            series = _epoch_millis(series)
+
+        if series.hasnans:
+            series = series.astype(object).where(series.notna(), None)
+
+        columns[column] = series.tolist()
+
+    return columns
+
+
+def frame_to_arrays(frame: pd.DataFrame, dates: dict[str, str] = None) -> dict[str, np.ndarray]:
+    """
+    DataFrame -> 字段 -> numpy 数组, 不生成逐行的 Python 对象
+    数值列保持 float64 (NULL 为 NaN) / int64, dates 中的列为 epoch 毫秒 (int64), 其余列为 object 数组 (NULL 为 None)
+    """
+    arrays = {}
+
+    for column in frame.columns:
+        series = frame[column]
+
+        if column in (dates or {}):
+            series = _epoch_millis(series)
+
+        if pd.api.types.is_numeric_dtype(series):
+            arrays[column] = series.to_numpy()
+        else:
+            arrays[column] = series.astype(object).where(series.notna(), None).to_numpy()
+
+    return arrays
+
+
+def frame_to_data(frame: pd.DataFrame, shape: str = 'rows', dates: dict[str, str] = None,
+                  pairs: dict[str, tuple[str, str]] = None):
+    """
+    按 shape 输出 frame_to_rows / frame_to_columns / frame_to_arrays 的结果, 条数为 len(frame)
+    """
+    if shape == 'columns':
+        return frame_to_columns(frame, dates)
+
+    if shape == 'arrays':
+        return frame_to_arrays(frame, dates)
+
+    return frame_to_rows(frame, dates, pairs)
+
+
+def serialize_data(model, frame: pd.DataFrame, shape: str = 'rows'):
+    """
+    fetch_frame(model.serialize_query() 派生的查询) -> 响应数据, rows 时与 serialize_rows 相同
+    """
+    return frame_to_data(frame, shape, getattr(model, 'SERIALIZE_DATES', None), getattr(model, 'SERIALIZE_PAIRS', None))
@@ -0,0 +1,48 @@
+import hashlib
+import os
+import tempfile
+
+import config
+from werkzeug.datastructures import FileStorage
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload(file: FileStorage, kind: str) -> tuple[str, str]:
+    """
+    边读边计算 sha256 并落盘, 按内容哈希存储: ./uploads/<kind>/<sha256><扩展名>
+    返回 (upload_hash, path)
+    """
+    root = os.path.join(config.UPLOAD_ROOT, kind)
+    os.makedirs(root, exist_ok=True)
+
+    # 保留扩展名便于人工识别文件, 解析时 readers.open_reader 按文件内容 (magic bytes) 识别格式
+    extension = os.path.splitext(file.filename or '')[1].lower()
+
+    sha256 = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=root, suffix='.part')
+
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                sha256.update(chunk)
+                temp.write(chunk)
+
+        upload_hash = sha256.hexdigest()
+        path = os.path.join(root, upload_hash + extension)
+
+        # 相同内容的文件已存在时直接复用
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return upload_hash, path
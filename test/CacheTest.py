@@ -0,0 +1,93 @@
+import unittest
+
+import cache
+import config
+from cache import CACHE_KEY_PREFIX, DATASET_KEY_PREFIX, bump_dataset_versions, cached, get_dataset_version, invalidate
+from extensions import redis_client
+from flask import Flask
+
+NAME = 'test'
+
+
+class CacheTest(unittest.TestCase):
+    """
+    需要本地 Redis (config.REDIS_URL)
+    """
+
+    def setUp(self):
+        self.init_redis(config.REDIS_URL)
+        self.clear()
+
+        self.interval = config.CACHE_VERSION_CHECK_INTERVAL
+        self.loads = 0
+
+    def tearDown(self):
+        config.CACHE_VERSION_CHECK_INTERVAL = self.interval
+        self.init_redis(config.REDIS_URL)
+        self.clear()
+
+    @staticmethod
+    def init_redis(url: str):
+        app = Flask('cache_test')
+        app.config.from_object(config)
+        app.config['REDIS_URL'] = url
+        redis_client.init_app(app)
+
+    @staticmethod
+    def clear():
+        keys = redis_client.keys(f'{CACHE_KEY_PREFIX}{NAME}:*') + redis_client.keys(f'{DATASET_KEY_PREFIX}{NAME}:*')
+        if keys:
+            redis_client.delete(*keys)
+
+        cache._versions.pop(NAME, None)
+        cache._entries.pop(NAME, None)
+
+    def loader(self):
+        self.loads += 1
+        return {'loads': self.loads}
+
+    def test_read_through_and_invalidate(self):
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 1})
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 1})
+
+        # 其他进程: 进程内没有缓存, 从 Redis 读取
+        cache._entries.pop(NAME)
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 1})
+        self.assertEqual(self.loads, 1)
+
+        invalidate(NAME)
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 2})
+
+    def test_version_bump_from_another_process(self):
+        config.CACHE_VERSION_CHECK_INTERVAL = 3600
+        cached(NAME, 'key', self.loader)
+
+        redis_client.incr(f'{CACHE_KEY_PREFIX}{NAME}:version')
+
+        # 检查间隔内仍使用进程内的版本号
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 1})
+
+        config.CACHE_VERSION_CHECK_INTERVAL = 0
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 2})
+
+    def test_dataset_version_is_visible_immediately(self):
+        config.CACHE_VERSION_CHECK_INTERVAL = 3600
+        self.assertEqual(get_dataset_version(NAME, 1), 0)
+
+        bump_dataset_versions(NAME, [1, 1, 2])
+
+        self.assertEqual(get_dataset_version(NAME, 1), 1)
+        self.assertEqual(get_dataset_version(NAME, 2), 1)
+        self.assertEqual(get_dataset_version(NAME, 3), 0)
+
+    def test_redis_unavailable_falls_back_to_loader(self):
+        self.init_redis('redis://127.0.0.1:1/0')
+
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 1})
+        self.assertEqual(cached(NAME, 'key', self.loader), {'loads': 2})
+        self.assertIsNone(get_dataset_version(NAME, 1))
+        invalidate(NAME)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from commands import STATIC_DATA_PATTERN, find_static_datasets
+
+
+class CommandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix='webgis_static_')
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def touch(self, *filenames):
+        for filename in filenames:
+            open(os.path.join(self.data_dir, filename), 'w').close()
+
+    def test_static_data_pattern(self):
+        matched = {
+            'YY_weather_2023.xls': ('YY', 'weather', '2023'),
+            '597_soil_2021.parquet': ('597', 'soil', '2021'),
+            # 农场名本身可以包含下划线
+            'YY_north_weather_2020.xlsx': ('YY_north', 'weather', '2020'),
+        }
+        for (filename, groups) in matched.items():
+            with self.subTest(filename=filename):
+                match = STATIC_DATA_PATTERN.match(filename)
+                self.assertIsNotNone(match)
+                self.assertEqual(match.group('region_name', 'kind', 'year'), groups)
+
+        for filename in ['YY_weather_23.xls', 'YY_rain_2023.csv', 'YY_weather_2023.txt', 'YY_weather_2023.xls.bak',
+                         '_weather_2023.csv', 'weather_2023.csv']:
+            with self.subTest(filename=filename):
+                self.assertIsNone(STATIC_DATA_PATTERN.match(filename))
+
+    def test_find_static_datasets(self):
+        self.touch('597_soil_2021.parquet', 'YY_weather_2023.xls', 'YY_weather_2022.csv', 'readme.md',
+                   'YY_weather_2023.xls.bak')
+
+        datasets = find_static_datasets(self.data_dir)
+
+        self.assertEqual(datasets, [
+            {'kind': 'soil', 'path': os.path.join(self.data_dir, '597_soil_2021.parquet'), 'region_name': '597',
+             'year': 2021},
+            {'kind': 'weather', 'path': os.path.join(self.data_dir, 'YY_weather_2022.csv'), 'region_name': 'YY',
+             'year': 2022},
+            {'kind': 'weather', 'path': os.path.join(self.data_dir, 'YY_weather_2023.xls'), 'region_name': 'YY',
+             'year': 2023},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
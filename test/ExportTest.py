@@ -0,0 +1,213 @@
+import io
+import os
+import unittest
+from datetime import datetime
+
+import config
+import exports
+import pyarrow as pa
+import pyarrow.parquet as pq
+from api.information_api import ExportWeatherApi
+from export_cache import EXPORT_VERSION_PREFIX, bump_data_versions, cached_export_response, evict
+from exports import export_chunks
+from extensions import db, redis_client
+from models.information import Weather
+from openpyxl import load_workbook
+from serializers import serialize_rows
+from timeseries import year_range
+
+from test.SyntheticData import REGION_ID, SyntheticDatabaseTest
+
+
+class ExportTest(SyntheticDatabaseTest):
+    """
+    720 条天气数据, 导出块大小 250 (块边界与 sheet 边界不重合)
+    """
+
+    def setUp(self):
+        super(ExportTest, self).setUp()
+
+        self.chunk_size, self.max_rows = config.EXPORT_CHUNK_SIZE, exports.XLSX_MAX_ROWS
+        config.EXPORT_CHUNK_SIZE = 250
+
+        self.statement = Weather.serialize_query().where(Weather.region_id == REGION_ID).order_by(
+            Weather.weather_date)
+        self.expected = serialize_rows(Weather, self.statement)
+
+    def tearDown(self):
+        config.EXPORT_CHUNK_SIZE, exports.XLSX_MAX_ROWS = self.chunk_size, self.max_rows
+        super(ExportTest, self).tearDown()
+
+    def export(self, export_format: str) -> bytes:
+        return b''.join(export_chunks(db.engine, Weather, self.statement, export_format))
+
+    def test_csv_has_bom_and_single_header(self):
+        text = self.export('csv').decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+
+        lines = text[1:].split('\r\n')
+        self.assertEqual(lines[-1], '')
+        self.assertEqual(lines[0].split(','), list(self.expected[0]))
+        self.assertEqual(len(lines) - 2, 720)
+        self.assertTrue(lines[1].startswith(f'{REGION_ID},BENCH,2020-01-01 00:00:00,'))
+
+    def test_xlsx_opens_with_serialized_values(self):
+        workbook = load_workbook(io.BytesIO(self.export('xlsx')), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Sheet1'])
+
+        rows = list(workbook['Sheet1'].iter_rows(values_only=True))
+        self.assertEqual(rows[0], tuple(self.expected[0]))
+        self.assertEqual(rows[1:], [tuple(row.values()) for row in self.expected])
+
+    def test_xlsx_rolls_over_to_next_sheet(self):
+        exports.XLSX_MAX_ROWS = 301  # 每个 sheet 300 行数据 + 表头
+
+        workbook = load_workbook(io.BytesIO(self.export('xlsx')), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Sheet1', 'Sheet2', 'Sheet3'])
+
+        rows = []
+        for name in workbook.sheetnames:
+            sheet = list(workbook[name].iter_rows(values_only=True))
+            self.assertEqual(sheet[0], tuple(self.expected[0]))
+            rows.append(sheet[1:])
+
+        self.assertEqual([len(sheet) for sheet in rows], [300, 300, 120])
+        self.assertEqual([row for sheet in rows for row in sheet], [tuple(row.values()) for row in self.expected])
+
+    def test_empty_xlsx_is_valid(self):
+        self.statement = self.statement.where(Weather.region_id == REGION_ID + 1)
+
+        workbook = load_workbook(io.BytesIO(self.export('xlsx')), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Sheet1'])
+
+    def assert_columnar(self, table: pa.Table):
+        self.assertEqual(table.num_rows, 720)
+        self.assertEqual(table.column_names, list(self.expected[0]))
+        self.assertEqual(table.schema.field('weather_date').type, pa.timestamp('us'))
+        self.assertEqual(table.schema.field('weather_temperature').type, pa.float64())
+
+        dates = table.column('weather_date').to_pylist()
+        self.assertEqual((dates[0], dates[-1]), (datetime(2020, 1, 1), datetime(2020, 1, 5, 23, 50)))
+        self.assertEqual(table.column('weather_temperature').to_pylist(),
+                         [row['weather_temperature'] for row in self.expected])
+
+    def test_parquet_round_trip(self):
+        parquet = pq.ParquetFile(io.BytesIO(self.export('parquet')))
+
+        # 每块一个 row group
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        self.assert_columnar(parquet.read())
+
+    def test_arrow_round_trip(self):
+        self.assert_columnar(pa.ipc.open_file(pa.BufferReader(self.export('arrow'))).read_all())
+
+    def test_year_range_selects_whole_years(self):
+        for (years, count) in [(range(2020, 2021), 720), (range(2019, 2021), 720), (range(2021, 2023), 0)]:
+            with self.subTest(years=years):
+                self.statement = Weather.serialize_query().where(Weather.region_id == REGION_ID,
+                                                                 *year_range(Weather.weather_date, years))
+                table = pq.read_table(io.BytesIO(self.export('parquet')))
+                self.assertEqual(table.num_rows, count)
+
+    def test_parse_years(self):
+        self.assertEqual(ExportWeatherApi.parse_years({'weather_year': '2020'}, 'weather_year'), range(2020, 2021))
+        self.assertEqual(ExportWeatherApi.parse_years({'year_start': '2019', 'year_end': '2020'}, 'weather_year'),
+                         range(2019, 2021))
+        self.assertEqual(ExportWeatherApi.parse_years({'year_start': '2019'}, 'weather_year'), range(2019, 2020))
+
+        for args in [{'year_start': '2021', 'year_end': '2020'}, {'year_start': '2000', 'year_end': '2020'},
+                     {'weather_year': 'last'}]:
+            with self.subTest(args=args):
+                with self.assertRaises(ValueError):
+                    ExportWeatherApi.parse_years(args, 'weather_year')
+
+
+class ExportCacheTest(SyntheticDatabaseTest):
+    """
+    需要本地 Redis (config.REDIS_URL)
+    """
+    YEARS = range(2020, 2021)
+
+    def setUp(self):
+        super(ExportCacheTest, self).setUp()
+
+        self.root, self.max_bytes = config.EXPORT_CACHE_ROOT, config.EXPORT_CACHE_MAX_BYTES
+        config.EXPORT_CACHE_ROOT = os.path.join(self.workdir, 'exports')
+        os.makedirs(config.EXPORT_CACHE_ROOT)
+
+        redis_client.init_app(self.app)
+        self.clear()
+
+        self.statement = Weather.serialize_query().where(Weather.region_id == REGION_ID).order_by(
+            Weather.weather_date)
+
+    def tearDown(self):
+        self.clear()
+        config.EXPORT_CACHE_ROOT, config.EXPORT_CACHE_MAX_BYTES = self.root, self.max_bytes
+        super(ExportCacheTest, self).tearDown()
+
+    @staticmethod
+    def clear():
+        keys = redis_client.keys(f'{EXPORT_VERSION_PREFIX}weather:{REGION_ID}:*')
+        if keys:
+            redis_client.delete(*keys)
+
+    def request(self, headers: dict = None):
+        with self.app.test_request_context('/', headers=headers):
+            response = cached_export_response('weather', REGION_ID, self.YEARS, Weather, self.statement,
+                                              'weather.csv', 'csv')
+
+            data = b''.join(response.response)
+            response.close()
+
+            return response, data
+
+    def cached_files(self) -> list[str]:
+        return sorted(os.listdir(config.EXPORT_CACHE_ROOT))
+
+    def test_miss_writes_file_and_hit_sends_it(self):
+        (response, data) = self.request()
+        self.assertFalse(response.direct_passthrough)
+        self.assertEqual(self.cached_files(), ['weather_1_2020-2020_v0.csv'])
+
+        (cached, cached_data) = self.request()
+        self.assertTrue(cached.direct_passthrough)
+        self.assertEqual(cached_data, data)
+        self.assertEqual(cached.headers['ETag'], response.headers['ETag'])
+
+        (not_modified, _) = self.request({'If-None-Match': response.headers['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_import_bumps_version_and_replaces_file(self):
+        (response, data) = self.request()
+
+        with db.engine.connect() as connection:
+            bump_data_versions(connection, 'weather', {(REGION_ID, datetime(2020, 3, 1))})
+
+        (updated, updated_data) = self.request({'If-None-Match': response.headers['ETag']})
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated.headers['ETag'], response.headers['ETag'])
+        self.assertEqual(updated_data, data)
+
+        # 旧版本文件在新文件写完后删除
+        self.assertEqual(self.cached_files(), ['weather_1_2020-2020_v1.csv'])
+
+    def test_evict_removes_least_recently_accessed(self):
+        for (atime, name) in enumerate(['a.csv', 'b.csv', 'c.csv', 'd.csv.tmp'], start=1):
+            path = os.path.join(config.EXPORT_CACHE_ROOT, name)
+            with open(path, 'wb') as file:
+                file.write(b'x' * 100)
+            os.utime(path, (atime, atime))
+
+        config.EXPORT_CACHE_MAX_BYTES = 250
+        evict()
+        self.assertEqual(self.cached_files(), ['b.csv', 'c.csv', 'd.csv.tmp'])
+
+        # 刚写入的文件即使最旧也保留
+        config.EXPORT_CACHE_MAX_BYTES = 150
+        evict(keep=os.path.join(config.EXPORT_CACHE_ROOT, 'b.csv'))
+        self.assertEqual(self.cached_files(), ['b.csv', 'd.csv.tmp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import config
+from feature_sync import upload_information_data
+
+
+class ApplyEditsHandler(BaseHTTPRequestHandler):
+    """
+    本地模拟 ArcGIS FeatureServer /applyEdits
+    """
+    requests = []
+    fail_once = set()  # 第一次请求返回 500 的批次 (按首个 OBJECTID)
+    error = None  # 所有请求都返回的 ArcGIS 错误
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        updates = json.loads(form['updates'][0])
+        first_id = updates[0]['attributes']['OBJECTID']
+
+        with self.lock:
+            ApplyEditsHandler.requests.append(updates)
+            fail = first_id in ApplyEditsHandler.fail_once
+            ApplyEditsHandler.fail_once.discard(first_id)
+
+        if fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        if ApplyEditsHandler.error:
+            body = json.dumps({'error': ApplyEditsHandler.error}).encode()
+        else:
+            body = json.dumps({
+                'updateResults': [{'objectId': update['attributes']['OBJECTID'], 'success': True}
+                                  for update in updates]
+            }).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeatureSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        ApplyEditsHandler.requests = []
+        ApplyEditsHandler.fail_once = set()
+        ApplyEditsHandler.error = None
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ApplyEditsHandler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/FeatureServer/0'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.backoff = config.FEATURE_SYNC_BACKOFF
+        config.FEATURE_SYNC_BACKOFF = 0
+
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write('OBJECTID,crop,area\n')
+            for i in range(1, 1001):
+                file.write(f'{i},水稻,{i * 0.5}\n')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        config.FEATURE_SYNC_BACKOFF = self.backoff
+        os.remove(self.path)
+
+    def test_batches_and_retry(self):
+        # 第 2 批 (OBJECTID 从 301 开始) 第一次提交失败, 重试后成功
+        ApplyEditsHandler.fail_once = {301}
+
+        stats = upload_information_data(self.path, self.url, batch_size=300, concurrency=3)
+
+        self.assertEqual(stats.batches, 4)
+        self.assertEqual(stats.rows, 1000)
+        self.assertEqual(stats.failed, 0)
+        self.assertEqual(len(ApplyEditsHandler.requests), 5)
+
+        object_ids = sorted({update['attributes']['OBJECTID']
+                             for updates in ApplyEditsHandler.requests for update in updates})
+        self.assertEqual(object_ids, list(range(1, 1001)))
+
+    def test_attributes_are_encoded_from_frame(self):
+        upload_information_data(self.path, self.url, batch_size=1000)
+
+        feature = ApplyEditsHandler.requests[0][1]
+        self.assertEqual(feature, {'attributes': {'OBJECTID': 2, 'crop': '水稻', 'area': 1.0}})
+
+    def test_permanent_error_is_not_retried(self):
+        ApplyEditsHandler.error = {'code': 400, 'message': 'Invalid field: crop'}
+
+        with self.assertRaises(Exception):
+            upload_information_data(self.path, self.url, batch_size=1000)
+
+        self.assertEqual(len(ApplyEditsHandler.requests), 1)
+
+    def test_rate_limit_is_retried(self):
+        ApplyEditsHandler.error = {'code': 429, 'message': 'Too many requests.'}
+
+        with self.assertRaises(Exception):
+            upload_information_data(self.path, self.url, batch_size=1000)
+
+        self.assertEqual(len(ApplyEditsHandler.requests), config.FEATURE_SYNC_RETRIES + 1)
+
+    def test_token_error_is_not_retried(self):
+        # 没有重新获取 token 的逻辑, 使用同一 token 重试不会成功
+        ApplyEditsHandler.error = {'code': 498, 'message': 'Invalid token.'}
+
+        with self.assertRaises(Exception):
+            upload_information_data(self.path, self.url, batch_size=1000)
+
+        self.assertEqual(len(ApplyEditsHandler.requests), 1)
+
+    def test_failed_batch_is_reported(self):
+        # 连接不上的服务地址, 重试后仍失败
+        with self.assertRaises(Exception):
+            upload_information_data(self.path, 'http://127.0.0.1:1/FeatureServer/0', batch_size=500)
+
+
+if __name__ == '__main__':
+    unittest.main()
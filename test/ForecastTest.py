@@ -0,0 +1,213 @@
+import inspect
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import api.information_api
+import config
+from api.information_api import WeatherPredictBatchApi
+from cache import REGION, invalidate
+from extensions import db, redis_client
+from flask import Flask
+from forecast import FORECAST_ERROR_PREFIX, FORECAST_KEY_PREFIX, FORECAST_LOCK_PREFIX, _refresh, get_forecast
+from models.region import Region
+
+from test.SyntheticData import REGION_ID, SyntheticDatabaseTest
+
+CITY_CODE = 'test-101050401'
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    """
+    本地模拟天气预报 API, 每次响应前等待一段时间, 便于制造并发的缓存未命中
+    """
+    requests = 0
+    status = 200
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            ForecastHandler.requests += 1
+            version = ForecastHandler.requests
+
+        time.sleep(0.2)
+
+        if ForecastHandler.status != 200:
+            self.send_response(ForecastHandler.status)
+            self.end_headers()
+            return
+
+        body = json.dumps({'data': {'forecast': [{'ymd': '2024-06-01', 'high': '高温 25℃', 'low': '低温 15℃',
+                                                  'fx': '南风', 'fl': '2级', 'type': '晴'}]},
+                           'version': version}, ensure_ascii=False).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ForecastTest(unittest.TestCase):
+    """
+    需要本地 Redis (config.REDIS_URL)
+    """
+
+    KEYS = (FORECAST_KEY_PREFIX + CITY_CODE, FORECAST_LOCK_PREFIX + CITY_CODE, FORECAST_ERROR_PREFIX + CITY_CODE)
+
+    def setUp(self):
+        self.init_redis(config.REDIS_URL)
+
+        redis_client.delete(*self.KEYS)
+        ForecastHandler.requests = 0
+        ForecastHandler.status = 200
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ForecastHandler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/api/weather/city/'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.init_redis(config.REDIS_URL)
+        redis_client.delete(*self.KEYS)
+
+    @staticmethod
+    def init_redis(url: str):
+        app = Flask('forecast_test')
+        app.config.from_object(config)
+        app.config['REDIS_URL'] = url
+        redis_client.init_app(app)
+
+    def test_concurrent_misses_are_coalesced(self):
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            texts = list(executor.map(lambda _: get_forecast(CITY_CODE, self.url), range(10)))
+
+        self.assertEqual(ForecastHandler.requests, 1)
+        self.assertEqual(len(set(texts)), 1)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        text = get_forecast(CITY_CODE, self.url)
+
+        # 标记为已过期
+        key = FORECAST_KEY_PREFIX + CITY_CODE
+        redis_client.set(key, json.dumps({'fresh_until': 0, 'text': text}, ensure_ascii=False))
+
+        started = time.perf_counter()
+        self.assertEqual(get_forecast(CITY_CODE, self.url), text)
+        self.assertEqual(get_forecast(CITY_CODE, self.url), text)
+        self.assertLess(time.perf_counter() - started, 0.2)
+
+        # 后台只刷新一次
+        time.sleep(0.5)
+        self.assertEqual(ForecastHandler.requests, 2)
+        self.assertEqual(json.loads(get_forecast(CITY_CODE, self.url))['version'], 2)
+
+    def test_failed_fetch_backs_off(self):
+        ForecastHandler.status = 500
+
+        with self.assertRaises(Exception):
+            get_forecast(CITY_CODE, self.url)
+
+        # 退避期间直接报错, 不再请求数据源
+        with self.assertRaises(Exception):
+            get_forecast(CITY_CODE, self.url)
+        self.assertEqual(ForecastHandler.requests, 1)
+
+    def test_lock_held_by_another_owner_is_kept(self):
+        # 锁已过期并被其他进程重新获取
+        redis_client.set(FORECAST_LOCK_PREFIX + CITY_CODE, 'other')
+
+        _refresh(CITY_CODE, 'expired', self.url)
+
+        self.assertEqual(redis_client.get(FORECAST_LOCK_PREFIX + CITY_CODE), b'other')
+
+    def test_redis_unavailable_falls_back_to_source(self):
+        self.init_redis('redis://127.0.0.1:1/0')
+
+        text = get_forecast(CITY_CODE, self.url)
+
+        self.assertEqual(json.loads(text)['version'], 1)
+
+
+class WeatherPredictBatchTest(SyntheticDatabaseTest):
+    """
+    BENCH 农场使用本地模拟的数据源, 需要本地 Redis (config.REDIS_URL)
+    """
+    WEATHER_ROWS = 0
+
+    def setUp(self):
+        super(WeatherPredictBatchTest, self).setUp()
+
+        redis_client.init_app(self.app)
+        redis_client.delete(*ForecastTest.KEYS)
+        ForecastHandler.requests = 0
+        ForecastHandler.status = 200
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ForecastHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        # 视图使用模块导入时的数据源地址
+        self.api_url = api.information_api.WEATHER_PREDICT_API_URL
+        api.information_api.WEATHER_PREDICT_API_URL = f'http://127.0.0.1:{self.server.server_port}/api/weather/city/'
+
+        db.session.get(Region, REGION_ID).region_city_code = CITY_CODE
+        db.session.commit()
+        invalidate(REGION)
+
+    def tearDown(self):
+        api.information_api.WEATHER_PREDICT_API_URL = self.api_url
+        self.server.shutdown()
+        self.server.server_close()
+        redis_client.delete(*ForecastTest.KEYS)
+        invalidate(REGION)
+        super(WeatherPredictBatchTest, self).tearDown()
+
+    def get(self, query_string: str) -> dict:
+        get = inspect.unwrap(WeatherPredictBatchApi.get)  # 跳过登录校验
+
+        with self.app.test_request_context('/?' + query_string):
+            return get(WeatherPredictBatchApi())
+
+    def test_invalid_predict_days_is_rejected(self):
+        for predict_days in ('abc', '0', str(config.FORECAST_MAX_DAYS + 1)):
+            with self.subTest(predict_days=predict_days):
+                result = self.get(f'region_names=BENCH&predict_days={predict_days}')
+
+                self.assertEqual(result['code'], 1)
+                self.assertIn('predict_days', result['message'])
+
+        self.assertEqual(ForecastHandler.requests, 0)
+
+    def test_each_region_reports_its_own_result(self):
+        result = self.get('region_names=BENCH,MISSING&predict_days=3')
+        self.assertEqual(result['code'], 0, result['message'])
+
+        (bench, missing) = result['data']['data']
+        self.assertEqual(result['data']['count'], 2)
+
+        # 数据源只有 1 天的预报
+        self.assertTrue(bench['success'])
+        self.assertEqual(bench['data'], [{'region_id': REGION_ID, 'region_name': 'BENCH', 'date': '2024-06-01',
+                                          'temperature_max': 25.0, 'temperature_min': 15.0, 'windy': '南风 2级',
+                                          'weather': '晴'}])
+
+        self.assertEqual((missing['region_name'], missing['success'], missing['data']), ('MISSING', False, None))
+        self.assertIn('MISSING', missing['error'])
+
+    def test_default_predict_days(self):
+        result = self.get('region_names=BENCH')
+
+        self.assertEqual(result['code'], 0, result['message'])
+        self.assertTrue(result['data']['data'][0]['success'])
+        self.assertEqual(ForecastHandler.requests, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+数据导入性能基准
+
+    python -m test.IngestBenchmark --rows 10000 100000 1000000 --output bench_results.json
+    python -m test.IngestBenchmark --rows 100000 --baseline bench_results.json  # 与上次结果对比, 变慢则退出码为 1
+
+默认每个用例使用一个临时 SQLite 数据库; --database-uri 可指向 MySQL 兼容的测试库 (会清空其中的表)
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+
+from test.SyntheticData import REGION_ID, create_test_app, generate_soil_file, generate_weather_file, \
+    seed_reference_data
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB, macOS 为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def generate_case_file(case: dict, workdir: str) -> str:
+    path = os.path.join(workdir, f"{case['kind']}.{case['format']}")
+
+    if case['kind'] == 'weather':
+        return generate_weather_file(path, case['rows'], case['format'])
+
+    return generate_soil_file(path, case['rows'], case['format'], case['devices'])
+
+
+def run_case(case: dict, path: str, database_uri: str = None) -> dict:
+    """
+    在独立进程中导入已生成的文件 path, 峰值 RSS 只统计该用例的导入 (文件由父进程生成)
+    """
+    from ingest import upload_weather_data, upload_soil_data
+
+    workdir = tempfile.mkdtemp(prefix='webgis_bench_')
+    database_uri = database_uri or 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    app = create_test_app(database_uri)
+
+    try:
+        with app.app_context():
+            seed_reference_data(case['devices'])
+
+            if case['kind'] == 'weather':
+                stats = upload_weather_data(path, REGION_ID, case['chunk_size'], mode=case['mode'])
+            else:
+                stats = upload_soil_data(path, REGION_ID, case['chunk_size'], mode=case['mode'])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stats = stats.serialize()
+
+    return case | {
+        'peak_rss_mb': peak_rss_mb(),
+        'rows_written': stats['rows'],
+        'skipped': stats['skipped'],
+        'seconds': stats['seconds'],
+        'rows_per_second': stats['rows_per_second'],
+        'phases': stats['phases'],
+    }
+
+
+def run_benchmark(cases: list[dict], database_uri: str = None) -> list[dict]:
+    results = []
+
+    for case in cases:
+        workdir = tempfile.mkdtemp(prefix='webgis_bench_data_')
+
+        try:
+            started = time.perf_counter()
+            path = generate_case_file(case, workdir)
+            generated = {'generate_seconds': round(time.perf_counter() - started, 3),
+                         'file_mb': round(os.path.getsize(path) / 1024 / 1024, 1)}
+
+            # 每个用例一个新进程 (spawn), 不包含生成文件的内存
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(run_case, case, path, database_uri).result() | generated
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        print(f"{result['kind']:>7} {result['format']:>7} {result['mode']:>6} {result['rows']:>9} 条: "
+              f"{result['rows_per_second']:>10.0f} 条/秒, 峰值 RSS {result['peak_rss_mb']} MB, "
+              f"阶段 {result['phases']}")
+        results.append(result)
+
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    与基线对比, 返回速率下降超过 tolerance 的用例
+    """
+    key = lambda result: (result['kind'], result['format'], result['mode'], result['rows'])
+    baseline = {key(result): result for result in baseline}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(key(result))
+        if previous and result['rows_per_second'] < previous['rows_per_second'] * (1 - tolerance):
+            regressions.append(f"{key(result)}: {previous['rows_per_second']} -> {result['rows_per_second']} 条/秒")
+
+    return regressions
+
+
+class IngestBenchmarkTest(unittest.TestCase):
+
+    def test_small_benchmark(self):
+        cases = [{'kind': kind, 'rows': 2000, 'format': file_format, 'mode': mode, 'devices': 4, 'chunk_size': 500}
+                 for kind in ('weather', 'soil') for file_format in ('csv', 'xlsx') for mode in ('insert', 'upsert')]
+
+        for result in run_benchmark(cases):
+            self.assertEqual(result['rows_written'], 2000)
+            self.assertEqual(result['skipped'], 0)
+            self.assertGreater(result['rows_per_second'], 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据导入性能基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--kinds', nargs='+', default=['weather', 'soil'], choices=['weather', 'soil'])
+    parser.add_argument('--formats', nargs='+', default=['csv'], choices=['csv', 'parquet', 'xlsx'])
+    parser.add_argument('--modes', nargs='+', default=['insert', 'upsert'], choices=['insert', 'upsert'])
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--chunk-size', type=int, default=config.INGEST_CHUNK_SIZE)
+    parser.add_argument('--database-uri', default=None, help='默认每个用例使用临时 SQLite; 指定的数据库会被清空')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=None, help='基线结果 JSON, 速率下降超过 --tolerance 时退出码为 1')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    cases = [{'kind': kind, 'rows': rows, 'format': file_format, 'mode': mode, 'devices': args.devices,
+              'chunk_size': args.chunk_size}
+             for kind in args.kinds for file_format in args.formats for mode in args.modes for rows in args.rows]
+
+    results = run_benchmark(cases, args.database_uri)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, file, ensure_ascii=False, indent=2)
+
+    print(f'结果已保存到 {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file)['results'], args.tolerance)
+
+        for regression in regressions:
+            print('REGRESSION!!!: ' + regression)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from datetime import datetime
+
+import pandas as pd
+
+import models.information  # noqa: F401, 注册 weather / soil 表
+from extensions import db
+from ingest import DATE_COLUMN, UPSERT, build_write_statement, to_records, upload_soil_data, upload_weather_data
+from models.information import Soil, Weather
+from models.region import Region, Device
+from pymysql.cursors import RE_INSERT_VALUES
+from sqlalchemy import create_mock_engine, func, select
+
+from test.SyntheticData import REGION_ID, SyntheticDatabaseTest, create_test_app, generate_soil_file, \
+    seed_reference_data
+
+
+class IngestTest(unittest.TestCase):
+
+    def test_mysql_upsert_is_rewritten_by_pymysql(self):
+        # executemany 只有在语句匹配 RE_INSERT_VALUES 时才会合并为一条多行 INSERT
+        engine = create_mock_engine('mysql+pymysql://', lambda *args, **kwargs: None)
+
+        for table in ('weather', 'soil'):
+            sql = str(build_write_statement(engine, table, UPSERT).compile(dialect=engine.dialect))
+
+            self.assertIn('ON DUPLICATE KEY UPDATE', sql)
+            self.assertNotIn(' AS new', sql)
+            self.assertIsNotNone(RE_INSERT_VALUES.match(sql), sql)
+
+    def test_to_records_converts_to_python_types(self):
+        frame = pd.DataFrame({'region_id': [1, 1], 'weather_date': pd.to_datetime(['2020-01-01 00:10:00', None]),
+                              'weather_temperature': [1.5, float('nan')]})
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            records = to_records(frame)
+
+        self.assertEqual(records[0], {'region_id': 1, 'weather_date': datetime(2020, 1, 1, 0, 10),
+                                      'weather_temperature': 1.5})
+        self.assertIs(type(records[0]['weather_date']), datetime)
+        self.assertEqual(records[1], {'region_id': 1, 'weather_date': None, 'weather_temperature': None})
+
+
+class SoilIngestTest(unittest.TestCase):
+    """
+    两个农场的设备使用相同的列后缀 1, 2
+    """
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='webgis_test_')
+        self.path = generate_soil_file(os.path.join(self.workdir, 'soil.csv'), 200, devices=2)
+
+        self.app = create_test_app('sqlite:///' + os.path.join(self.workdir, 'test.db'))
+        self.context = self.app.app_context()
+        self.context.push()
+
+        seed_reference_data(2)
+        db.session.add(Region(region_id=2, region_name='OTHER', region_lon=132.0, region_lat=46.8))
+        for suffix in (1, 2):
+            db.session.add(Device(device_id=10 + suffix, region_id=2, device_instance=f'OTHER设备{suffix}',
+                                  device_type='土壤监测设备', device_lon=132.0, device_lat=46.8,
+                                  device_column_suffix=str(suffix)))
+        db.session.commit()
+
+    def tearDown(self):
+        self.context.pop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_ambiguous_suffix_without_region_is_rejected(self):
+        with self.assertRaises(Exception):
+            upload_soil_data(self.path)
+
+        self.assertEqual(db.session.scalar(select(func.count()).select_from(Soil)), 0)
+
+    def test_region_selects_its_own_devices(self):
+        upload_soil_data(self.path, REGION_ID)
+
+        device_ids = db.session.scalars(select(Soil.device_id).distinct()).all()
+        self.assertEqual(sorted(device_ids), [1, 2])
+
+
+class UpsertTest(SyntheticDatabaseTest):
+    """
+    已导入 720 条天气数据 (workdir/weather.csv), 再次以 upsert 模式导入修改后的文件
+    """
+
+    def setUp(self):
+        super(UpsertTest, self).setUp()
+
+        self.path = os.path.join(self.workdir, 'weather.csv')
+        self.source = pd.read_csv(self.path, dtype={DATE_COLUMN: str})
+
+    def reupload(self, frame: pd.DataFrame):
+        path = os.path.join(self.workdir, 'weather2.csv')
+        frame.to_csv(path, index=False)
+
+        return upload_weather_data(path, REGION_ID, mode=UPSERT)
+
+    @staticmethod
+    def stored() -> pd.DataFrame:
+        return pd.read_sql(select(Weather).order_by(Weather.weather_date), db.session.connection())
+
+    def test_same_file_writes_nothing(self):
+        before = self.stored()
+        stats = upload_weather_data(self.path, REGION_ID, mode=UPSERT)
+
+        self.assertEqual((stats.rows, stats.skipped), (0, 720))
+        pd.testing.assert_frame_equal(self.stored(), before)
+
+    def test_changed_and_new_rows_are_written(self):
+        frame = self.source.copy()
+        frame.loc[10, '空气温度'] += 1.5
+
+        new = self.source.tail(5).copy()
+        new[DATE_COLUMN] = pd.date_range('2020-01-06', periods=5, freq='10min').strftime('%m/%d/%Y %H:%M:%S')
+
+        stats = self.reupload(pd.concat([frame, new], ignore_index=True))
+        self.assertEqual((stats.rows, stats.skipped), (6, 719))
+
+        stored = self.stored()
+        self.assertEqual(len(stored), 725)
+        self.assertAlmostEqual(stored.loc[10, 'weather_temperature'], self.source.loc[10, '空气温度'] + 1.5)
+        self.assertEqual(stored['weather_date'].iloc[-1], pd.Timestamp('2020-01-06 00:40'))
+
+    def test_last_duplicate_in_chunk_wins(self):
+        first = self.source.head(1).copy()
+        first['空气温度'] = -5.0
+        second = first.copy()
+        second['空气温度'] = 7.25
+
+        stats = self.reupload(pd.concat([first, self.source.iloc[1:3], second], ignore_index=True))
+
+        # 同一主键只写入最后一条, 前一条计入跳过
+        self.assertEqual((stats.rows, stats.skipped), (1, 3))
+        self.assertEqual(self.stored().loc[0, 'weather_temperature'], 7.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import inspect
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import api.job_api
+import config
+import jobs
+from api.job_api import JobApi
+from app import app
+from extensions import redis_client
+from ingest import IngestStats
+from jobs import JOB_HANDLERS, JOB_KEY_PREFIX, get_job, submit_job
+
+USER_ID = 1
+
+
+class InlinePool(ThreadPoolExecutor):
+    """
+    代替 ProcessPoolExecutor: 在当前进程的线程中运行任务
+    """
+
+    def __init__(self, max_workers=None, mp_context=None):
+        super(InlinePool, self).__init__(max_workers=max_workers)
+
+
+class BrokenPool(InlinePool):
+    """
+    子进程崩溃后的进程池: 提交任务时抛出 BrokenProcessPool
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        raise BrokenProcessPool('子进程异常退出')
+
+
+class JobTest(unittest.TestCase):
+    """
+    任务类型 test: 报告一次进度, 等待 release 后返回 (或抛出异常), 需要本地 Redis (config.REDIS_URL)
+    """
+
+    def setUp(self):
+        self.pool_class = jobs.ProcessPoolExecutor
+        self.workers = config.INGEST_WORKERS
+        self.get_current_user = api.job_api.get_current_user
+
+        jobs.ProcessPoolExecutor = InlinePool
+        jobs._executor = None
+        config.INGEST_WORKERS = 1
+        JOB_HANDLERS['test'] = self.handler
+
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.job_ids = []
+
+    def tearDown(self):
+        self.release.set()
+        if jobs._executor is not None:
+            jobs._executor.shutdown(wait=True)
+
+        jobs.ProcessPoolExecutor = self.pool_class
+        jobs._executor = None
+        config.INGEST_WORKERS = self.workers
+        api.job_api.get_current_user = self.get_current_user
+        del JOB_HANDLERS['test']
+
+        for job_id in self.job_ids:
+            redis_client.delete(JOB_KEY_PREFIX + job_id)
+
+    def handler(self, rows: int, fail: bool = False, progress=None):
+        progress(rows // 2, rows)
+        self.started.set()
+        self.release.wait(5)
+
+        if fail:
+            raise ValueError('导入失败')
+
+        stats = IngestStats('test')
+        stats.rows = rows
+        return stats
+
+    def submit(self, *args) -> str:
+        job_id = submit_job('test', *args, user_id=USER_ID)
+        self.job_ids.append(job_id)
+        return job_id
+
+    @staticmethod
+    def wait_for_jobs():
+        # 等待任务和完成回调都执行完
+        jobs._executor.shutdown(wait=True)
+
+    def test_job_states(self):
+        first = self.submit(10)
+        self.assertTrue(self.started.wait(5))
+        second = self.submit(4)
+
+        # 只有一个工作线程: 第一个任务运行中, 第二个任务排队
+        running, queued = get_job(first), get_job(second)
+        self.assertEqual((running['status'], running['rows'], running['total']), ('running', 5, 10))
+        self.assertIsNotNone(running['started'])
+        self.assertEqual((queued['status'], queued['started'], queued['user_id']), ('queued', None, USER_ID))
+
+        self.release.set()
+        self.wait_for_jobs()
+
+        for (job_id, rows) in [(first, 10), (second, 4)]:
+            job = get_job(job_id)
+            self.assertEqual((job['status'], job['error'], job['result']['rows']), ('success', None, rows))
+            self.assertGreaterEqual(job['finished'], job['started'])
+
+    def test_failed_job(self):
+        self.release.set()
+        job_id = self.submit(10, True)
+        self.wait_for_jobs()
+
+        job = get_job(job_id)
+        self.assertEqual((job['status'], job['error'], job['result']), ('failure', '导入失败', None))
+
+    def test_crashed_pool_is_replaced(self):
+        self.release.set()
+        job_id = self.submit(1)
+        executor = jobs._executor
+        self.wait_for_jobs()
+
+        # 子进程崩溃时 future 以 BrokenProcessPool 结束, _run_job 没有机会记录状态
+        future = Future()
+        future.set_exception(BrokenProcessPool('子进程异常退出'))
+        jobs._on_job_done(job_id, executor, future)
+
+        job = get_job(job_id)
+        self.assertEqual((job['status'], job['error']), ('failure', '子进程异常退出'))
+        self.assertIsNone(jobs._executor)
+
+        self.submit(1)
+        self.assertIsInstance(jobs._executor, InlinePool)
+        self.assertIsNot(jobs._executor, executor)
+
+    def test_broken_pool_is_replaced_on_submit(self):
+        self.release.set()
+        jobs._executor = BrokenPool()
+
+        job_id = self.submit(3)
+        self.assertNotIsInstance(jobs._executor, BrokenPool)
+        self.wait_for_jobs()
+
+        self.assertEqual(get_job(job_id)['status'], 'success')
+
+    def test_job_is_visible_to_submitter_only(self):
+        self.release.set()
+        job_id = self.submit(3)
+        self.wait_for_jobs()
+
+        get = inspect.unwrap(JobApi.get)  # 跳过登录校验
+
+        for (user_id, code) in [(USER_ID, 0), (USER_ID + 1, 1)]:
+            with self.subTest(user_id=user_id), app.test_request_context():
+                api.job_api.get_current_user = lambda: SimpleNamespace(user_id=user_id)
+                self.assertEqual(get(JobApi(), job_id)['code'], code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime
+
+from models.information import Soil, Weather
+from partitions import extend_ddl, partition_ddl, partition_table
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+from timeseries import date_range, year_range
+
+from test.SyntheticData import create_test_app
+
+
+class PartitionTest(unittest.TestCase):
+
+    @staticmethod
+    def compile(statement):
+        return statement.compile(dialect=mysql.dialect())
+
+    def test_year_range_compares_bare_column(self):
+        # 不对字段套用函数, MySQL 才能使用主键索引和分区裁剪
+        for (model, column) in [(Weather, Weather.weather_date), (Soil, Soil.soil_date)]:
+            with self.subTest(model=model.__name__):
+                compiled = self.compile(select(model).where(*year_range(column, range(2020, 2022))))
+                sql = str(compiled).split('WHERE')[1]
+
+                self.assertNotIn('EXTRACT', sql.upper())
+                self.assertNotIn('YEAR(', sql.upper())
+                self.assertIn(f'{model.__tablename__}.{column.key} >= ', sql)
+                self.assertIn(f'{model.__tablename__}.{column.key} < ', sql)
+                self.assertEqual(sorted(compiled.params.values()), [datetime(2020, 1, 1), datetime(2022, 1, 1)])
+
+    def test_date_range_bounds(self):
+        date_start, date_end = datetime(2020, 1, 1), datetime(2020, 1, 2)
+
+        self.assertEqual(date_range(Weather.weather_date), [])
+        self.assertIn('<=', str(self.compile(select(Weather).where(*date_range(Weather.weather_date, None,
+                                                                                 date_end)))).split('WHERE')[1])
+
+        compiled = self.compile(select(Weather).where(*date_range(Weather.weather_date, date_start, date_end,
+                                                                  end_exclusive=True)))
+        self.assertNotIn('<=', str(compiled).split('WHERE')[1])
+        self.assertEqual(sorted(compiled.params.values()), [date_start, date_end])
+
+    def test_partition_ddl(self):
+        self.assertEqual(partition_ddl('weather', range(2020, 2022)),
+                         'ALTER TABLE weather PARTITION BY RANGE (YEAR(weather_date)) '
+                         '(PARTITION p2020 VALUES LESS THAN (2021), PARTITION p2021 VALUES LESS THAN (2022), '
+                         'PARTITION pmax VALUES LESS THAN MAXVALUE)')
+        self.assertEqual(extend_ddl('soil', range(2022, 2023)),
+                         'ALTER TABLE soil REORGANIZE PARTITION pmax INTO '
+                         '(PARTITION p2022 VALUES LESS THAN (2023), PARTITION pmax VALUES LESS THAN MAXVALUE)')
+
+    def test_partition_requires_mysql(self):
+        with create_test_app('sqlite://').app_context():
+            with self.assertRaises(Exception):
+                partition_table('weather', range(2020, 2022))
+
+
+if __name__ == '__main__':
+    unittest.main()
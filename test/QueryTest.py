@@ -0,0 +1,252 @@
+import inspect
+import json
+import unittest
+from datetime import datetime
+
+import config
+import msgpack
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from api.information_api import SoilApi, WeatherApi
+from binary import EXT_FLOAT64, render_result, response_shape
+from extensions import db
+from models.information import Soil, Weather
+from models.pagebean import PageBean
+from models.region import Device, Region, RegionRef
+from serializers import serialize_rows
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+
+from test.SyntheticData import REGION_ID, SyntheticDatabaseTest
+
+REGION = RegionRef(REGION_ID, 'BENCH', None)
+
+
+class QueryTest(SyntheticDatabaseTest):
+    """
+    720 条天气数据 (2020-01-01 00:00 ~ 2020-01-05 23:50), 2 个设备各 300 条土壤数据
+    """
+    SOIL_ROWS = 600
+
+    def page_through(self, get_page):
+        pages, cursor = [], None
+
+        while True:
+            result = get_page(cursor)
+            self.assertEqual(result['code'], 0, result['message'])
+
+            page = result['data']
+            self.assertEqual(page['count'], len(page['data']))
+            pages.append(page['data'])
+
+            cursor = page['next_cursor']
+            if not cursor:
+                return pages
+
+    def test_weather_pages_forward_with_date_range(self):
+        date_start, date_end = datetime(2020, 1, 2), datetime(2020, 1, 3, 23, 50)
+        pages = self.page_through(lambda cursor: WeatherApi.get_page(REGION_ID, date_start, date_end, 100, cursor))
+
+        dates = [row['weather_date'] for page in pages for row in page]
+        self.assertEqual([len(page) for page in pages], [100, 100, 88])
+        self.assertEqual(dates, sorted(set(dates)))
+        self.assertEqual((dates[0], dates[-1]), ('2020-01-02 00:00:00', '2020-01-03 23:50:00'))
+
+    def test_weather_pages_backward_from_latest(self):
+        pages = self.page_through(lambda cursor: WeatherApi.get_page(REGION_ID, None, None, 300, cursor))
+
+        # 第一页为最新数据, 每页内按时间升序
+        self.assertEqual([len(page) for page in pages], [300, 300, 120])
+        self.assertEqual(pages[0][-1]['weather_date'], '2020-01-05 23:50:00')
+        for page in pages:
+            dates = [row['weather_date'] for row in page]
+            self.assertEqual(dates, sorted(dates))
+
+        dates = {row['weather_date'] for page in pages for row in page}
+        self.assertEqual(len(dates), 720)
+
+    def test_exact_multiple_of_limit_has_no_empty_page(self):
+        date_start, date_end = datetime(2020, 1, 1), datetime(2020, 1, 1, 23, 50)
+        pages = self.page_through(lambda cursor: WeatherApi.get_page(REGION_ID, date_start, date_end, 72, cursor))
+
+        self.assertEqual([len(page) for page in pages], [72, 72])
+
+    def test_invalid_cursors_are_rejected(self):
+        cursors = ['not-a-cursor', PageBean.encode_cursor([REGION_ID + 1, '2020-01-01 00:00:00']),
+                   PageBean.encode_cursor([REGION_ID]), PageBean.encode_cursor([REGION_ID, 'yesterday'])]
+
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(WeatherApi.get_page(REGION_ID, None, None, 10, cursor)['code'], 1)
+
+    def test_soil_history_pages_across_devices(self):
+        pages = self.page_through(lambda cursor: SoilApi.get_history(
+            REGION, {'limit': '250', **({'cursor': cursor} if cursor else {})}))
+
+        rows = [(row['device_id'], row['soil_date']) for page in pages for row in page]
+        self.assertEqual([len(page) for page in pages], [250, 250, 100])
+        self.assertEqual(rows, sorted(set(rows)))
+        self.assertEqual({device_id for (device_id, _) in rows}, {1, 2})
+
+    def assert_columns_match_rows(self, rows_result, columns_result, date_column):
+        self.assertEqual(columns_result['code'], 0, columns_result['message'])
+
+        rows, columns = rows_result['data'], columns_result['data']
+        self.assertEqual(columns['count'], rows['count'])
+        self.assertEqual(columns.get('next_cursor'), rows.get('next_cursor'))
+        self.assertEqual(list(columns['data']), list(rows['data'][0]))
+
+        for (field, values) in columns['data'].items():
+            expected = [row[field] for row in rows['data']]
+            if field == date_column:
+                # epoch 毫秒, 数据库时间按 DATA_TIMEZONE 解释
+                expected = [pd.Timestamp(value, tz=config.DATA_TIMEZONE).value // 10 ** 6 for value in expected]
+
+            self.assertEqual(values, expected, field)
+
+    def test_weather_columns_shape(self):
+        date_start, date_end = datetime(2020, 1, 2), datetime(2020, 1, 3, 23, 50)
+
+        rows = WeatherApi.get_page(REGION_ID, date_start, date_end, 100, None)
+        columns = WeatherApi.get_page(REGION_ID, date_start, date_end, 100, None, 'columns')
+        self.assert_columns_match_rows(rows, columns, 'weather_date')
+        self.assertEqual(columns['data']['data']['weather_date'][0], 1577894400000)  # 2020-01-02 00:00 +08:00
+
+        rows = WeatherApi.get_aggregation(REGION, date_start, date_end, 'hour', None)
+        columns = WeatherApi.get_aggregation(REGION, date_start, date_end, 'hour', None, 'columns')
+        self.assertEqual(columns['data']['count'], 48)
+        self.assert_columns_match_rows(rows, columns, 'weather_date')
+
+    def test_soil_columns_shape(self):
+        args = {'limit': '250'}
+
+        self.assert_columns_match_rows(SoilApi.get_history(REGION, args), SoilApi.get_history(REGION, args, 'columns'),
+                                       'soil_date')
+    @staticmethod
+    def unpack_msgpack(data: bytes) -> dict:
+        return msgpack.unpackb(data, ext_hook=lambda code, payload: np.frombuffer(
+            payload, dtype='<f8' if code == EXT_FLOAT64 else '<i8'))
+
+    def render(self, get_result, accept: str, query_string: str = ''):
+        with self.app.test_request_context('/?' + query_string, headers={'Accept': accept}):
+            return render_result(get_result(response_shape({})))
+
+    def assert_arrays_match_columns(self, arrays: dict, columns: dict):
+        self.assertEqual(list(arrays), list(columns))
+
+        for (field, values) in arrays.items():
+            expected = columns[field]
+            if isinstance(values, np.ndarray) and values.dtype.kind in 'fi':
+                expected = np.array([np.nan if value is None else value for value in expected], dtype=values.dtype)
+                np.testing.assert_array_equal(values, expected, field)
+            else:
+                self.assertEqual(list(values), expected, field)
+
+    def test_binary_formats_round_trip(self):
+        date_start, date_end = datetime(2020, 1, 2), datetime(2020, 1, 3, 23, 50)
+
+        def get_page(shape):
+            return WeatherApi.get_page(REGION_ID, date_start, date_end, 100, None, shape)
+
+        columns = get_page('columns')['data']
+
+        response = self.render(get_page, 'application/x-msgpack')
+        self.assertEqual(response.mimetype, 'application/x-msgpack')
+        self.assertIn('Accept', response.vary)
+
+        result = self.unpack_msgpack(response.get_data())
+        self.assertEqual((result['code'], result['data']['count']), (0, 100))
+        self.assertEqual(result['data']['next_cursor'], columns['next_cursor'])
+        self.assertEqual(result['data']['data']['weather_temperature'].dtype, np.float64)
+        self.assert_arrays_match_columns(result['data']['data'], columns['data'])
+
+        response = self.render(get_page, 'application/vnd.apache.arrow.stream')
+        reader = pa.ipc.open_stream(response.get_data())
+        envelope = json.loads(reader.schema.metadata[b'result'])
+        table = reader.read_all()
+
+        self.assertEqual(envelope['data'], {'count': 100, 'next_cursor': columns['next_cursor']})
+        self.assertEqual(table.num_rows, 100)
+        self.assert_arrays_match_columns({name: table.column(name).to_numpy() for name in table.column_names},
+                                         columns['data'])
+
+    def test_json_is_preferred(self):
+        def get_page(shape):
+            return WeatherApi.get_page(REGION_ID, None, None, 10, None, shape)
+
+        for accept in ('*/*', 'application/json, application/x-msgpack;q=0.5', ''):
+            with self.subTest(accept=accept):
+                response = self.render(get_page, accept)
+
+                self.assertEqual(response.mimetype, 'application/json')
+                self.assertEqual(response.get_json(), get_page('rows'))
+
+    def test_binary_error_result(self):
+        response = self.render(lambda shape: WeatherApi.get_page(REGION_ID, None, None, 10, 'bad', shape),
+                               'application/x-msgpack')
+
+        self.assertEqual(self.unpack_msgpack(response.get_data())['code'], 1)
+
+    def test_soil_latest_in_binary_format(self):
+        get = inspect.unwrap(SoilApi.get)  # 跳过登录校验和条件请求
+
+        for (accept, query_string) in [('application/vnd.apache.arrow.stream', ''), ('*/*', '&shape=columns')]:
+            with self.subTest(accept=accept):
+                response = self.render(lambda shape: get(SoilApi()), accept,
+                                       f'region_name=BENCH&soil_count=3&order=latest{query_string}')
+
+                if accept == '*/*':
+                    result = response.get_json()
+                else:
+                    reader = pa.ipc.open_stream(response.get_data())
+                    result = json.loads(reader.schema.metadata[b'result'])
+                    latest = pd.Timestamp('2020-01-03 01:50', tz=config.DATA_TIMEZONE).value // 10 ** 6
+                    self.assertEqual(reader.read_all().column('soil_date').to_pylist()[-1], latest)
+
+                self.assertEqual(result['code'], 0, result['message'])
+                self.assertEqual(result['data']['count'], 6)
+
+    def test_latest_soils_per_device(self):
+        rows = db.session.execute(SoilApi.devices_with_soils_query(REGION_ID, 3, 'latest')).all()
+
+        for device_id in {row.device_id for row in rows}:
+            expected = db.session.scalars(select(Soil.soil_date).where(Soil.device_id == device_id)
+                                          .order_by(Soil.soil_date.desc()).limit(3)).all()
+            self.assertEqual([row.soil_date for row in rows if row.device_id == device_id], expected[::-1])
+
+    def test_lateral_query_on_mysql(self):
+        dialect = mysql.dialect()
+
+        for (version, lateral) in [((8, 0, 14), True), ((8, 0, 13), False), ((5, 7, 44), False)]:
+            with self.subTest(version=version):
+                dialect.server_version_info = version
+                self.assertEqual(SoilApi.supports_lateral(dialect), lateral)
+
+                sql = str(SoilApi.devices_with_soils_query(REGION_ID, 3, 'latest', dialect).compile(dialect=dialect))
+                self.assertEqual('LATERAL' in sql, lateral)
+                self.assertEqual('row_number()' in sql, not lateral)
+                if lateral:
+                    self.assertRegex(sql.replace('\n', ' '),
+                                     r'ORDER BY soil.soil_date DESC\s+LIMIT %s\) AS soils ON true')
+
+        dialect.is_mariadb = True
+        dialect.server_version_info = (10, 11, 6)
+        self.assertFalse(SoilApi.supports_lateral(dialect))
+
+    def test_serialize_rows_matches_orm_serialize(self):
+        for (model, statement, order) in [
+            (Weather, Weather.serialize_query(), Weather.weather_date),
+            (Soil, Soil.serialize_query(), Soil.soil_date),
+            (Device, Device.serialize_query(), Device.device_id),
+            (Region, Region.serialize_query(), Region.region_id),
+        ]:
+            with self.subTest(model=model.__name__):
+                expected = [obj.serialize() for obj in db.session.scalars(select(model).order_by(order).limit(50))]
+                actual = serialize_rows(model, statement.order_by(order).limit(50))
+
+                self.assertEqual(actual, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
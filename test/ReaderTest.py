@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+from readers import XLS_MAGIC, CsvReader, ParquetReader, XlsReader, XlsxReader, detect_format, open_reader
+
+from test.SyntheticData import write_frames
+
+FRAME = pd.DataFrame({
+    '采集时间': [f'01/0{day}/2020 00:00:00' for day in range(1, 6)],
+    '空气温度': [11.4, -12.46, -27.34, 0.5, 3.0],
+    '空气湿度': [11.49, 83.19, 92.15, 40.0, 55.5],
+})
+
+
+class ReaderTest(unittest.TestCase):
+    """
+    文件扩展名与内容不一致, 按 magic bytes 选择读取器
+    """
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='webgis_readers_')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def write(self, filename: str, file_format: str) -> str:
+        return write_frames([FRAME], os.path.join(self.workdir, filename), file_format)
+
+    def test_format_is_detected_from_content(self):
+        for (filename, file_format, reader_class) in [('xlsx.xls', 'xlsx', XlsxReader),
+                                                       ('parquet.csv', 'parquet', ParquetReader),
+                                                       ('csv.xlsx', 'csv', CsvReader)]:
+            with self.subTest(file_format=file_format):
+                path = self.write(filename, file_format)
+                reader = open_reader(path)
+
+                self.assertEqual(detect_format(path), file_format)
+                self.assertIsInstance(reader, reader_class)
+                self.assertEqual(reader.columns(), list(FRAME.columns))
+                pd.testing.assert_frame_equal(reader.read(), FRAME, check_dtype=False)
+
+    def test_ole2_header_is_xls(self):
+        path = os.path.join(self.workdir, 'xls.xlsx')
+        with open(path, 'wb') as file:
+            file.write(XLS_MAGIC + bytes(504))
+
+        self.assertEqual(detect_format(path), 'xls')
+        self.assertIsInstance(open_reader(path), XlsReader)
+
+    def test_unknown_content_falls_back_to_csv(self):
+        for (filename, content) in [('bom.parquet', '\ufeff采集时间,空气温度\n01/01/2020 00:00:00,11.4\n'),
+                                    ('short.xls', 'a\n')]:
+            with self.subTest(filename=filename):
+                path = os.path.join(self.workdir, filename)
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write(content)
+
+                self.assertEqual(detect_format(path), 'csv')
+                self.assertIsInstance(open_reader(path), CsvReader)
+
+        # utf-8 BOM 不进入第一列的列名
+        self.assertEqual(open_reader(os.path.join(self.workdir, 'bom.parquet')).columns(), ['采集时间', '空气温度'])
+
+    def test_frames_project_columns_in_chunks(self):
+        for file_format in ('xlsx', 'parquet', 'csv'):
+            with self.subTest(file_format=file_format):
+                reader = open_reader(self.write(f'data.{file_format}', file_format))
+                frames = list(reader.frames(['空气湿度', '采集时间'], chunk_size=2))
+
+                self.assertEqual([len(frame) for frame in frames], [2, 2, 1])
+                self.assertEqual(list(frames[0].columns), ['空气湿度', '采集时间'])
+                self.assertEqual(list(pd.concat(frames)['空气湿度']), list(FRAME['空气湿度']))
+                self.assertIn(reader.count(), (len(FRAME), None))  # csv 不预先统计行数
+
+                with self.assertRaisesRegex(Exception, '表格缺少列'):
+                    list(reader.frames(['光照']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import gzip
+import json
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import config
+from cache import DATASET_KEY_PREFIX, bump_dataset_versions
+from compression import brotli, init_compression
+from decorators import conditional_get
+from extensions import redis_client
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import FastJSONProvider
+from models.pagebean import PageBean
+from models.result import Result
+
+DATASET = 'test'
+SCOPE = 1
+
+
+class ResponseTest(unittest.TestCase):
+    """
+    与 app.py 相同的 JSON provider 和压缩设置, 需要本地 Redis (config.REDIS_URL)
+    """
+
+    def setUp(self):
+        self.app = Flask('response_test')
+        self.app.json = FastJSONProvider(self.app)
+        self.app.config.from_object(config)
+        redis_client.init_app(self.app)
+        init_compression(self.app)
+
+        self.calls = 0
+        self.rows = [{'region_id': SCOPE, 'weather_date': f'2020-01-01 {i // 6:02d}:{i % 6 * 10:02d}:00',
+                      'weather_temperature': i / 10, 'region_name': '测试农场'} for i in range(144)]
+
+        @self.app.get('/series')
+        @conditional_get(DATASET, lambda: SCOPE)
+        def series():
+            self.calls += 1
+            return Result.success(data=PageBean.cursor(self.rows))
+
+        @self.app.get('/small')
+        def small():
+            return Result.success(data=[])
+
+        self.client = self.app.test_client()
+        redis_client.delete(f'{DATASET_KEY_PREFIX}{DATASET}:{SCOPE}')
+
+    def tearDown(self):
+        redis_client.delete(f'{DATASET_KEY_PREFIX}{DATASET}:{SCOPE}')
+
+    def get(self, path: str = '/series', headers: dict = None):
+        return self.client.get(path, headers=headers)
+
+    def test_gzip_round_trip(self):
+        plain = self.get(headers={'Accept-Encoding': 'identity'})
+        response = self.get(headers={'Accept-Encoding': 'gzip, deflate'})
+
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertLess(len(response.get_data()), len(plain.get_data()))
+        self.assertEqual(gzip.decompress(response.get_data()), plain.get_data())
+        self.assertEqual(json.loads(plain.get_data())['data']['data'], self.rows)
+
+        # 压缩后的字节不同, 强 ETag 带编码后缀
+        self.assertEqual(response.get_etag()[0], f'{plain.get_etag()[0]}-gzip')
+
+    @unittest.skipIf(brotli is None, '未安装 brotli')
+    def test_brotli_preferred_on_equal_quality(self):
+        plain = self.get(headers={'Accept-Encoding': 'identity'})
+        response = self.get(headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.get_data()), plain.get_data())
+        self.assertEqual(response.get_etag()[0], f'{plain.get_etag()[0]}-br')
+
+        response = self.get(headers={'Accept-Encoding': 'gzip;q=1.0, br;q=0.5'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+    def test_small_response_is_not_compressed(self):
+        response = self.get('/small', {'Accept-Encoding': 'gzip, br'})
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.vary)
+
+    def test_not_modified_until_version_bump(self):
+        response = self.get()
+        etag = response.get_etag()[0]
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.calls, 1)
+
+        # 未压缩和压缩后的 ETag 都能命中, 命中时不执行查询
+        for tag in (etag, f'{etag}-gzip'):
+            with self.subTest(tag=tag):
+                cached = self.get(headers={'If-None-Match': f'"{tag}"', 'Accept-Encoding': 'gzip'})
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.get_data(), b'')
+        self.assertEqual(self.calls, 1)
+
+        # 不同的查询参数是不同的 ETag
+        self.assertNotEqual(self.client.get('/series?limit=10').get_etag()[0], etag)
+
+        bump_dataset_versions(DATASET, [SCOPE])
+
+        updated = self.get(headers={'If-None-Match': f'"{etag}"'})
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated.get_etag()[0], etag)
+
+    def test_fast_json_provider_matches_default(self):
+        data = {'weather_date': [1577894400000, 1577895000000], 'weather_temperature': np.array([1.5, np.nan]),
+                'count': np.int64(2), 'region_name': '测试农场', 'created': datetime(2020, 1, 2, 8, 30)}
+
+        with self.app.app_context():
+            fast = self.app.json.response(data)
+            default = DefaultJSONProvider(self.app).response({**data, 'weather_temperature': [1.5, None],
+                                                              'count': 2})
+
+        self.assertEqual(fast.mimetype, 'application/json')
+        self.assertEqual(json.loads(fast.get_data()), json.loads(default.get_data()))
+
+        # 字段顺序与输入一致, 中文不转义
+        text = fast.get_data(as_text=True)
+        self.assertEqual(list(json.loads(text)), ['weather_date', 'weather_temperature', 'count', 'region_name',
+                                                  'created'])
+        self.assertIn('测试农场', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from extensions import db
+from ingest import DATE_COLUMN, UPSERT, IngestStats, bulk_write, upload_weather_data
+from models.information import Weather
+from models.rollup import WeatherRollup
+from rollups import aggregate_rollups, rebuild_rollups, refresh_rollups
+from serializers import fetch_frame
+from sqlalchemy import insert, select
+from timeseries import aggregate_frame, date_range
+
+from test.SyntheticData import REGION_ID, SyntheticDatabaseTest, generate_weather_file
+
+AGGS = {'weather_temperature': 'mean', 'weather_precipitation': 'sum', 'weather_humidity': 'std'}
+
+
+class RollupTest(SyntheticDatabaseTest):
+    """
+    2020-01-01 起 5 天的 10 分钟数据
+    """
+
+    def aggregate_raw(self, interval, date_start, date_end):
+        frame = fetch_frame(select(Weather.weather_date, *[getattr(Weather, metric) for metric in AGGS]).where(
+            Weather.region_id == REGION_ID, *date_range(Weather.weather_date, date_start, date_end)))
+        return aggregate_frame(frame, 'weather_date', interval, AGGS)
+
+    def assert_same_as_raw(self, interval, date_start, date_end):
+        expected = self.aggregate_raw(interval, date_start, date_end)
+        actual = aggregate_rollups('weather', [REGION_ID], interval, date_start, date_end, AGGS)
+
+        self.assertEqual(list(actual['weather_date']), list(expected['weather_date']))
+        self.assertEqual(list(actual['count']), list(expected['count']))
+        for metric in AGGS:
+            self.assertTrue(np.allclose(actual[metric].astype('float64'), expected[metric].astype('float64'),
+                                        equal_nan=True), metric)
+
+    def test_partial_edge_buckets_are_clipped(self):
+        # 结束时间在桶边界上: 最后一天只有 00:00 一条数据
+        date_start, date_end = datetime(2020, 1, 1), datetime(2020, 1, 3)
+        actual = aggregate_rollups('weather', [REGION_ID], 'day', date_start, date_end, AGGS)
+
+        self.assertEqual(list(actual['count']), [144, 144, 1])
+        self.assert_same_as_raw('day', date_start, date_end)
+
+    def test_matches_raw_aggregation(self):
+        ranges = [
+            (datetime(2020, 1, 1, 5, 30), datetime(2020, 1, 4, 12, 0)),  # 首尾都不完整
+            (datetime(2020, 1, 2), datetime(2020, 1, 2, 23, 50)),  # 范围内没有完整的桶
+            (datetime(2020, 1, 1), datetime(2020, 1, 5, 23, 59, 59)),
+        ]
+
+        for interval in ('hour', 'day', 'week', 'month'):
+            for (date_start, date_end) in ranges:
+                with self.subTest(interval=interval, date_start=date_start):
+                    self.assert_same_as_raw(interval, date_start, date_end)
+
+    def test_refresh_after_reimport_and_rebuild(self):
+        # 覆盖导入 (upsert) 后受影响的桶被重算
+        path = generate_weather_file(os.path.join(self.workdir, 'weather2.csv'), 300, seed=1)
+        upload_weather_data(path, REGION_ID)
+        self.assert_same_as_raw('day', datetime(2020, 1, 1), datetime(2020, 1, 5, 23, 59, 59))
+
+        rebuild_rollups('weather', [REGION_ID])
+        self.assert_same_as_raw('hour', datetime(2020, 1, 1), datetime(2020, 1, 5, 23, 59, 59))
+
+    def test_only_touched_months_are_refreshed(self):
+        # 修改 1 月的一行并追加 3 月的一行, 2 月的桶不应被重算
+        sentinel = {'region_id': REGION_ID, 'rollup_interval': 'month', 'rollup_date': datetime(2020, 2, 1),
+                    'rollup_metric': 'weather_temperature', 'rollup_count': 1, 'rollup_sum': 99.0,
+                    'rollup_min': 99.0, 'rollup_max': 99.0, 'rollup_sumsq': 9801.0}
+        with db.engine.begin() as connection:
+            connection.execute(insert(WeatherRollup), [sentinel])
+
+        frame = pd.read_csv(os.path.join(self.workdir, 'weather.csv'), dtype={DATE_COLUMN: str})
+        frame.loc[10, '空气温度'] += 1.5
+        appended = frame.iloc[[-1]].assign(**{DATE_COLUMN: '03/01/2020 00:00:00'})
+        path = os.path.join(self.workdir, 'weather2.csv')
+        pd.concat([frame, appended]).to_csv(path, index=False)
+
+        upload_weather_data(path, REGION_ID, mode=UPSERT)
+
+        stored = fetch_frame(select(WeatherRollup.rollup_sum).where(
+            WeatherRollup.region_id == REGION_ID, WeatherRollup.rollup_interval == 'month',
+            WeatherRollup.rollup_date == datetime(2020, 2, 1)))
+        self.assertEqual(list(stored['rollup_sum']), [99.0])
+
+        self.assert_same_as_raw('hour', datetime(2020, 1, 1), datetime(2020, 1, 5, 23, 59, 59))
+        self.assert_same_as_raw('day', datetime(2020, 3, 1), datetime(2020, 3, 1, 23, 59, 59))
+
+    def test_bulk_write_returns_touched_months(self):
+        frame = pd.DataFrame({'region_id': [REGION_ID, REGION_ID, REGION_ID],
+                              'weather_date': [datetime(2021, 1, 1), datetime(2021, 1, 31, 23, 50),
+                                               datetime(2021, 4, 1)],
+                              'weather_temperature': [1.0, 2.0, 3.0]})
+
+        with db.engine.connect() as connection:
+            touched = bulk_write(connection, 'weather', [frame], IngestStats('weather'))
+            self.assertEqual(refresh_rollups(connection, 'weather', set()), 0)
+
+        self.assertEqual(touched, {(REGION_ID, pd.Timestamp(2021, 1, 1)), (REGION_ID, pd.Timestamp(2021, 4, 1))})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from commands import init_command
+from extensions import db
+from models.region import Device, Region
+from models.rollup import WeatherRollup
+from schema import upgrade_schema
+from sqlalchemy import func, inspect, select, text
+
+from test.SyntheticData import SyntheticDatabaseTest
+
+
+class SchemaTest(SyntheticDatabaseTest):
+    """
+    删除新增的表和字段, 模拟升级前的数据库
+    """
+
+    def setUp(self):
+        super(SchemaTest, self).setUp()
+
+        db.session.commit()
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE region DROP COLUMN region_city_code'))
+            connection.execute(text('ALTER TABLE device DROP COLUMN device_column_suffix'))
+            for table in ('upload', 'weather_rollup', 'soil_rollup'):
+                connection.execute(text(f'DROP TABLE {table}'))
+
+    @staticmethod
+    def columns(table: str) -> set:
+        with db.engine.connect() as connection:
+            return {column['name'] for column in inspect(connection).get_columns(table)}
+
+    @staticmethod
+    def tables() -> set:
+        with db.engine.connect() as connection:
+            return set(inspect(connection).get_table_names())
+
+    def test_dry_run_does_not_change_schema(self):
+        changes = upgrade_schema(dry_run=True)
+
+        self.assertEqual([(change['table'], change['column']) for change in changes],
+                         [('upload', None), ('weather_rollup', None), ('soil_rollup', None),
+                          ('region', 'region_city_code'), ('device', 'device_column_suffix')])
+        self.assertTrue(changes[0]['ddl'].startswith('CREATE TABLE upload ('))
+        self.assertEqual(changes[-1]['ddl'], 'ALTER TABLE device ADD COLUMN device_column_suffix VARCHAR(16)')
+        self.assertNotIn('device_column_suffix', self.columns('device'))
+        self.assertNotIn('upload', self.tables())
+
+    def test_upgrade_keeps_data(self):
+        upgrade_schema()
+
+        self.assertIn('region_city_code', self.columns('region'))
+        self.assertIn('device_column_suffix', self.columns('device'))
+        self.assertIn('upload', self.tables())
+        self.assertEqual(db.session.scalar(select(func.count()).select_from(Device)), self.SOIL_DEVICES)
+        self.assertEqual(db.session.scalars(select(Device.device_column_suffix)).all(), [None] * self.SOIL_DEVICES)
+        self.assertEqual(db.session.scalars(select(Region.region_city_code)).all(), [None])
+
+        # 再次执行没有需要补充的内容
+        self.assertEqual(upgrade_schema(), [])
+
+    def test_command_rebuilds_new_rollup_tables(self):
+        init_command(self.app)
+        result = self.app.test_cli_runner().invoke(args=['schema', 'upgrade'])
+
+        self.assertIn('SUCCESS!!!: flask schema upgrade', result.output)
+        self.assertIn('WARNING!!!: region.region_city_code', result.output)
+        self.assertIn('WARNING!!!: device.device_column_suffix', result.output)
+
+        # 5 天的 10 分钟数据: 每个指标 120 个小时桶, 5 个天桶, 1 个月桶
+        metrics = db.session.scalar(select(func.count(func.distinct(WeatherRollup.rollup_metric))))
+        self.assertGreater(metrics, 0)
+        self.assertEqual(db.session.scalar(select(func.count()).select_from(WeatherRollup)), metrics * 126)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import hashlib
+import inspect
+import io
+import os
+import unittest
+
+import config
+from api.information_api import WeatherApi
+from cache import REGION, invalidate
+from models.upload import Upload
+from storage import save_upload
+from werkzeug.datastructures import FileStorage
+
+from test.SyntheticData import REGION_ID, SyntheticDatabaseTest
+
+CONTENT = '采集时间,空气温度\n01/01/2020 00:00:00,11.4\n'.encode()
+
+
+class StorageTest(SyntheticDatabaseTest):
+    """
+    上传文件存储在临时目录 workdir/uploads 下
+    """
+    WEATHER_ROWS = 0
+
+    def setUp(self):
+        super(StorageTest, self).setUp()
+
+        self.upload_root = config.UPLOAD_ROOT
+        config.UPLOAD_ROOT = os.path.join(self.workdir, 'uploads')
+        invalidate(REGION)
+
+    def tearDown(self):
+        config.UPLOAD_ROOT = self.upload_root
+        super(StorageTest, self).tearDown()
+
+    @staticmethod
+    def save(content: bytes, filename: str) -> tuple[str, str]:
+        return save_upload(FileStorage(io.BytesIO(content), filename=filename), 'weather')
+
+    def test_content_addressed_path(self):
+        upload_hash, path = self.save(CONTENT, 'Weather.CSV')
+
+        self.assertEqual(upload_hash, hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(path, os.path.join(config.UPLOAD_ROOT, 'weather', upload_hash + '.csv'))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), CONTENT)
+
+        # 相同内容复用同一个文件, 不留下临时文件
+        self.assertEqual(self.save(CONTENT, 'copy.csv'), (upload_hash, path))
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+        other_hash, other_path = self.save(CONTENT + b'01/01/2020 00:10:00,-12.46\n', 'Weather.CSV')
+        self.assertNotEqual(other_hash, upload_hash)
+        self.assertTrue(os.path.exists(other_path))
+
+    def test_ingested_file_is_not_imported_again(self):
+        upload_hash = hashlib.sha256(CONTENT).hexdigest()
+        Upload.record(upload_hash, 'weather', str(REGION_ID), 'weather.csv', 1)
+
+        post = inspect.unwrap(WeatherApi.post)  # 跳过登录校验
+        data = {'region_name': 'BENCH', 'weather_file': (io.BytesIO(CONTENT), 'renamed.csv')}
+
+        with self.app.test_request_context(method='POST', data=data, content_type='multipart/form-data'):
+            result = post(WeatherApi())
+
+        self.assertEqual(result['code'], 0, result['message'])
+        self.assertEqual(result['data'], {'job_id': None, 'upload_hash': upload_hash})
+
+        # 其他农场没有导入过该文件
+        self.assertFalse(Upload.is_ingested(upload_hash, 'weather', str(REGION_ID + 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
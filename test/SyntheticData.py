@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import config
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+from ingest import DATE_COLUMN, DATE_FORMAT, SOIL_COLUMNS, WEATHER_COLUMNS, upload_soil_data, upload_weather_data
+
+XLSX_MAX_ROWS = 1048575  # 单个 sheet 最大数据行数 (不含表头)
+
+# 各列的取值范围, 只需要量级合理
+WEATHER_RANGES = {
+    '空气温度': (-30, 35),
+    '空气湿度': (10, 100),
+    '光照': (0, 100000),
+    '风速': (0, 20),
+    '风向': (0, 360),
+    '气压': (950, 1050),
+    '降雨量': (0, 5),
+    '二氧化碳': (350, 600),
+    '氮': (0, 200),
+    '磷': (0, 100),
+    '钾': (0, 300),
+}
+
+SOIL_RANGES = {
+    '土壤温度': (-10, 30),
+    '土壤含水量': (0, 60),
+    '电导率': (0, 2000),
+    '土壤PH': (4, 9),
+    '土壤盐分': (0, 5),
+}
+
+
+def _dates(start: int, size: int) -> pd.Index:
+    # 10 分钟一条, 与气象站导出格式一致
+    return pd.date_range('2020-01-01', periods=start + size, freq='10min')[start:].strftime(DATE_FORMAT)
+
+
+def weather_frames(rows: int, chunk_size: int = 500000, seed: int = 0):
+    """
+    生成与 upload_weather_data 所需列布局一致的天气数据, 分块返回
+    """
+    rng = np.random.default_rng(seed)
+
+    for start in range(0, rows, chunk_size):
+        size = min(chunk_size, rows - start)
+        data = {DATE_COLUMN: _dates(start, size)}
+
+        for column in WEATHER_COLUMNS:
+            low, high = WEATHER_RANGES[column]
+            data[column] = rng.uniform(low, high, size).round(2)
+
+        yield pd.DataFrame(data)
+
+
+def soil_frames(rows: int, devices: int = 4, chunk_size: int = 500000, seed: int = 0):
+    """
+    生成与 upload_soil_data 所需列布局一致的宽表土壤数据, rows 为展开后的总行数 (宽表行数 x 设备数)
+    """
+    rng = np.random.default_rng(seed)
+    wide_rows = max(1, rows // devices)
+
+    for start in range(0, wide_rows, chunk_size):
+        size = min(chunk_size, wide_rows - start)
+        data = {DATE_COLUMN: _dates(start, size)}
+
+        for suffix in range(1, devices + 1):
+            for prefix in SOIL_COLUMNS:
+                low, high = SOIL_RANGES[prefix]
+                data[f'{prefix}{suffix}'] = rng.uniform(low, high, size).round(2)
+
+        yield pd.DataFrame(data)
+
+
+def write_frames(frames, path: str, file_format: str):
+    """
+    分块写出 xlsx / csv / parquet, 内存只保留一个分块
+    """
+    if file_format == 'csv':
+        for (i, frame) in enumerate(frames):
+            frame.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False, encoding='utf-8')
+
+    elif file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer:
+                writer.close()
+
+    elif file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        header = False
+        written = 0
+
+        for frame in frames:
+            if not header:
+                sheet.append(list(frame.columns))
+                header = True
+
+            written += len(frame)
+            if written > XLSX_MAX_ROWS:
+                raise ValueError(f'xlsx 单个 sheet 最多 {XLSX_MAX_ROWS} 行, 请使用 csv 或 parquet')
+
+            for row in frame.itertuples(index=False, name=None):
+                sheet.append(row)
+
+        workbook.save(path)
+
+    else:
+        raise ValueError(f'不支持的格式: {file_format}')
+
+    return path
+
+
+def generate_weather_file(path: str, rows: int, file_format: str = 'csv', seed: int = 0) -> str:
+    return write_frames(weather_frames(rows, seed=seed), path, file_format)
+
+
+def generate_soil_file(path: str, rows: int, file_format: str = 'csv', devices: int = 4, seed: int = 0) -> str:
+    return write_frames(soil_frames(rows, devices, seed=seed), path, file_format)
+
+
+REGION_ID = 1
+
+
+def create_test_app(database_uri: str) -> Flask:
+    from extensions import db
+    import models.information  # noqa: F401, 注册 weather / soil 表
+    import models.upload  # noqa: F401
+
+    app = Flask('synthetic')
+    app.config.from_object(config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    if database_uri.startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+
+    db.init_app(app)
+
+    return app
+
+
+def seed_reference_data(devices: int):
+    from extensions import db
+    from models.region import Region, Device
+
+    db.drop_all()
+    db.create_all()
+
+    db.session.add(Region(region_id=REGION_ID, region_name='BENCH', region_lon=132.0, region_lat=46.8))
+    for suffix in range(1, devices + 1):
+        db.session.add(Device(device_id=suffix, region_id=REGION_ID, device_instance=f'BENCH设备{suffix}',
+                              device_type='土壤监测设备', device_lon=132.0, device_lat=46.8,
+                              device_column_suffix=str(suffix)))
+    db.session.commit()
+
+
+class SyntheticDatabaseTest(unittest.TestCase):
+    """
+    测试基类: 临时 SQLite 数据库, 导入 WEATHER_ROWS 条天气数据 (2020-01-01 起每 10 分钟一条)
+    和 SOIL_ROWS 条土壤数据 (SOIL_DEVICES 个设备), 测试期间保持 app 上下文
+    """
+    WEATHER_ROWS = 720
+    SOIL_ROWS = 0
+    SOIL_DEVICES = 2
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='webgis_test_')
+        self.app = create_test_app('sqlite:///' + os.path.join(self.workdir, 'test.db'))
+        self.context = self.app.app_context()
+        self.context.push()
+
+        seed_reference_data(self.SOIL_DEVICES)
+
+        if self.WEATHER_ROWS:
+            upload_weather_data(generate_weather_file(os.path.join(self.workdir, 'weather.csv'), self.WEATHER_ROWS),
+                                REGION_ID)
+        if self.SOIL_ROWS:
+            upload_soil_data(generate_soil_file(os.path.join(self.workdir, 'soil.csv'), self.SOIL_ROWS,
+                                                devices=self.SOIL_DEVICES), REGION_ID)
+
+    def tearDown(self):
+        self.context.pop()
+        shutil.rmtree(self.workdir, ignore_errors=True)
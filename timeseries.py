@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pandas as pd
+
+# interval 参数 -> pandas 重采样规则 (区间左闭右开, 以起始时间为标签)
+INTERVALS = {
+    '10min': '10min',
+    'hour': 'h',
+    'day': 'D',
+    'week': 'W-MON',
+    'month': 'MS',
+}
+
+AGGS = ('mean', 'min', 'max', 'sum', 'std', 'last')
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_date(value: str, name: str) -> datetime:
+    """
+    请求参数中的时间, 格式错误时抛出 ValueError (提示信息可直接返回给前端)
+    """
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f'参数错误: {name} 应为 YYYY-MM-DD HH:MM:SS 格式') from None
+
+
+def parse_aggs(arg: str, fields: list[str], defaults: dict[str, str]) -> dict[str, str]:
+    """
+    agg 参数: 'max' (所有字段) 或 'weather_temperature:max,weather_precipitation:sum' (按字段), 未指定的字段用默认值
+    """
+    aggs = dict(defaults)
+
+    for item in filter(None, (arg or '').split(',')):
+        field, _, agg = item.rpartition(':')
+        if agg not in AGGS:
+            raise ValueError(f'不支持的聚合方式: {agg}')
+
+        if not field:
+            aggs = {name: agg for name in fields}
+        elif field in fields:
+            aggs[field] = agg
+        else:
+            raise ValueError(f'不支持的字段: {field}')
+
+    return aggs
+
+
+def aggregate_frame(frame: pd.DataFrame, date_column: str, interval: str, aggs: dict[str, str]) -> pd.DataFrame:
+    """
+    按时间桶向量化聚合, 返回每个非空桶一行, 附带 count (桶内原始行数)
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f'不支持的时间间隔: {interval}')
+
+    frame = frame.set_index(pd.to_datetime(frame[date_column]))
+    resampler = frame[list(aggs)].resample(INTERVALS[interval], label='left', closed='left')
+
+    result = resampler.agg(aggs)
+    result['count'] = resampler.size()
+    result = result[result['count'] > 0]
+
+    result.index.name = date_column
+    return result.reset_index()
+
+
+def date_range(column, date_start=None, date_end=None, end_exclusive: bool = False) -> list:
+    """
+    时间范围条件, 只比较字段本身而不套用函数 (如 extract('year')), 可以使用 (范围字段, 时间字段) 主键索引和按年分区裁剪
+    """
+    conditions = []
+
+    if date_start is not None:
+        conditions.append(column >= date_start)
+    if date_end is not None:
+        conditions.append(column < date_end if end_exclusive else column <= date_end)
+
+    return conditions
+
+
+def year_range(column, years: range) -> list:
+    """
+    整年范围: [years[0]-01-01, (years[-1] + 1)-01-01)
+    """
+    return date_range(column, datetime(years[0], 1, 1), datetime(years[-1] + 1, 1, 1), end_exclusive=True)